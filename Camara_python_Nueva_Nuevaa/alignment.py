@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Alineado de grueso a fino contra la foto de referencia.
+
+findTransformECC a resolución completa (hasta 50 iteraciones por
+comparación) era la etapa más cara. Aquí el movimiento euclidiano
+(rotación + traslación) se resuelve en una pirámide: primero a 1/4, luego se
+afina a 1/2 y a resolución completa con pocas iteraciones.
+
+Se usa la forma "inverse compositional" de Lucas-Kanade: los gradientes, el
+Jacobiano y el Hessiano dependen sólo de la referencia, así que se calculan
+una vez por referencia y se guardan en el Aligner. En cada iteración sólo se
+deforma el frame actual. Como ECC, ambas imágenes se normalizan (media 0,
+desviación 1) y los cambios de brillo no afectan.
+
+El Aligner recuerda el último warp bueno y lo usa como punto de partida (la
+cámara vibra, pero no salta). Si no converge, prueba desde la identidad y
+luego con puntos ORB + RANSAC. Si todo falla lo avisa (ok=False) en lugar
+de seguir como si hubiera alineado. El warp de ORB se acepta sólo si pasa
+la misma prueba de correlación que el de la pirámide.
+
+El mismo Aligner lo usan la GUI y el hilo de monitoreo: el último warp y los
+datos de la referencia que se calculan la primera vez van bajo un lock.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from detection import FramePrep
+
+LEVELS = 3              # completo, 1/2, 1/4
+MARGIN = 0.05           # borde que no se usa (warpAffine replica el borde)
+MAX_ITERS = (10, 15, 50)  # por nivel, de fino a grueso
+EPS_PX = 0.02           # movimiento (px) del último paso para dar por convergido
+MIN_CORR = 0.6          # correlación normalizada mínima después de alinear
+MAX_SHIFT = 0.25        # desplazamiento máximo del centro (fracción del ancho)
+MAX_ANGLE = np.deg2rad(10.0)
+ORB_FEATURES = 1500
+ORB_MIN_INLIERS = 12
+
+
+def _normalize(a):
+    mean, std = cv2.meanStdDev(a)
+    return (a - np.float32(mean[0, 0])) / np.float32(max(std[0, 0], 1e-6))
+
+
+def _rigid(theta, tx, ty, cx, cy):
+    """Matriz 3x3 de rotación+traslación definida en coordenadas centradas en (cx, cy)."""
+    c, s = np.cos(theta), np.sin(theta)
+    return np.array([[c, -s, tx + cx - c * cx + s * cy],
+                     [s, c, ty + cy - s * cx - c * cy],
+                     [0.0, 0.0, 1.0]])
+
+
+def _to3(warp):
+    return np.vstack([warp, [0.0, 0.0, 1.0]])
+
+
+def _scale_warp(warp, factor):
+    """Warp de un nivel de la pirámide a otro (sólo cambia la traslación)."""
+    out = warp.copy()
+    out[:, 2] *= factor
+    return out
+
+
+class _Level:
+    """Datos fijos de un nivel de la referencia: imagen normalizada, Jacobiano y Hessiano."""
+
+    def __init__(self, gray):
+        h, w = gray.shape
+        my, mx = int(h * MARGIN) + 1, int(w * MARGIN) + 1
+        self.size = (w, h)
+        self.inner = (slice(my, h - my), slice(mx, w - mx))
+        self.center = ((w - 1) / 2.0, (h - 1) / 2.0)
+        self.radius = max(w, h) / 2.0
+
+        t = gray.astype(np.float32)
+        mean, std = cv2.meanStdDev(t[self.inner])
+        t = (t - np.float32(mean[0, 0])) / np.float32(max(std[0, 0], 1e-6))
+        gx = cv2.Sobel(t, cv2.CV_32F, 1, 0, ksize=3, scale=1.0 / 8)[self.inner]
+        gy = cv2.Sobel(t, cv2.CV_32F, 0, 1, ksize=3, scale=1.0 / 8)[self.inner]
+        ys, xs = np.mgrid[self.inner].astype(np.float32)
+        xs -= np.float32(self.center[0])
+        ys -= np.float32(self.center[1])
+        # Imágenes de máximo descenso: gradiente · dW/dp, con p = (ángulo, tx, ty)
+        self.sd = np.stack([(xs * gy - ys * gx).ravel(), gx.ravel(), gy.ravel()])
+        self.hinv = np.linalg.inv(self.sd.astype(np.float64) @ self.sd.T.astype(np.float64))
+        self.template = t[self.inner].ravel()
+
+
+class Aligner:
+    """Alineado contra una referencia fija (una instancia por referencia, se puede usar desde varios hilos)."""
+
+    def __init__(self, prep1, levels=LEVELS, use_orb=True):
+        self.prep1 = prep1
+        self.levels = levels
+        self.use_orb = use_orb
+        self.last_warp = None
+        self._pyr = None
+        self._orb_ref = None
+        self._lock = threading.Lock()
+
+    @property
+    def pyramid(self):
+        with self._lock:
+            if self._pyr is None:
+                self._pyr = [_Level(g) for g in self.prep1.pyramid(self.levels, blur=5)]
+            return self._pyr
+
+    def _solve(self, pyr2, warp, start_level):
+        """Refina `warp` (2x3, coordenadas de resolución completa) del nivel start_level al 0."""
+        warp = _scale_warp(warp, 0.5 ** start_level)
+        corr = -1.0
+        for lvl in range(start_level, -1, -1):
+            ref = self.pyramid[lvl]
+            a3 = _to3(warp)
+            converged = False
+            for _ in range(MAX_ITERS[min(lvl, len(MAX_ITERS) - 1)]):
+                warped = cv2.warpAffine(pyr2[lvl], a3[:2], ref.size,
+                                        flags=cv2.INTER_LINEAR + cv2.WARP_INVERSE_MAP,
+                                        borderMode=cv2.BORDER_REPLICATE)
+                err = _normalize(warped[ref.inner].astype(np.float32)).ravel()
+                err -= ref.template
+                dp = ref.hinv @ (ref.sd @ err).astype(np.float64)
+                a3 = a3 @ np.linalg.inv(_rigid(dp[0], dp[1], dp[2], *ref.center))
+                corr = 1.0 - float(err @ err) / (2.0 * err.size)
+                if abs(dp[0]) * ref.radius + np.hypot(dp[1], dp[2]) < EPS_PX * (2 ** lvl):
+                    converged = True
+                    break
+            warp = a3[:2]
+            if lvl:
+                warp = _scale_warp(warp, 2.0)
+        return warp, corr, converged
+
+    def _corr(self, pyr2, warp):
+        """Correlación normalizada con la referencia (resolución completa) de img2 deformada con `warp`."""
+        ref = self.pyramid[0]
+        warped = cv2.warpAffine(pyr2[0], warp, ref.size, flags=cv2.INTER_LINEAR + cv2.WARP_INVERSE_MAP,
+                                borderMode=cv2.BORDER_REPLICATE)
+        err = _normalize(warped[ref.inner].astype(np.float32)).ravel()
+        err -= ref.template
+        return 1.0 - float(err @ err) / (2.0 * err.size)
+
+    def _valid(self, warp, corr):
+        w, h = self.pyramid[0].size
+        cx, cy = (w - 1) / 2.0, (h - 1) / 2.0
+        moved = warp @ np.array([cx, cy, 1.0]) - (cx, cy)
+        angle = abs(np.arctan2(warp[1, 0], warp[0, 0]))
+        return corr >= MIN_CORR and np.hypot(*moved) <= MAX_SHIFT * w and angle <= MAX_ANGLE
+
+    def _orb_warp(self, prep2):
+        """Estimación inicial con puntos ORB + RANSAC (similitud), o None."""
+        orb = cv2.ORB_create(ORB_FEATURES)
+        with self._lock:
+            if self._orb_ref is None:
+                self._orb_ref = orb.detectAndCompute(self.prep1.gray(), None)
+            kp1, d1 = self._orb_ref
+        kp2, d2 = orb.detectAndCompute(prep2.gray(), None)
+        if d1 is None or d2 is None:
+            return None
+        matches = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True).match(d1, d2)
+        if len(matches) < ORB_MIN_INLIERS:
+            return None
+        p1 = np.float32([kp1[m.queryIdx].pt for m in matches])
+        p2 = np.float32([kp2[m.trainIdx].pt for m in matches])
+        warp, inliers = cv2.estimateAffinePartial2D(p1, p2, method=cv2.RANSAC,
+                                                    ransacReprojThreshold=3.0)
+        if warp is None or int(inliers.sum()) < ORB_MIN_INLIERS:
+            return None
+        return warp.astype(np.float64)
+
+    def align(self, img2, prep2=None):
+        """
+        Alinea img2 con la referencia. Devuelve (imagen alineada, ok, método)
+        con método "pirámide", "orb" o "falló" (entonces se devuelve img2 tal cual).
+        """
+        prep2 = prep2 if prep2 is not None else FramePrep(img2)
+        pyr2 = [g.astype(np.float32) for g in prep2.pyramid(self.levels, blur=5)]
+        top = self.levels - 1
+
+        # El warp anterior ya está cerca: empieza en 1/2 en vez de en el nivel más grueso
+        with self._lock:
+            last_warp = self.last_warp
+        starts = [(np.eye(2, 3), top)]
+        if last_warp is not None:
+            starts.insert(0, (last_warp, min(1, top)))
+        warp = method = None
+        for w0, lvl in starts:
+            w, corr, _ = self._solve(pyr2, w0, lvl)
+            if self._valid(w, corr):
+                warp, method = w, "pirámide"
+                break
+        if warp is None and self.use_orb:
+            w0 = self._orb_warp(prep2)
+            if w0 is not None:
+                # ORB ya está cerca: sólo afinar en los niveles finos
+                w, corr, _ = self._solve(pyr2, w0, min(1, top))
+                if self._valid(w, corr):
+                    warp, method = w, "orb"
+                elif self._valid(w0, self._corr(pyr2, w0)):
+                    warp, method = w0, "orb"
+
+        with self._lock:
+            self.last_warp = warp
+        if warp is None:
+            print("⚠ Alineado falló: se compara sin alinear")
+            return img2, False, "falló"
+        aligned = cv2.warpAffine(img2, warp, (img2.shape[1], img2.shape[0]),
+                                 flags=cv2.INTER_LINEAR + cv2.WARP_INVERSE_MAP,
+                                 borderMode=cv2.BORDER_REPLICATE)
+        return aligned, True, method
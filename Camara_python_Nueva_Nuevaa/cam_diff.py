@@ -1,8 +1,9 @@
 #!/usr/bin/env python3q
 # -*- coding: utf-8 -*-
 """
-cam_diff.py - Un solo archivo.
-Toma dos fotos con la webcam en Windows y compara cambios.
+cam_diff.py - Toma dos fotos con la webcam en Windows y compara cambios.
+Usa capture.py (misma carpeta) para abrir la cámara, un video, una carpeta
+de imágenes o frames sintéticos.
 
 Uso rápido (PowerShell o CMD):
     python cam_diff.py --dshow --width 1280 --height 720 --thresh 25 --blur 5 --morph 3
@@ -13,6 +14,10 @@ Teclas:
 Modo automático (sin teclas):
     python cam_diff.py --dshow --auto --delay 3
 
+Sin cámara (video, carpeta o frames sintéticos):
+    python cam_diff.py --source prueba.mp4 --auto --delay 2
+    python cam_diff.py --source synthetic --auto
+
 Requisitos:
     - Python 3.9+ en Windows (con "Add Python to PATH")
     - Webcam
@@ -52,6 +57,8 @@ def ensure_deps():
 ensure_deps()
 import cv2
 import numpy as np
+
+from capture import open_source
 # -----------------------------------------------------------------------------------------------
 
 def put_text(img, text, y=30):
@@ -62,7 +69,7 @@ def put_text(img, text, y=30):
 def take_frame(cap, warmup=0.25):
     """Lee un frame estable tras un pequeño warmup."""
     time.sleep(warmup)
-    ok, frame = cap.read()
+    ok, frame, _ = cap.read()
     if not ok or frame is None:
         raise RuntimeError("No se pudo leer la cámara. Verifica índice y permisos.")
     return frame
@@ -93,7 +100,7 @@ def compare_frames(img1, img2, blur=5, thresh=25, morph=3):
     diff_col = cv2.cvtColor(diff, cv2.COLOR_GRAY2BGR)
     diff_col[mask > 0] = [0, 0, 255]  # rojo = cambio
 
-    changed = int(np.sum(mask > 0))
+    changed = cv2.countNonZero(mask)
     total = mask.size
     pct = (changed / total) * 100.0
     return mask, diff_col, changed, pct
@@ -102,17 +109,12 @@ def run(args):
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    backend = cv2.CAP_DSHOW if args.dshow else 0
-    cap = cv2.VideoCapture(args.camera, backend)
-    if not cap.isOpened():
-        cap = cv2.VideoCapture(args.camera)  # reintento sin forzar backend
-        if not cap.isOpened():
-            raise RuntimeError("No se pudo abrir la cámara. Prueba con --camera 1 o --dshow.")
-
-    # pedir MJPG para mejorar compatibilidad y FPS en Windows
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, args.width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, args.height)
-    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+    # Cámara (con reintento sin forzar backend y MJPG), video, carpeta o sintético
+    backend = cv2.CAP_DSHOW if args.dshow else cv2.CAP_ANY
+    cap = open_source(args.source if args.source is not None else args.camera,
+                      args.width, args.height, fps=args.fps, backend=backend)
+    if not cap.open():
+        raise RuntimeError("No se pudo abrir la cámara. Prueba con --camera 1 o --dshow.")
 
     ts_prefix = datetime.now().strftime("%Y%m%d-%H%M%S")
     win = "CamDiff - Vista previa"
@@ -136,7 +138,7 @@ def run(args):
                 # mostrar vista previa mientras espera
                 t_start = time.time()
                 while True:
-                    ok, frame = cap.read()
+                    ok, frame, _ = cap.read()
                     if not ok:
                         frame = np.zeros((300, 600, 3), dtype=np.uint8)
                         put_text(frame, "ERROR leyendo cámara")
@@ -166,7 +168,7 @@ def run(args):
 
         # Modo manual (teclas)
         while photo1 is None or photo2 is None:
-            ok, frame = cap.read()
+            ok, frame, _ = cap.read()
             if not ok or frame is None:
                 frame = np.zeros((300, 600, 3), dtype=np.uint8)
                 put_text(frame, "ERROR leyendo cámara")
@@ -232,6 +234,10 @@ def run(args):
 def parse_args():
     ap = argparse.ArgumentParser(description="Toma dos fotos con la webcam y compara cambios.")
     ap.add_argument("--camera", type=int, default=0, help="Índice de cámara (0 por defecto).")
+    ap.add_argument("--source", default=None,
+                    help="Video, carpeta de imágenes o 'synthetic' en lugar de la cámara.")
+    ap.add_argument("--fps", type=float, default=None,
+                    help="Ritmo de entrega de frames (por defecto el del video / 10 en carpetas).")
     ap.add_argument("--width", type=int, default=1280, help="Ancho de captura.")
     ap.add_argument("--height", type=int, default=720, help="Alto de captura.")
     ap.add_argument("--thresh", type=int, default=25, help="Umbral (0-255) para detectar cambio.")
@@ -5,21 +5,31 @@ Sistema SENSIBLE para detectar mejor las herramientas
 """
 
 import cv2
-import numpy as np
 from pathlib import Path
 from datetime import datetime
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog
 from PIL import Image, ImageTk
 
 # ---- MQTT ----
 import json
+import threading
+import time
 import paho.mqtt.client as mqtt
 
-# ---------- Utilidades ----------
-def ensure_odd(x: int) -> int:
-    return x if x % 2 == 1 else x + 1
+from capture import IMAGE_EXTS, CaptureThread, FrameRing, list_devices
+from detection import ensure_odd
+from jobs import Cancelled, JobRunner
+from metrics import LatencyStats, Trace
+from monitor import BoardMonitor, MonitorThread
+from pipeline import (COMPARE_MODES, reference_pipeline, compare_pipeline, slot_pipeline, render_slots,
+                      render_views, load_profile)
+from slots import SlotInspector, edit_slots, load_slots, save_slots
+
+# Resolución de la detección de herramientas (1 = completa; ver detección en pirámide)
+DETECTION_SCALES = {"Completa": 1, "1/2": 2}
 
+# ---------- Utilidades ----------
 def color_for_pct(pct: float) -> str:
     """
     Colores para sistema 5S de herramientas:
@@ -56,305 +66,6 @@ def gray_to_tk(gray, max_w=None):
     pil = Image.fromarray(gray)
     return ImageTk.PhotoImage(pil.convert("L"))
 
-# ---------- SSIM ----------
-def ssim_map(gray1, gray2, ksize=11, sigma=1.5):
-    k = cv2.getGaussianKernel(ksize, sigma)
-    w = k @ k.T
-    mu1 = cv2.filter2D(gray1, -1, w)
-    mu2 = cv2.filter2D(gray2, -1, w)
-    mu1_sq, mu2_sq, mu1_mu2 = mu1*mu1, mu2*mu2, mu1*mu2
-    sigma1_sq = cv2.filter2D(gray1*gray1, -1, w) - mu1_sq
-    sigma2_sq = cv2.filter2D(gray2*gray2, -1, w) - mu2_sq
-    sigma12   = cv2.filter2D(gray1*gray2, -1, w) - mu1_mu2
-    C1, C2 = (0.01*255)**2, (0.03*255)**2
-    num = (2*mu1_mu2 + C1)*(2*sigma12 + C2)
-    den = (mu1_sq + mu2_sq + C1)*(sigma1_sq + sigma2_sq + C2)
-    ssim = num / (den + 1e-12)
-    return np.clip(ssim, 0, 1)
-
-# ---------- Alineado ECC ----------
-def align_ecc(img1, img2):
-    g1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-    g2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-    g1 = cv2.GaussianBlur(g1, (5,5), 0)
-    g2 = cv2.GaussianBlur(g2, (5,5), 0)
-    warp = np.eye(2, 3, dtype=np.float32)
-    try:
-        criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 50, 1e-5)
-        _, warp = cv2.findTransformECC(g1, g2, warp, cv2.MOTION_EUCLIDEAN, criteria)
-        aligned = cv2.warpAffine(img2, warp, (img2.shape[1], img2.shape[0]),
-                                 flags=cv2.INTER_LINEAR+cv2.WARP_INVERSE_MAP,
-                                 borderMode=cv2.BORDER_REPLICATE)
-        return aligned, True
-    except cv2.error as e:
-        print(f"Error en alineado ECC: {e}")
-        return img2, False
-    except Exception as e:
-        print(f"Error inesperado en alineado: {e}")
-        return img2, False
-
-# ---------- Comparaciones base ----------
-def compare_absdiff(img1, img2, blur=5, thresh=30, morph=5):
-    if img1.shape != img2.shape:
-        raise ValueError("Tamaños distintos.")
-    g1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-    g2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-    if blur and blur > 1:
-        k = blur if blur % 2 else blur + 1
-        g1 = cv2.GaussianBlur(g1, (k, k), 0)
-        g2 = cv2.GaussianBlur(g2, (k, k), 0)
-    diff = cv2.absdiff(g1, g2)
-    _, mask = cv2.threshold(diff, thresh, 255, cv2.THRESH_BINARY)
-    if morph and morph > 1:
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph, morph))
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, 1)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, 1)
-    diff_col = cv2.cvtColor(diff, cv2.COLOR_GRAY2BGR)
-    diff_col[mask > 0] = [0, 0, 255]
-    changed = int(np.sum(mask > 0))
-    pct = (changed / max(mask.size, 1)) * 100.0
-    return mask, diff_col, changed, pct
-
-def compare_ssim(img1, img2, blur=5, thresh=30, morph=5):
-    if img1.shape != img2.shape:
-        raise ValueError("Tamaños distintos.")
-    g1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-    g2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-    if blur and blur > 1:
-        k = blur if blur % 2 else blur + 1
-        g1 = cv2.GaussianBlur(g1, (k, k), 0)
-        g2 = cv2.GaussianBlur(g2, (k, k), 0)
-
-    ssim = ssim_map(g1.astype(np.float32), g2.astype(np.float32))
-    change = 1.0 - ssim
-    thr = np.clip(thresh / 255.0, 0.0, 1.0)
-    mask = (change >= thr).astype(np.uint8) * 255
-
-    if morph and morph > 1:
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph, morph))
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, 1)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, 1)
-
-    heat = (change * 255).astype(np.uint8)
-    heat_col = cv2.applyColorMap(heat, cv2.COLORMAP_JET)
-
-    red_img = np.zeros_like(heat_col, dtype=np.uint8); red_img[:] = (0, 0, 255)
-    blended = cv2.addWeighted(heat_col, 0.6, red_img, 0.4, 0)
-    heat_col[mask > 0] = blended[mask > 0]
-
-    changed = int(np.sum(mask > 0))
-    pct = float(change.mean() * 100.0)
-    return mask, heat_col, changed, pct
-
-def compare_edges(img1, img2, blur=5, thresh=30, morph=5):
-    if img1.shape != img2.shape:
-        raise ValueError("Tamaños distintos.")
-    g1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-    g2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-    if blur and blur > 1:
-        k = blur if blur % 2 else blur + 1
-        g1 = cv2.GaussianBlur(g1, (k, k), 0)
-        g2 = cv2.GaussianBlur(g2, (k, k), 0)
-    e1 = cv2.Canny(g1, 50, 150)
-    e2 = cv2.Canny(g2, 50, 150)
-    diff_edges = cv2.bitwise_xor(e1, e2)
-    if morph and morph > 1:
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph, morph))
-        diff_edges = cv2.morphologyEx(diff_edges, cv2.MORPH_CLOSE, kernel, 1)
-    mask = (diff_edges > 0).astype(np.uint8) * 255
-    diff_col = cv2.cvtColor(g2, cv2.COLOR_GRAY2BGR); diff_col[mask > 0] = [0, 0, 255]
-    changed = int(np.sum(mask > 0))
-    pct = (changed / max(mask.size, 1)) * 100.0
-    return mask, diff_col, changed, pct
-
-# ========== Contador de objetos MÁS SENSIBLE ==========
-def count_tools_in_image(img, blur=5, thresh=30, morph=5, min_area=1500):
-    """
-    Cuenta las herramientas/objetos detectados en una imagen.
-    VERSIÓN MÁS SENSIBLE para mejor detección.
-    """
-    g = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    if blur and blur > 1:
-        k = blur if blur % 2 else blur + 1
-        g = cv2.GaussianBlur(g, (k,k), 0)
-    
-    # Ecualización adaptativa MÁS AGRESIVA
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))  # Aumentado de 2.0 a 3.0
-    g = clahe.apply(g)
-    
-    # Umbralización adaptativa MÁS SENSIBLE
-    binary = cv2.adaptiveThreshold(g, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                    cv2.THRESH_BINARY_INV, 15, 5)  # Reducido de 21,10 a 15,5
-    
-    # Morfología MENOS agresiva para no perder objetos
-    if morph and morph > 1:
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph, morph))
-        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=1)  # 1 vez, no 2
-        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=1)
-    
-    # Limpiar bordes (reducido)
-    border = 15  # Antes era 20
-    binary[:border, :] = 0
-    binary[-border:, :] = 0
-    binary[:, :border] = 0
-    binary[:, -border:] = 0
-    
-    # Encontrar contornos
-    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    valid_tools = []
-    for c in contours:
-        area = cv2.contourArea(c)
-        if area < min_area:
-            continue
-        
-        x, y, w, h = cv2.boundingRect(c)
-        aspect_ratio = max(w, h) / max(min(w, h), 1)
-        
-        # Filtros MÁS PERMISIVOS
-        if aspect_ratio > 8.0:  # Antes era 5.0
-            continue
-        
-        # Compacidad más permisiva
-        perimeter = cv2.arcLength(c, True)
-        if perimeter > 0:
-            compactness = 4 * np.pi * area / (perimeter ** 2)
-            if compactness < 0.10:  # Antes era 0.15
-                continue
-        
-        valid_tools.append(area)
-    
-    return len(valid_tools), valid_tools
-
-# ---------- Detección MEJORADA y MÁS SENSIBLE ----------
-def detect_added_removed_smart(img1, img2, blur=5, thresh=30, morph=5, min_area=1500,
-                               tools_in_reference=None):
-    """
-    Versión MÁS SENSIBLE para detectar mejor las herramientas.
-    """
-    g1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-    g2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-    
-    # Blur reducido para más detalle
-    if blur and blur > 1:
-        k = blur if blur % 2 else blur + 1
-        g1 = cv2.GaussianBlur(g1, (k,k), 0)
-        g2 = cv2.GaussianBlur(g2, (k,k), 0)
-
-    # Ecualización más agresiva
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-    g1 = clahe.apply(g1)
-    g2 = clahe.apply(g2)
-    
-    # Diferencias con signo
-    pos = cv2.subtract(g2, g1)
-    neg = cv2.subtract(g1, g2)
-
-    # Umbral MÁS BAJO para mayor sensibilidad
-    thr_loc = max(thresh, 30)  # Antes era 45
-
-    _, add_mask = cv2.threshold(pos, thr_loc, 255, cv2.THRESH_BINARY)
-    _, rem_mask = cv2.threshold(neg, thr_loc, 255, cv2.THRESH_BINARY)
-
-    # Morfología MENOS agresiva
-    if morph and morph > 1:
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph, morph))
-        add_mask = cv2.morphologyEx(add_mask, cv2.MORPH_OPEN, kernel, iterations=1)  # 1 vez
-        add_mask = cv2.morphologyEx(add_mask, cv2.MORPH_CLOSE, kernel, iterations=1)
-        rem_mask = cv2.morphologyEx(rem_mask, cv2.MORPH_OPEN, kernel, iterations=1)
-        rem_mask = cv2.morphologyEx(rem_mask, cv2.MORPH_CLOSE, kernel, iterations=1)
-
-    # Limpiar bordes (reducido)
-    border = 15
-    for m in (add_mask, rem_mask):
-        m[:border, :] = 0
-        m[-border:, :] = 0
-        m[:, :border] = 0
-        m[:, -border:] = 0
-
-    overlay = img2.copy()
-
-    def draw_regions(bin_mask, color_bgr, label):
-        count = 0
-        total_area = 0
-        contours, _ = cv2.findContours(bin_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        valid_contours = []
-        for c in contours:
-            area = cv2.contourArea(c)
-            if area < min_area:
-                continue
-            
-            x, y, w, h = cv2.boundingRect(c)
-            aspect_ratio = max(w, h) / max(min(w, h), 1)
-            
-            # Más permisivo
-            if aspect_ratio > 8.0:  # Antes 5.0
-                continue
-            
-            perimeter = cv2.arcLength(c, True)
-            if perimeter > 0:
-                compactness = 4 * np.pi * area / (perimeter ** 2)
-                if compactness < 0.10:  # Antes 0.15
-                    continue
-            
-            valid_contours.append((c, area, x, y, w, h))
-        
-        for c, area, x, y, w, h in valid_contours:
-            cv2.rectangle(overlay, (x, y), (x+w, y+h), color_bgr, 3)
-            roi = overlay[y:y+h, x:x+w]
-            tint = np.full_like(roi, color_bgr, dtype=np.uint8)
-            cv2.addWeighted(tint, 0.3, roi, 0.7, 0, dst=roi)
-            
-            label_text = f"{label}"
-            (text_w, text_h), _ = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
-            cv2.rectangle(overlay, (x, y-text_h-10), (x+text_w+4, y), color_bgr, -1)
-            cv2.putText(overlay, label_text, (x+2, y-6), 
-                       cv2.FONT_HERSHEY_SIMPLEX,
-                       0.7, (255, 255, 255), 2, cv2.LINE_AA)
-            count += 1
-            total_area += area
-        
-        return count, total_area
-
-    added, added_area = draw_regions(add_mask, (0, 255, 0), "Añadido")
-    removed, removed_area = draw_regions(rem_mask, (255, 0, 0), "Removido")
-    total_area = added_area + removed_area
-    
-    # ========== CÁLCULO INTELIGENTE DEL SCORE ==========
-    tools_photo2, _ = count_tools_in_image(img2, blur=blur, thresh=thresh, 
-                                           morph=morph, min_area=min_area)
-    
-    score_intelligent = 0.0
-    
-    if tools_in_reference is not None and tools_in_reference > 0:
-        # Método 1: Basado en conteo
-        tools_missing = max(0, tools_in_reference - tools_photo2)
-        score_by_count = (tools_missing / tools_in_reference) * 100.0
-        
-        # Método 2: Basado en área (multiplicador aumentado)
-        total_pixels = img1.shape[0] * img1.shape[1]
-        pct_area = (total_area / float(total_pixels)) * 100.0
-        score_by_area = pct_area * 12.0  # Aumentado de x10 a x12
-        
-        # Combinar (70% conteo, 30% área)
-        score_intelligent = (score_by_count * 0.70) + (score_by_area * 0.30)
-        
-        # Limitar
-        score_intelligent = min(score_intelligent, 100.0)
-        
-        # Garantizar score mínimo si hay objetos removidos
-        if removed > 0:
-            score_intelligent = max(score_intelligent, 20.0)  # Aumentado de 15 a 20
-    else:
-        # Fallback
-        total_pixels = img1.shape[0] * img1.shape[1]
-        pct_area = (total_area / float(total_pixels)) * 100.0
-        score_intelligent = min(pct_area * 12.0, 100.0)
-    
-    return overlay, added, removed, total_area, score_intelligent, tools_photo2
-
 # ---------- Ventana de comparación ----------
 class ComparisonWindow(tk.Toplevel):
     def __init__(self, master, max_w=520):
@@ -441,6 +152,10 @@ class CamDiffApp:
         self.outdir = Path("outputs")
         self.outdir.mkdir(parents=True, exist_ok=True)
         self.comp_win = None
+
+        # Slots (polígonos por herramienta), en coordenadas de la imagen con ROI
+        self.slots_path = Path("slots.json")
+        self.slots = load_slots(self.slots_path) if self.slots_path.exists() else []
         self.roi = None
         self.tools_in_reference = None
 
@@ -488,12 +203,16 @@ class CamDiffApp:
         ttk.Label(panel, text="📹 Cámara", font=("Segoe UI", 10, "bold"))\
             .grid(row=6, column=0, columnspan=2, sticky="w")
         self.var_cam_idx = tk.StringVar(value="0")
-        self.combo_cam = ttk.Combobox(panel, textvariable=self.var_cam_idx,
-                                      state="readonly", width=12)
+        # Índice de cámara, "synthetic" o ruta de video / carpeta (se puede escribir)
+        self.combo_cam = ttk.Combobox(panel, textvariable=self.var_cam_idx, width=12)
         self.combo_cam.grid(row=7, column=0, columnspan=2, sticky="ew")
         self.combo_cam.bind("<<ComboboxSelected>>", lambda e: self.open_camera())
-        ttk.Button(panel, text="Detectar cámaras", command=self.detect_and_fill)\
-            .grid(row=8, column=0, columnspan=2, sticky="ew", pady=2)
+        cam_btns = ttk.Frame(panel)
+        cam_btns.grid(row=8, column=0, columnspan=2, sticky="ew", pady=2)
+        ttk.Button(cam_btns, text="Detectar cámaras", command=self.detect_and_fill)\
+            .pack(side="left", fill="x", expand=True)
+        ttk.Button(cam_btns, text="Video / carpeta", command=self.open_file_source)\
+            .pack(side="left", fill="x", expand=True, padx=(4, 0))
         ttk.Button(panel, text="Conectar", command=self.open_camera)\
             .grid(row=9, column=0, columnspan=2, sticky="ew", pady=(0,4))
 
@@ -510,27 +229,39 @@ class CamDiffApp:
         ttk.Label(panel, text="📦 Área de Caja", font=("Segoe UI", 10, "bold"))\
             .grid(row=12, column=0, columnspan=2, sticky="w")
         self.var_use_roi = tk.BooleanVar(value=False)
-        ttk.Checkbutton(panel, text="Usar solo área definida",
+        self.var_use_slots = tk.BooleanVar(value=False)
+        roi_checks = ttk.Frame(panel)
+        roi_checks.grid(row=13, column=0, columnspan=2, sticky="ew")
+        ttk.Checkbutton(roi_checks, text="Usar solo área definida",
                         variable=self.var_use_roi)\
-            .grid(row=13, column=0, columnspan=2, sticky="w")
-        ttk.Button(panel, text="Definir área de caja", command=self.define_roi)\
-            .grid(row=14, column=0, columnspan=2, sticky="ew", pady=2)
+            .pack(side="left")
+        ttk.Checkbutton(roi_checks, text="Por slots",
+                        variable=self.var_use_slots)\
+            .pack(side="right")
+        roi_btns = ttk.Frame(panel)
+        roi_btns.grid(row=14, column=0, columnspan=2, sticky="ew", pady=2)
+        ttk.Button(roi_btns, text="Definir área de caja", command=self.define_roi)\
+            .pack(side="left", fill="x", expand=True)
+        ttk.Button(roi_btns, text="Definir slots", command=self.define_slots)\
+            .pack(side="left", fill="x", expand=True, padx=(4, 0))
 
         # --- Configuración ---
         ttk.Separator(panel, orient='horizontal').grid(row=15, column=0, columnspan=2, sticky="ew", pady=8)
         ttk.Label(panel, text="⚙️ Configuración", font=("Segoe UI", 10, "bold"))\
-            .grid(row=16, column=0, columnspan=2, sticky="w")
+            .grid(row=16, column=0, sticky="w")
+        ttk.Button(panel, text="Cargar perfil", command=self.load_profile)\
+            .grid(row=16, column=1, sticky="e")
         
         ttk.Label(panel, text="Modo de comparación:")\
             .grid(row=17, column=0, columnspan=2, sticky="w")
         self.var_mode = tk.StringVar(value="SSIM (mapa)")
         ttk.Combobox(panel,
-                     values=["AbsDiff","SSIM (mapa)","Bordes (Canny)"],
+                     values=list(COMPARE_MODES),
                      textvariable=self.var_mode, state="readonly")\
             .grid(row=18, column=0, columnspan=2, sticky="ew", pady=2)
 
         self.var_align = tk.BooleanVar(value=True)
-        ttk.Checkbutton(panel, text="✓ Alinear antes (ECC)",
+        ttk.Checkbutton(panel, text="✓ Alinear antes (pirámide)",
                         variable=self.var_align)\
             .grid(row=19, column=0, columnspan=2, sticky="w")
 
@@ -579,9 +310,15 @@ class CamDiffApp:
             .grid(row=27, column=0, columnspan=2, sticky="w")
         
         self.var_boxes = tk.BooleanVar(value=True)
-        ttk.Checkbutton(panel, text="✓ Modo inteligente (recomendado)",
+        self.var_monitor = tk.BooleanVar(value=False)
+        smart_checks = ttk.Frame(panel)
+        smart_checks.grid(row=28, column=0, columnspan=2, sticky="ew")
+        ttk.Checkbutton(smart_checks, text="✓ Modo inteligente (recomendado)",
                         variable=self.var_boxes)\
-            .grid(row=28, column=0, columnspan=2, sticky="w")
+            .pack(side="left")
+        ttk.Checkbutton(smart_checks, text="🎥 Continuo",
+                        variable=self.var_monitor, command=self.toggle_monitor)\
+            .pack(side="right")
 
         # Área mínima - REDUCIDA (detecta herramientas más pequeñas)
         ttk.Label(panel, text="Tamaño mínimo herramienta (px²):")\
@@ -597,24 +334,58 @@ class CamDiffApp:
         self.var_min_area.trace_add("write", lambda *_: self.lbl_area.configure(text=str(int(self.var_min_area.get()))))
 
         # Status
-        ttk.Separator(panel, orient='horizontal').grid(row=31, column=0, columnspan=2, sticky="ew", pady=8)
+        # Pirámide: buscar candidatas a 1/2 y afinarlas a resolución completa
+        ttk.Label(panel, text="Detección a:")\
+            .grid(row=31, column=0, sticky="w", pady=(8,0))
+        self.var_det_scale = tk.StringVar(value="Completa")
+        ttk.Combobox(panel, values=list(DETECTION_SCALES), textvariable=self.var_det_scale,
+                     state="readonly", width=10)\
+            .grid(row=31, column=1, sticky="e", pady=(8,0))
+
+        # Compuerta por mosaicos: sólo se compara lo que cambió respecto de la Foto 1
+        self.var_gate = tk.BooleanVar(value=True)
+        ttk.Checkbutton(panel, text="⚡ Sólo zonas cambiadas (mosaicos)", variable=self.var_gate)\
+            .grid(row=32, column=0, columnspan=2, sticky="w")
+
+        ttk.Separator(panel, orient='horizontal').grid(row=33, column=0, columnspan=2, sticky="ew", pady=8)
         self.status = ttk.Label(panel, text="Inicializando...", wraplength=250, 
                                font=("Segoe UI", 9), foreground="#555")
-        self.status.grid(row=32, column=0, columnspan=2, sticky="w")
+        self.status.grid(row=34, column=0, columnspan=2, sticky="w")
 
         # Layout
         root.columnconfigure(0, weight=1)
         root.rowconfigure(0, weight=1)
 
-        # Cámara
-        self.cap = None
-        self.current_frame = None
+        # Cámara: hilo de captura -> buffer circular; la vista previa sólo toma el más nuevo
+        self.ring = FrameRing(size=4)
+        self.capture = None
+        self._preview_seq = 0
+        self._preview_imgtk = None
+
+        # Inspección en segundo plano: un hilo, cola acotada, resultados por root.after
+        self.jobs = JobRunner(workers=1, max_pending=3,
+                              dispatch=lambda fn: self.root.after(0, fn))
+        # La referencia la escribe el hilo del pool y la borra reset (hilo de Tk):
+        # se lee y se cambia bajo el lock; _reference_gen deja fuera una referencia
+        # que termina de calcularse después de un reset
+        self._reference = None
+        self._reference_gen = 0
+        self._reference_lock = threading.Lock()
+        # Latencia por etapa, del disparo MQTT al score publicado (metrics.py)
+        self.latency = LatencyStats()
+        self.last_trace = None
+        # Monitoreo continuo (monitor.py): hilo que vigila el buffer entre Foto 1 y Foto 2
+        self.monitor_thread = None
+        # Constantes de detección que no tienen slider (perfil de tune.py)
+        self.profile_extra = {}
 
         # MQTT
         self._setup_mqtt(host="10.25.90.33", port=1883,
                          user=None, password=None,
                          topic="datos/score",
-                         incoming_topic="camara/estadoTurno")
+                         incoming_topic="camara/estadoTurno",
+                         events_topic="datos/eventos",
+                         metrics_topic="datos/metricas")
 
         self.detect_and_fill()
         self.open_camera()
@@ -623,9 +394,12 @@ class CamDiffApp:
     # ---- MQTT ----
     def _setup_mqtt(self, host="10.25.90.33", port=1883,
                     user=None, password=None, topic="datos/score",
-                    incoming_topic="camara/estadoTurno"):
+                    incoming_topic="camara/estadoTurno", events_topic="datos/eventos",
+                    metrics_topic="datos/metricas"):
         self.mqtt_topic = topic
         self.mqtt_in_topic = incoming_topic
+        self.mqtt_events_topic = events_topic
+        self.mqtt_metrics_topic = metrics_topic
         try:
             self.mqtt = mqtt.Client(protocol=mqtt.MQTTv311)
         except TypeError:
@@ -655,7 +429,17 @@ class CamDiffApp:
         except Exception as e:
             print(f"[MQTT] Error: {e}")
 
+    def _publish_events(self, events):
+        if not hasattr(self, "mqtt") or self.mqtt is None:
+            return
+        for event in events:
+            try:
+                self.mqtt.publish(self.mqtt_events_topic, json.dumps(event, ensure_ascii=False), qos=1)
+            except Exception as e:
+                print(f"[MQTT] Error: {e}")
+
     def _on_mqtt_message(self, client, userdata, msg):
+        t0 = time.perf_counter()  # inicio de la latencia disparo -> score
         payload = msg.payload
         try:
             val = payload.decode("utf-8").strip()
@@ -702,9 +486,9 @@ class CamDiffApp:
         b = parse_bool(val)
         if b is None:
             b = parse_bool(payload)
-        self.root.after(0, lambda: self._handle_incoming_turno(b, msg.topic))
+        self.root.after(0, lambda: self._handle_incoming_turno(b, msg.topic, t0))
 
-    def _handle_incoming_turno(self, val, topic=None):
+    def _handle_incoming_turno(self, val, topic=None, t0=None):
         if val is None:
             self.status.configure(text=f"⚠ Payload no válido en {topic}")
             return
@@ -713,34 +497,39 @@ class CamDiffApp:
             self.take_photo1()
         else:
             self.status.configure(text="[MQTT] Turno=false → Comparando")
-            self.take_photo2_compare()
+            self.take_photo2_compare(t0=t0)
 
     # --- Detección cámaras ---
     def detect_and_fill(self, max_index: int = 10):
-        found = []
-        for i in range(0, max_index + 1):
-            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-            ok = cap.isOpened()
-            ret = False
-            if ok:
-                ret, _ = cap.read()
-            cap.release()
-            if ok and ret:
-                found.append(str(i))
+        found = [str(i) for i in list_devices(max_index)]
         if not found:
             found = ["0"]
-        self.combo_cam["values"] = found
-        if self.var_cam_idx.get() not in found:
+        # "synthetic" = tablero de prueba en memoria, para probar sin cámara
+        self.combo_cam["values"] = found + ["synthetic"]
+        if self.var_cam_idx.get().isdigit() and self.var_cam_idx.get() not in found:
             self.var_cam_idx.set(found[0])
         self.status.configure(text=f"📹 Cámaras: {', '.join(found)}")
 
+    def open_file_source(self):
+        """Reproduce un video o la carpeta de una imagen en lugar de la cámara."""
+        path = filedialog.askopenfilename(
+            title="Video o imagen de una carpeta",
+            filetypes=[("Video", "*.mp4 *.avi *.mkv *.mov"),
+                       ("Imágenes (toda la carpeta)", " ".join(f"*{e}" for e in sorted(IMAGE_EXTS)))])
+        if not path:
+            return
+        if Path(path).suffix.lower() in IMAGE_EXTS:
+            path = str(Path(path).parent)
+        self.var_cam_idx.set(path)
+        self.open_camera()
+
     # --- ROI ---
     def define_roi(self):
-        if self.current_frame is None:
+        clone = self._grab_frame()
+        if clone is None:
             self.status.configure(text="⚠ No hay frame")
             return
         
-        clone = self.current_frame.copy()
         cv2.putText(clone, "Selecciona area - ENTER:OK, C:Cancelar", 
                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
@@ -755,87 +544,180 @@ class CamDiffApp:
             self.status.configure(text="✗ ROI cancelado")
             self.var_use_roi.set(False)
 
+    def define_slots(self):
+        """Extensión de define_roi: un polígono por herramienta, guardado en slots.json."""
+        frame = self._grab_frame(apply_roi=True)
+        if frame is None:
+            self.status.configure(text="⚠ No hay frame")
+            return
+        self.slots = edit_slots(frame, self.slots)
+        if self.slots:
+            save_slots(self.slots_path, self.slots)
+            self.var_use_slots.set(True)
+            self.status.configure(text=f"✓ {len(self.slots)} slots guardados en {self.slots_path}")
+        else:
+            self.var_use_slots.set(False)
+            self.status.configure(text="✗ Sin slots definidos")
+
     def _apply_roi(self, img):
         if not self.var_use_roi.get() or self.roi is None:
             return img
         x, y, w, h = self.roi
         if w > 0 and h > 0:
-            return img[y:y+h, x:x+w].copy()
+            return img[y:y+h, x:x+w]
         return img
 
     # --- Cámara ---
+    def _stop_capture(self):
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
+
+    def _grab_frame(self, apply_roi=False):
+        """Copia del frame más nuevo del buffer, recortada al ROI si se pide (None si no hay)."""
+        frame, _, _ = self.ring.latest()
+        if frame is None:
+            return None
+        if apply_roi:
+            frame = self._apply_roi(frame)
+        return frame.copy()
+
     def open_camera(self):
-        try:
-            if self.cap is not None:
-                self.cap.release()
-        except Exception:
-            pass
+        self._stop_capture()
 
-        try:
-            cam_index = int(self.var_cam_idx.get())
-        except Exception:
-            cam_index = 0
+        source = self.var_cam_idx.get().strip() or "0"
 
         try:
             width, height = [int(x) for x in self.var_res.get().split("x")]
         except Exception:
             width, height = 1280, 720
 
-        self.cap = cv2.VideoCapture(cam_index, cv2.CAP_DSHOW)
-        if not self.cap.isOpened():
-            self.cap = cv2.VideoCapture(cam_index)
-
-        if not self.cap.isOpened():
-            self.status.configure(text=f"✗ No se pudo abrir cámara {cam_index}")
+        self.ring = FrameRing(size=4)
+        self._preview_seq = 0
+        if self.monitor_thread is not None:
+            self.monitor_thread.ring = self.ring
+        self.capture = CaptureThread(source, self.ring, width=width, height=height,
+                                     name=f"captura-{Path(source).name or source}")
+        self.capture.start()
+
+        if not self.capture.wait_ready(timeout=5.0):
+            self._stop_capture()
+            self.status.configure(text=f"✗ No se pudo abrir {source} (sin frames)")
             return
 
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
-        self.status.configure(text=f"✓ Cámara {cam_index} ({width}x{height})")
+        kind = "Cámara" if source.isdigit() else "Fuente"
+        self.status.configure(text=f"✓ {kind} {source} ({width}x{height})")
 
     def update_loop(self):
-        if self.cap is not None and self.cap.isOpened():
-            ok, frame = self.cap.read()
-            if ok:
-                self.current_frame = frame
-                
-                frame_disp = frame.copy()
-                if self.roi is not None and self.roi[2] > 0:
-                    x, y, w, h = self.roi
-                    cv2.rectangle(frame_disp, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                    cv2.putText(frame_disp, "ROI", (x, y-10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                
-                h, w = frame_disp.shape[:2]
-                scale = min(self.preview_w / float(w), 1.0)
-                frame_disp = cv2.resize(frame_disp, (int(w*scale), int(h*scale))) \
-                    if scale < 1.0 else frame_disp
-                rgb = cv2.cvtColor(frame_disp, cv2.COLOR_BGR2RGB)
-                imgtk = ImageTk.PhotoImage(Image.fromarray(rgb))
-                self.preview_label.imgtk = imgtk
+        frame, _, seq = self.ring.latest()
+        if frame is not None and seq != self._preview_seq:
+            # Sólo se convierte si llegó un frame nuevo
+            self._preview_seq = seq
+            h, w = frame.shape[:2]
+            scale = min(self.preview_w / float(w), 1.0)
+            small = cv2.resize(frame, (int(w*scale), int(h*scale))) if scale < 1.0 else frame
+            # cvtColor crea la imagen nueva: el recuadro del ROI no toca el buffer
+            rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+            if self.roi is not None and self.roi[2] > 0:
+                x, y, rw, rh = (int(v * scale) for v in self.roi)
+                cv2.rectangle(rgb, (x, y), (x+rw, y+rh), (0, 255, 0), 2)
+                cv2.putText(rgb, "ROI", (x, y-10),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+            pil = Image.fromarray(rgb)
+            imgtk = self._preview_imgtk
+            if imgtk is not None and (imgtk.width(), imgtk.height()) == pil.size:
+                imgtk.paste(pil)  # reutilizar la imagen de Tk en lugar de crear una por frame
+            else:
+                imgtk = ImageTk.PhotoImage(pil)
+                self._preview_imgtk = imgtk
                 self.preview_label.configure(image=imgtk)
         self.root.after(20, self.update_loop)
 
     # --- Acciones ---
+    def _params(self):
+        """Parámetros de los sliders (se leen en el hilo de Tk, antes de mandar el trabajo)."""
+        blur_slider = int(round(self.var_blur.get()))
+        return {
+            "blur": ensure_odd(blur_slider) if blur_slider > 0 else 0,
+            "thresh": int(round(self.var_thresh.get())),
+            "morph": int(round(self.var_morph.get())),
+            "min_area": int(self.var_min_area.get()),
+            "scale": DETECTION_SCALES[self.var_det_scale.get()],
+            **self.profile_extra,
+        }
+
+    def load_profile(self):
+        """Carga un perfil de tune.py: mueve los sliders y guarda el resto de constantes."""
+        path = filedialog.askopenfilename(title="Perfil de parámetros",
+                                          filetypes=[("Perfil JSON", "*.json")])
+        if not path:
+            return
+        try:
+            params = load_profile(path)
+        except (OSError, ValueError, KeyError) as e:
+            self.status.configure(text=f"⚠ Perfil no válido: {e}")
+            return
+        sliders = {"blur": self.var_blur, "thresh": self.var_thresh,
+                   "morph": self.var_morph, "min_area": self.var_min_area}
+        for key, var in sliders.items():
+            if key in params:
+                var.set(params.pop(key))
+        self.profile_extra = params
+        self.status.configure(text=f"✓ Perfil cargado: {Path(path).name}")
+
+    def _on_job_progress(self, kind, stage):
+        self.status.configure(text=f"⏳ {stage}...")
+
+    def _on_job_error(self, exc):
+        self.status.configure(text=f"⚠ Error en la inspección: {exc}")
+
     def take_photo1(self):
-        if self.current_frame is None:
+        photo1 = self._grab_frame(apply_roi=True)
+        if photo1 is None:
             self.status.configure(text="⚠ No hay frame")
             return
-        
-        self.photo1 = self._apply_roi(self.current_frame.copy())
-        
-        # CONTAR HERRAMIENTAS
-        blur_slider = int(round(self.var_blur.get()))
-        blur = ensure_odd(blur_slider) if blur_slider > 0 else 0
-        morph = int(round(self.var_morph.get()))
-        thresh = int(round(self.var_thresh.get()))
-        min_area = int(self.var_min_area.get())
-        
-        self.tools_in_reference, tool_areas = count_tools_in_image(
-            self.photo1, blur=blur, thresh=thresh, morph=morph, min_area=min_area
-        )
-        
+
+        # Una referencia nueva deja viejas a todas las comparaciones pendientes
+        slots = self.slots if self.var_use_slots.get() else None
+        job = self.jobs.submit("reference", self._reference_job, photo1, self._params(), slots,
+                               self._reference_gen,
+                               on_done=self._on_reference_done, on_error=self._on_job_error,
+                               on_progress=self._on_job_progress,
+                               supersede=("reference", "compare", "monitor"))
+        if job is None:
+            self.status.configure(text="⚠ Cola de inspección llena, intenta de nuevo")
+            return
+        self.last_result = None
+        self.save_btn.configure(state="disabled")
+
+    def _reference_job(self, photo1, params, slots, gen, check, progress):
+        if slots:
+            # Modo slots: sólo recortes de referencia por polígono, sin contar herramientas
+            progress("Preparando slots")
+            inspector = SlotInspector(photo1, slots, blur=params["blur"], thresh=params["thresh"])
+            result = {"photo1": photo1, "inspector": inspector, "tools_in_reference": len(inspector.items)}
+        else:
+            result = reference_pipeline(photo1, params, check=check, progress=progress)
+        # Se guarda desde el hilo del pool para que la siguiente comparación ya la vea
+        with self._reference_lock:
+            if gen != self._reference_gen:
+                raise Cancelled()  # reset la canceló mientras se calculaba
+            self._reference = result
+        return result
+
+    def _current_reference(self):
+        """La referencia vigente (los trabajos toman una sola vez su copia local)."""
+        with self._reference_lock:
+            return self._reference
+
+    def _on_reference_done(self, result):
+        self.photo1 = result["photo1"]
+        self.tools_in_reference = result["tools_in_reference"]
+        if self.monitor_thread is not None:
+            # Nueva referencia: el modelo de fondo empieza de nuevo
+            self.monitor_thread.monitor = BoardMonitor(self.photo1, min_area=self._params()["min_area"])
+
         self.lbl_tools_ref.configure(
             text=f"🔧 Herramientas detectadas: {self.tools_in_reference}"
         )
@@ -843,83 +725,85 @@ class CamDiffApp:
         self.status.configure(
             text=f"✓ Foto 1 capturada | {self.tools_in_reference} herramientas detectadas"
         )
-        self.last_result = None
-        self.save_btn.configure(state="disabled")
-
-    def _maybe_align(self, f1, f2):
-        if not self.var_align.get():
-            return f2
-        aligned, ok = align_ecc(f1, f2)
-        return aligned
 
-    def take_photo2_compare(self):
-        if self.photo1 is None:
+    def take_photo2_compare(self, t0=None):
+        """t0: perf_counter del mensaje MQTT que disparó la comparación (None = botón)."""
+        trace = Trace(t0)
+        if t0 is not None:
+            trace.mark("disparo")  # del hilo de MQTT al hilo de Tk
+        if self.photo1 is None and not self.jobs.pending("reference"):
             self.status.configure(text="⚠ Primero toma Foto 1")
             return
-        if self.current_frame is None:
+        with trace.stage("captura"):
+            frame, _, _ = self.ring.latest()
+        if frame is None:
             self.status.configure(text="⚠ No hay frame")
             return
-
-        photo2_raw = self._apply_roi(self.current_frame.copy())
-        photo2 = self._maybe_align(self.photo1, photo2_raw)
-
-        blur_slider = int(round(self.var_blur.get()))
-        blur = ensure_odd(blur_slider) if blur_slider > 0 else 0
-        morph = int(round(self.var_morph.get()))
-        thresh = int(round(self.var_thresh.get()))
-        mode = self.var_mode.get()
-
-        # Comparación base
-        if mode == "AbsDiff":
-            mask, base_view, changed, pct = compare_absdiff(
-                self.photo1, photo2, blur=blur, thresh=thresh, morph=morph
-            )
-            mask_or_map = mask
-        elif mode == "SSIM (mapa)":
-            mask, base_view, changed, pct = compare_ssim(
-                self.photo1, photo2, blur=blur, thresh=thresh, morph=morph
-            )
-            mask_or_map = base_view
+        with trace.stage("roi"):
+            photo2_raw = self._apply_roi(frame).copy()
+
+        # Con un solo hilo los trabajos corren en orden: si hay una referencia
+        # en curso, la comparación la toma cuando le toque (ver _compare_job)
+        job = self.jobs.submit("compare", self._compare_job, photo2_raw, self._params(),
+                               self.var_mode.get(), self.var_align.get(), self.var_boxes.get(),
+                               self.var_gate.get(), trace,
+                               on_done=self._on_compare_done, on_error=self._on_job_error,
+                               on_progress=self._on_job_progress,
+                               supersede=("compare",))
+        if job is None:
+            self.status.configure(text="⚠ Cola de inspección llena, intenta de nuevo")
+
+    def _compare_job(self, photo2_raw, params, mode, align, smart, gate, trace, check, progress):
+        # Corre en el pool: lee la referencia al empezar, no al encolar
+        trace.mark("cola")
+        reference = self._current_reference()
+        if reference is None:
+            raise RuntimeError("Primero toma Foto 1")
+        if "inspector" in reference:
+            inspector = reference["inspector"]
+            result = slot_pipeline(inspector, photo2_raw, check=check, progress=progress, trace=trace)
+            with trace.stage("visualizacion"):
+                render_slots(inspector, result)
         else:
-            mask, base_view, changed, pct = compare_edges(
-                self.photo1, photo2, blur=blur, thresh=thresh, morph=morph
+            result = compare_pipeline(reference["photo1"], photo2_raw, params,
+                                      reference=reference["model"], mode=mode, align=align, smart=smart,
+                                      gate=gate, render=False, check=check, progress=progress,
+                                      trace=trace)
+            with trace.stage("visualizacion"):
+                render_views(result)
+        result["trace"] = trace
+        return result
+
+    def _on_compare_done(self, result):
+        mode = result["mode"]
+        score_final = result["score"]
+        photo2 = result["photo2"]
+        mask = result["mask"]
+        changed = result["changed"]
+        diff_view = result["diff_view"]
+
+        if "slot_states" in result:
+            states = result["slot_states"]
+            extra_txt = (
+                "🧰 Slots: " + " | ".join(f"{'✓' if s['present'] else '✗'} {s['name']}" for s in states) + "\n"
+                f"💡 Score: {score_final:.1f}% (slots faltantes / total)"
             )
-            mask_or_map = mask
-
-        diff_view = base_view
-        extra_txt = ""
-        score_final = 0.0
-
-        if self.var_boxes.get():
-            # MODO INTELIGENTE
-            overlay, add_cnt, rem_cnt, total_area, score_intelligent, tools_photo2 = \
-                detect_added_removed_smart(
-                    self.photo1, photo2,
-                    blur=blur, thresh=thresh,
-                    morph=morph, min_area=int(self.var_min_area.get()),
-                    tools_in_reference=self.tools_in_reference
-                )
-            diff_view = overlay
-            score_final = score_intelligent
-            
-            tools_missing = max(0, self.tools_in_reference - tools_photo2) if self.tools_in_reference else 0
-            
+        elif "tools_photo2" in result:
+            missing = result.get("missing_slots")
+            slots_txt = f"🧰 Slots faltantes: {', '.join(map(str, missing))}\n" if missing else ""
             extra_txt = (
-                f"🔧 Herramientas: Ref={self.tools_in_reference} | Actual={tools_photo2} | Faltan={tools_missing}\n"
-                f"📊 Añadidos: {add_cnt} | Removidos: {rem_cnt}\n"
-                f"💡 Score: {score_intelligent:.1f}% (70% conteo + 30% área×12)"
+                f"🔧 Herramientas: Ref={result['tools_reference']} | Actual={result['tools_photo2']} | Faltan={result['tools_missing']}\n"
+                f"📊 Añadidos: {result['added']} | Removidos: {result['removed']}\n"
+                f"{slots_txt}"
+                f"💡 Score: {score_final:.1f}% (70% conteo + 30% área×12)"
             )
         else:
-            # Modo simple
-            total_pixels = mask.size
-            pct_area = (changed / float(total_pixels)) * 100.0
-            score_final = min(pct_area * 12.0, 100.0)
             extra_txt = f"📊 Score (área ×12): {score_final:.1f}%"
 
         ts = datetime.now().strftime("%Y%m%d-%H%M%S")
         self.last_result = (
             mask, diff_view, changed, score_final, ts,
-            self.photo1.copy(), photo2.copy()
+            result["photo1"], photo2
         )
         
         # Interpretación
@@ -932,18 +816,95 @@ class CamDiffApp:
         else:
             interpretation = "❌ CRÍTICO - Faltan varias"
         
-        self.status.configure(text=f"[{mode}] {interpretation} | Score: {score_final:.1f}%")
+        trace = result["trace"]
+        trace.mark("entrega")  # del pool al hilo de Tk
         self.save_btn.configure(state="normal")
 
-        self._publish_score(score_final, ts=ts, mode=mode)
+        with trace.stage("publicacion"):
+            self._publish_score(score_final, ts=ts, mode=mode)
 
-        if self.comp_win is None or not self.comp_win.winfo_exists():
-            self.comp_win = ComparisonWindow(self.root, max_w=520)
-        self.comp_win.update_images(
-            self.photo1, photo2, mask_or_map, diff_view,
-            score_final, changed, extra_txt=extra_txt
-        )
-        self.comp_win.lift()
+        with trace.stage("visualizacion"):
+            if self.comp_win is None or not self.comp_win.winfo_exists():
+                self.comp_win = ComparisonWindow(self.root, max_w=520)
+            self.comp_win.update_images(
+                result["photo1"], photo2, result["mask_or_map"], diff_view,
+                score_final, changed, extra_txt=extra_txt
+            )
+            self.comp_win.lift()
+
+        self.last_trace = dict(trace.finish())
+        self.latency.record(trace)
+        self.latency.publish(getattr(self, "mqtt", None), self.mqtt_metrics_topic)
+        align_txt = " | ⚠ Sin alinear" if result.get("align") == "falló" else ""
+        if result.get("rects") == []:
+            align_txt += " | Sin cambios"
+        elif result.get("rects"):
+            align_txt += f" | {len(result['rects'])} zona(s) cambiada(s)"
+        self.status.configure(
+            text=f"[{mode}] {interpretation} | Score: {score_final:.1f}%{align_txt}\n"
+                 f"⏱ {self.last_trace['total']:.0f} ms | {self.latency.status_text()}")
+
+    # --- Monitoreo continuo ---
+    def toggle_monitor(self):
+        if self.var_monitor.get():
+            self._start_monitor()
+        else:
+            self._stop_monitor()
+            self.status.configure(text="🎥 Monitoreo continuo apagado")
+
+    def _start_monitor(self):
+        if self.photo1 is None:
+            self.var_monitor.set(False)
+            self.status.configure(text="⚠ Primero toma Foto 1")
+            return
+        # El ROI se fija al arrancar: el hilo no debe leer variables de Tk
+        roi = self.roi if self.var_use_roi.get() and self.roi is not None else None
+        crop = (lambda img: img[roi[1]:roi[1] + roi[3], roi[0]:roi[0] + roi[2]]) if roi else None
+        monitor = BoardMonitor(self.photo1, min_area=self._params()["min_area"])
+        self.monitor_thread = MonitorThread(self.ring, monitor, self._on_monitor_stable, crop=crop)
+        self.monitor_thread.start()
+        self.status.configure(text="🎥 Monitoreo continuo activo")
+
+    def _stop_monitor(self):
+        if self.monitor_thread is not None:
+            self.monitor_thread.stop()
+            self.monitor_thread = None
+
+    def _on_monitor_stable(self, frame, t):
+        # Corre en el hilo del monitor: los parámetros se leen en el hilo de Tk
+        self.root.after(0, lambda: self._submit_monitor(frame))
+
+    def _submit_monitor(self, frame):
+        if self.monitor_thread is None:
+            return
+        self.jobs.submit("monitor", self._monitor_job, frame, self._params(), self.var_align.get(),
+                         self.var_gate.get(),
+                         on_done=self._on_monitor_done, on_error=self._on_job_error,
+                         supersede=("monitor",))
+
+    def _monitor_job(self, frame, params, align, gate, check, progress):
+        reference = self._current_reference()
+        if reference is None:
+            raise RuntimeError("Primero toma Foto 1")
+        if "inspector" in reference:
+            return slot_pipeline(reference["inspector"], frame, check=check)
+        return compare_pipeline(reference["photo1"], frame, params, reference=reference["model"],
+                                mode=None, align=align, gate=gate, render=False, check=check)
+
+    def _on_monitor_done(self, result):
+        if self.monitor_thread is None:
+            return
+        events = self.monitor_thread.monitor.apply(result)
+        self._publish_score(result["score"], mode="Continuo")
+        if not events:
+            return
+        self._publish_events(events)
+        for e in events:
+            print(f"[Monitor] {e['ts']} {e['evento']}: {e['herramienta']}")
+        txt = " | ".join(f"{'⬆ Retiro' if e['evento'] == 'retiro' else '⬇ Devolución'} {e['herramienta']}"
+                         for e in events)
+        self.status.configure(text=f"🎥 {txt} ({events[0]['ts'][11:]}) | "
+                                   f"Score: {result['score']:.1f}% | {self.monitor_thread.fps:.0f} FPS")
 
     def save_results(self):
         if self.last_result is None:
@@ -960,11 +921,15 @@ class CamDiffApp:
             "tools_reference": self.tools_in_reference,
             "changed_pixels": int(changed),
             "modo": self.var_mode.get(),
+            "latencia_ms": {k: round(v, 2) for k, v in (self.last_trace or {}).items()},
             "config": {
                 "umbral": int(self.var_thresh.get()),
                 "blur": int(self.var_blur.get()),
                 "morph": int(self.var_morph.get()),
-                "min_area": int(self.var_min_area.get())
+                "min_area": int(self.var_min_area.get()),
+                "escala": DETECTION_SCALES[self.var_det_scale.get()],
+                "mosaicos": bool(self.var_gate.get()),
+                **self.profile_extra
             }
         }
         (out / f"{ts}_meta.json").write_text(
@@ -973,6 +938,12 @@ class CamDiffApp:
         self.status.configure(text=f"💾 Guardado en: {out.resolve()}")
 
     def reset(self):
+        self._stop_monitor()
+        self.var_monitor.set(False)
+        self.jobs.cancel_all()
+        with self._reference_lock:
+            self._reference = None
+            self._reference_gen += 1
         self.photo1 = None
         self.last_result = None
         self.tools_in_reference = None
@@ -982,8 +953,11 @@ class CamDiffApp:
 
     def on_close(self):
         try:
-            if self.cap is not None:
-                self.cap.release()
+            if self.latency.count:
+                self.latency.dump_json(self.outdir / "latencias.json")
+            self.jobs.shutdown()
+            self._stop_monitor()
+            self._stop_capture()
         except Exception:
             pass
         try:
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Captura en un hilo propio con buffer circular de frames.
+
+El hilo de captura escribe cada frame directamente en el siguiente slot de un
+buffer circular preasignado (cap.read(slot) reutiliza la memoria), y los
+consumidores (vista previa de la GUI, fotos, servidor de inspección) sólo
+toman el frame más nuevo. Así una comparación lenta no frena la captura y la
+captura no frena la interfaz.
+
+Las fuentes (FrameSource) entregan frames con hora a un ritmo configurable:
+cámara, video, carpeta de imágenes o frames sintéticos en memoria. Con las
+tres últimas la GUI, cam_diff.py y el servidor corren sin cámara, y las
+mediciones de throughput y latencia se repiten igual en cualquier máquina.
+"""
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+MAX_READ_FAILURES = 40   # lecturas fallidas seguidas (~2 s) antes de dar la fuente por perdida
+
+
+# ---------- Fuentes de imágenes ----------
+class FrameSource:
+    """
+    Fuente de frames con hora: cámara, video, carpeta o frames en memoria.
+
+    read(out) devuelve (ok, frame, t) con t en time.monotonic(), el mismo
+    reloj que usan el FrameRing y las estadísticas de latencia. Si se da
+    `fps`, read() espera lo necesario para entregar a ese ritmo (las cámaras
+    ya llevan su propio ritmo). Con loop=True los archivos vuelven a empezar
+    al terminar; si no, `ended` queda en True.
+    """
+
+    live = False
+
+    def __init__(self, fps=None, loop=True):
+        self.fps = fps
+        self.loop = loop
+        self.ended = False
+        self.index = 0  # frames entregados
+        self._next_t = None
+
+    def open(self):
+        return True
+
+    def _grab(self, out):
+        raise NotImplementedError
+
+    def _rewind(self):
+        return False
+
+    def read(self, out=None):
+        ok, frame = self._grab(out)
+        if (not ok or frame is None) and self.loop and self._rewind():
+            ok, frame = self._grab(out)
+        if not ok or frame is None:
+            self.ended = not self.live
+            return False, None, 0.0
+        if self.fps and not self.live:
+            period = 1.0 / self.fps
+            now = time.monotonic()
+            self._next_t = now if self._next_t is None else max(self._next_t + period, now - period)
+            time.sleep(max(0.0, self._next_t - now))
+        self.index += 1
+        return True, frame, time.monotonic()
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class DeviceSource(FrameSource):
+    """Cámara por índice. En Windows usa DirectShow y, si no abre, el backend por defecto."""
+
+    live = True
+
+    def __init__(self, index=0, width=None, height=None, fps=None, backend=None):
+        super().__init__(fps=fps, loop=False)
+        self.device = int(index)
+        self.width, self.height = width, height
+        if backend is None:
+            backend = cv2.CAP_DSHOW if sys.platform == "win32" else cv2.CAP_ANY
+        self.backend = backend
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.device, self.backend)
+        if not self.cap.isOpened() and self.backend != cv2.CAP_ANY:
+            self.cap = cv2.VideoCapture(self.device)  # reintento sin forzar backend
+        if not self.cap.isOpened():
+            return False
+        if self.width and self.height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            # pedir MJPG para mejorar compatibilidad y FPS en Windows
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+        if self.fps:
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+        return True
+
+    def _grab(self, out):
+        return self.cap.read(out) if out is not None else self.cap.read()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class VideoSource(FrameSource):
+    """Archivo de video; por defecto a los FPS del archivo."""
+
+    def __init__(self, path, fps=None, loop=True):
+        super().__init__(fps=fps, loop=loop)
+        self.path = str(path)
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            return False
+        self.fps = self.fps or self.cap.get(cv2.CAP_PROP_FPS) or 10.0
+        return True
+
+    def _grab(self, out):
+        return self.cap.read(out) if out is not None else self.cap.read()
+
+    def _rewind(self):
+        return self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class FolderSource(FrameSource):
+    """Carpeta de imágenes en orden alfabético (10 FPS por defecto)."""
+
+    def __init__(self, folder, fps=10.0, loop=True):
+        super().__init__(fps=fps, loop=loop)
+        self.paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in IMAGE_EXTS)
+        self._i = 0
+
+    def open(self):
+        return bool(self.paths)
+
+    def _grab(self, out):
+        # Las imágenes que no se pueden leer se saltan: sólo el final de la
+        # carpeta hace volver al principio
+        while self._i < len(self.paths):
+            frame = cv2.imread(str(self.paths[self._i]))
+            self._i += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def _rewind(self):
+        self._i = 0
+        return bool(self.paths)
+
+
+class SyntheticSource(FrameSource):
+    """
+    Frames en memoria: una lista de imágenes o una función i -> imagen.
+    Sirve para medir el pipeline sin cámara (mismos frames en cada corrida).
+    """
+
+    def __init__(self, frames, fps=30.0, loop=True, count=None):
+        super().__init__(fps=fps, loop=loop)
+        self.frames = frames
+        self.count = len(frames) if count is None and not callable(frames) else count
+        self._i = 0
+
+    def _grab(self, out):
+        if self.count is not None and self._i >= self.count:
+            return False, None
+        frame = self.frames(self._i) if callable(self.frames) else self.frames[self._i]
+        self._i += 1
+        return frame is not None, frame
+
+    def _rewind(self):
+        self._i = 0
+        return True
+
+
+def synthetic_frames(width=1280, height=720, n=8, seed=0):
+    """Tablero de prueba (fondo claro con herramientas oscuras) con `n` variantes de ruido."""
+    rng = np.random.default_rng(seed)
+    base = np.full((height, width, 3), 200, np.uint8)
+    for _ in range(6):
+        w, h = rng.integers(width // 16, width // 5), rng.integers(height // 16, height // 4)
+        x, y = rng.integers(20, width - w - 20), rng.integers(20, height - h - 20)
+        cv2.rectangle(base, (int(x), int(y)), (int(x + w), int(y + h)), (45, 45, 45), -1)
+    frames = []
+    for _ in range(n):
+        noise = rng.normal(0, 4, base.shape).astype(np.int16)
+        frames.append(np.clip(base + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def open_source(spec, width=None, height=None, fps=None, backend=None):
+    """
+    FrameSource a partir de: índice de cámara (0, "1"), archivo de video,
+    carpeta de imágenes, "synthetic" o una FrameSource ya creada.
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    if isinstance(spec, int) or str(spec).isdigit():
+        return DeviceSource(int(spec), width, height, fps=fps, backend=backend)
+    if str(spec).lower() in ("synthetic", "sintetico", "sintético"):
+        return SyntheticSource(synthetic_frames(width or 1280, height or 720), fps=fps or 30.0)
+    if os.path.isdir(spec):
+        return FolderSource(spec, fps=fps or 10.0)
+    return VideoSource(spec, fps=fps)
+
+
+def list_devices(max_index=10, backend=None):
+    """Índices de cámara que abren y entregan un frame."""
+    found = []
+    for i in range(max_index + 1):
+        src = DeviceSource(i, backend=backend)
+        try:
+            if src.open() and src.read()[0]:
+                found.append(i)
+        finally:
+            src.release()
+    return found
+
+
+# ---------- Buffer circular ----------
+class FrameRing:
+    """
+    Buffer circular de `size` frames preasignados.
+
+    Sólo hay un escritor (el hilo de captura) y siempre escribe en el slot
+    siguiente al más nuevo, así que `latest()` devuelve un frame que no se
+    toca durante los próximos size-1 frames. Quien lo necesite por más tiempo
+    (foto de referencia, comparación en otro hilo) debe pedir `copy=True`.
+    """
+
+    def __init__(self, size=4):
+        if size < 3:
+            raise ValueError("El buffer necesita al menos 3 slots.")
+        self.size = size
+        self.slots = [None] * size
+        self.times = [0.0] * size
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def write_from(self, source):
+        """Lee un frame de la FrameSource directo al siguiente slot. Devuelve False si falla."""
+        i = (self.seq + 1) % self.size
+        ok, frame, t = source.read(self.slots[i])
+        if not ok or frame is None:
+            return False
+        if self.slots[0] is None or frame.shape != self.slots[0].shape:
+            # Primer frame (o cambio de resolución): preasignar todos los slots
+            self.slots = [np.empty_like(frame) for _ in range(self.size)]
+        if frame is not self.slots[i]:
+            np.copyto(self.slots[i], frame)
+        with self.lock:
+            self.times[i] = t
+            self.seq += 1
+        return True
+
+    def latest(self, copy=False):
+        """(frame, timestamp monotónico de la fuente, número de secuencia) del frame más nuevo."""
+        with self.lock:
+            seq = self.seq
+            if seq == 0:
+                return None, 0.0, 0
+            i = seq % self.size
+            frame, t = self.slots[i], self.times[i]
+        return (frame.copy() if copy else frame), t, seq
+
+
+class CaptureThread(threading.Thread):
+    """Lee continuamente de una FrameSource (o de lo que acepte open_source) y escribe en un FrameRing."""
+
+    def __init__(self, source, ring=None, width=None, height=None, fps=None, name="captura"):
+        super().__init__(name=name, daemon=True)
+        self.source = source
+        self.ring = ring or FrameRing()
+        self.width, self.height = width, height
+        self.fps = fps
+        self.opened = threading.Event()
+        self.first_frame = threading.Event()
+        self.failed = False
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=timeout)
+
+    def wait_ready(self, timeout=5.0):
+        """
+        Espera a que la fuente abra y entregue su primer frame. False si no
+        abrió o si pasó `timeout` sin ningún frame.
+        """
+        deadline = time.monotonic() + timeout
+        self.opened.wait(timeout=timeout)
+        while not self.failed and self.is_alive():
+            remaining = deadline - time.monotonic()
+            if self.first_frame.wait(timeout=min(max(remaining, 0.0), 0.05)) or remaining <= 0:
+                break
+        return self.first_frame.is_set() and not self.failed
+
+    def run(self):
+        source = open_source(self.source, self.width, self.height, fps=self.fps)
+        if not source.open():
+            self.failed = True
+            self.error = f"No se pudo abrir {self.source}"
+            self.opened.set()
+            return
+        self.opened.set()
+        failures = 0
+        try:
+            while not self._stop_event.is_set():
+                if self.ring.write_from(source):
+                    self.first_frame.set()
+                    failures = 0
+                    continue
+                failures += 1
+                if source.ended and source.index:
+                    break  # archivo sin loop: se terminó
+                if source.ended or failures >= MAX_READ_FAILURES:
+                    # Video ilegible o cámara que dejó de entregar: no quedarse girando
+                    self.failed = True
+                    self.error = (f"No se pudo leer de {self.source} "
+                                  f"({failures} lecturas fallidas seguidas)")
+                    print(f"✗ {self.error}")
+                    break
+                time.sleep(0.05)
+        finally:
+            source.release()
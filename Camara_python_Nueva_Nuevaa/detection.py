@@ -0,0 +1,886 @@
+# -*- coding: utf-8 -*-
+"""
+Funciones de detección del Sistema 5S (sin interfaz gráfica).
+Las usan cam_gui_tk.py y el servidor de inspección sin pantalla
+(inspection_server.py), así que aquí no se importa tkinter.
+"""
+
+import threading
+from functools import lru_cache, partial
+
+import cv2
+import numpy as np
+
+# ---------- Utilidades ----------
+def ensure_odd(x: int) -> int:
+    return x if x % 2 == 1 else x + 1
+
+# ---------- Preprocesado compartido ----------
+class FramePrep:
+    """
+    Preprocesados de un frame (gris, blur, CLAHE, bordes, pirámide) calculados
+    una sola vez y guardados por parámetro. Todas las funciones de detección
+    aceptan uno (prep / prep1 / prep2); si no se da, crean uno propio y el
+    resultado es el mismo. La referencia lo guarda para todas las comparaciones.
+    """
+
+    def __init__(self, img):
+        self.img = img
+        self._cache = {}
+
+    def _memo(self, key, fn):
+        out = self._cache.get(key)
+        if out is None:
+            out = self._cache[key] = fn()
+        return out
+
+    def gray(self):
+        return self._memo("gray", lambda: cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY))
+
+    def blurred(self, blur):
+        k = _kernel(blur)
+        if not k:
+            return self.gray()
+        return self._memo(("blur", k), lambda: cv2.GaussianBlur(self.gray(), (k, k), 0))
+
+    def clahe(self, blur):
+        # Ecualización más agresiva (clipLimit 3.0)
+        return self._memo(("clahe", _kernel(blur)), lambda: cv2.createCLAHE(
+            clipLimit=CLAHE_CLIP, tileGridSize=(CLAHE_GRID, CLAHE_GRID)).apply(self.blurred(blur)))
+
+    def scaled(self, scale):
+        """FramePrep de la imagen reducida a 1/scale (INTER_AREA), para la detección en pirámide."""
+        if scale <= 1:
+            return self
+        if scale % 2 == 0 and scale > 2:
+            # Mitades sucesivas: INTER_AREA a 1/2 es mucho más rápido que a 1/4 directo
+            return self._memo(("scaled", scale), lambda: self.scaled(2).scaled(scale // 2))
+        h, w = self.img.shape[:2]
+        return self._memo(("scaled", scale), lambda: FramePrep(cv2.resize(
+            self.img, (w // scale, h // scale), interpolation=cv2.INTER_AREA)))
+
+    def float32(self, blur, scale=1):
+        """Gris suavizado en float32; con scale > 1, reducido (INTER_AREA) para el SSIM rápido."""
+        if scale > 1:
+            return self._memo(("f32", _kernel(blur), scale), lambda: cv2.resize(
+                self.float32(blur), None, fx=1.0 / scale, fy=1.0 / scale, interpolation=cv2.INTER_AREA))
+        return self._memo(("f32", _kernel(blur)), lambda: self.blurred(blur).astype(np.float32))
+
+    def ssim_stats(self, blur, scale=1, ksize=11, sigma=1.5, box=False):
+        """Medias y varianzas locales del SSIM; la referencia las calcula una sola vez."""
+        return self._memo(("ssim", _kernel(blur), scale, ksize, sigma, box),
+                          lambda: ssim_stats(self.float32(blur, scale), ksize, sigma, box))
+
+    def edges(self, blur):
+        return self._memo(("canny", _kernel(blur)), lambda: cv2.Canny(self.blurred(blur), 50, 150))
+
+    def tile_stats(self, tile):
+        """Media y desviación estándar del gris por mosaico de tile×tile (filas × columnas, float32)."""
+        def build():
+            g = self.gray()
+            h, w = g.shape
+            rows, cols = -(-h // tile), -(-w // tile)
+            if (rows * tile, cols * tile) != (h, w):
+                g = cv2.copyMakeBorder(g, 0, rows * tile - h, 0, cols * tile - w, cv2.BORDER_REPLICATE)
+            f = g.astype(np.float32)
+            # INTER_AREA con factor entero = promedio exacto de cada bloque
+            mean = cv2.resize(f, (cols, rows), interpolation=cv2.INTER_AREA)
+            sq = cv2.resize(cv2.multiply(f, f), (cols, rows), interpolation=cv2.INTER_AREA)
+            return mean, np.sqrt(np.maximum(sq - mean * mean, 0.0))
+        return self._memo(("tiles", tile), build)
+
+    def pyramid(self, levels, blur=5):
+        """[nivel 0 (completo), 1/2, 1/4, ...] de la imagen gris suavizada."""
+        def build():
+            pyr = [self.blurred(blur)]
+            for _ in range(levels - 1):
+                pyr.append(cv2.pyrDown(pyr[-1]))
+            return pyr
+        return self._memo(("pyr", levels, _kernel(blur)), build)
+
+
+def _kernel(blur):
+    """Tamaño de kernel de blur (impar) o 0 si no se suaviza."""
+    if not blur or blur <= 1:
+        return 0
+    return blur if blur % 2 else blur + 1
+
+
+def _prep(img, prep):
+    return prep if prep is not None else FramePrep(img)
+
+CLAHE_CLIP, CLAHE_GRID = 3.0, 8
+
+# ---------- SSIM ----------
+SSIM_C1, SSIM_C2 = (0.01*255)**2, (0.03*255)**2
+
+# Buffers de trabajo del SSIM por hilo y por tamaño (el servidor compara en varios hilos)
+_ssim_local = threading.local()
+
+
+def _ssim_buffers(shape):
+    cache = getattr(_ssim_local, "buffers", None)
+    if cache is None:
+        cache = _ssim_local.buffers = {}
+    bufs = cache.get(shape)
+    if bufs is None:
+        if len(cache) >= 8:  # mosaicos de tamaños distintos: no crecer sin límite
+            cache.clear()
+        bufs = cache[shape] = [np.empty(shape, np.float32) for _ in range(4)]
+    return bufs
+
+
+def _local_mean(src, ksize, sigma, box, dst=None):
+    # Filtro separable (GaussianBlur = sepFilter2D optimizado) o de caja
+    if box:
+        return cv2.boxFilter(src, -1, (ksize, ksize), dst=dst)
+    return cv2.GaussianBlur(src, (ksize, ksize), sigma, dst=dst)
+
+
+def ssim_stats(gray, ksize=11, sigma=1.5, box=False):
+    """(mu, mu², sigma²) locales de una imagen float32."""
+    mu = _local_mean(gray, ksize, sigma, box)
+    mu_sq = mu * mu
+    sigma_sq = _local_mean(gray * gray, ksize, sigma, box)
+    sigma_sq -= mu_sq
+    return mu, mu_sq, sigma_sq
+
+
+def _ssim_into(gray1, gray2, stats1, ksize, sigma, box, out):
+    mu1, mu1_sq, sigma1_sq = stats1
+    mu2, tmp, sigma2_sq, sigma12 = _ssim_buffers(gray1.shape)
+    _local_mean(gray2, ksize, sigma, box, dst=mu2)
+    np.multiply(gray2, gray2, out=tmp)
+    _local_mean(tmp, ksize, sigma, box, dst=sigma2_sq)
+    np.multiply(gray1, gray2, out=tmp)
+    _local_mean(tmp, ksize, sigma, box, dst=sigma12)
+    # out = 2*mu1*mu2 + C1 ; sigma12 = 2*(E[g1g2] - mu1*mu2) + C2
+    np.multiply(mu1, mu2, out=out)
+    np.subtract(sigma12, out, out=sigma12)
+    np.multiply(sigma12, 2.0, out=sigma12)
+    np.add(sigma12, SSIM_C2, out=sigma12)
+    np.multiply(out, 2.0, out=out)
+    np.add(out, SSIM_C1, out=out)
+    np.multiply(out, sigma12, out=out)                 # numerador
+    np.multiply(mu2, mu2, out=tmp)                     # mu2²
+    np.subtract(sigma2_sq, tmp, out=sigma2_sq)         # sigma2²
+    np.add(tmp, mu1_sq, out=tmp)
+    np.add(tmp, SSIM_C1, out=tmp)
+    np.add(sigma2_sq, sigma1_sq, out=sigma2_sq)
+    np.add(sigma2_sq, SSIM_C2, out=sigma2_sq)
+    np.multiply(tmp, sigma2_sq, out=tmp)               # denominador
+    np.add(tmp, 1e-12, out=tmp)
+    np.divide(out, tmp, out=out)
+    np.clip(out, 0, 1, out=out)
+    return out
+
+
+def ssim_map(gray1, gray2, ksize=11, sigma=1.5, box=False, stats1=None, rects=None, out=None):
+    """
+    Mapa SSIM (0..1) de dos imágenes gris float32.
+
+    box: filtro de caja en lugar de gaussiano (más rápido, algo menos suave).
+    stats1: ssim_stats de gray1 ya calculadas (la referencia las guarda).
+    rects: sólo calcula dentro de esos (x, y, w, h); el resto queda en 1.
+    out: array float32 donde escribir el resultado (si no, se crea uno).
+    Los intermedios se reutilizan entre llamadas del mismo hilo.
+    """
+    if out is None:
+        out = np.empty(gray1.shape, np.float32)
+    if stats1 is None:
+        stats1 = ssim_stats(gray1, ksize, sigma, box)
+    if rects is None:
+        return _ssim_into(gray1, gray2, stats1, ksize, sigma, box, out)
+
+    # Por mosaicos: cada uno con un margen de medio kernel para que el centro sea exacto
+    out.fill(1.0)
+    pad = ksize // 2
+    H, W = gray1.shape[:2]
+    for x, y, w, h in rects:
+        x0, y0 = max(x - pad, 0), max(y - pad, 0)
+        x1, y1 = min(x + w + pad, W), min(y + h + pad, H)
+        sub = (slice(y0, y1), slice(x0, x1))
+        tile = _ssim_into(gray1[sub], gray2[sub], [s[sub] for s in stats1], ksize, sigma, box,
+                          np.empty((y1 - y0, x1 - x0), np.float32))
+        out[y:y + h, x:x + w] = tile[y - y0:y - y0 + h, x - x0:x - x0 + w]
+    return out
+
+# ---------- Buffers y limpieza de máscaras ----------
+def _buf(buffers, name, shape, dtype=np.uint8):
+    """
+    Buffer de salida `name` del dict `buffers` (se crea o se rehace si cambia
+    el tamaño). Sin `buffers` devuelve None y OpenCV asigna uno nuevo.
+    """
+    if buffers is None:
+        return None
+    b = buffers.get(name)
+    if b is None or b.shape != shape or b.dtype != dtype:
+        b = buffers[name] = np.empty(shape, dtype)
+    return b
+
+@lru_cache(maxsize=None)
+def _ellipse(morph):
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph, morph))
+
+def _open_close(mask, morph):
+    """Apertura + cierre en el mismo buffer."""
+    if morph and morph > 1:
+        kernel = _ellipse(morph)
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, dst=mask, iterations=1)
+        cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, dst=mask, iterations=1)
+    return mask
+
+def _result(mask, renderer, changed, pct, render):
+    """
+    (mask, vista, cambiados, pct). Con render=False la vista es una función
+    sin argumentos que la dibuja cuando haga falta (ver pipeline.render_views).
+    """
+    return mask, (renderer() if render else renderer), changed, pct
+
+# ---------- Visualizaciones (sólo cuando se muestran o se guardan) ----------
+def render_change(gray, mask):
+    """Imagen gris en color con los píxeles cambiados en rojo."""
+    view = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    view[mask > 0] = [0, 0, 255]
+    return view
+
+def render_ssim(change, mask):
+    """Mapa de calor del cambio (1 - SSIM) con las zonas de la máscara teñidas de rojo."""
+    heat = (change * 255).astype(np.uint8)
+    heat_col = cv2.applyColorMap(heat, cv2.COLORMAP_JET)
+
+    red_img = np.zeros_like(heat_col, dtype=np.uint8); red_img[:] = (0, 0, 255)
+    blended = cv2.addWeighted(heat_col, 0.6, red_img, 0.4, 0)
+    heat_col[mask > 0] = blended[mask > 0]
+    return heat_col
+
+# ---------- Comparaciones base ----------
+# render=False: no se dibuja nada (servidor, lotes); buffers: dict donde se
+# reutilizan las máscaras entre llamadas (la vista perezosa y la máscara
+# devueltas sólo valen hasta la siguiente llamada con el mismo dict).
+def compare_absdiff(img1, img2, blur=5, thresh=30, morph=5, prep1=None, prep2=None,
+                    rects=None, render=True, buffers=None):
+    if img1.shape != img2.shape:
+        raise ValueError("Tamaños distintos.")
+    if rects is not None:
+        return _absdiff_rects(_prep(img1, prep1), _prep(img2, prep2), blur, thresh, morph, rects,
+                              render, buffers)
+    g1 = _prep(img1, prep1).blurred(blur)
+    g2 = _prep(img2, prep2).blurred(blur)
+    diff = cv2.absdiff(g1, g2, dst=_buf(buffers, "diff", g1.shape))
+    _, mask = cv2.threshold(diff, thresh, 255, cv2.THRESH_BINARY, dst=_buf(buffers, "mask", g1.shape))
+    _open_close(mask, morph)
+    changed = cv2.countNonZero(mask)
+    pct = (changed / max(mask.size, 1)) * 100.0
+    return _result(mask, partial(render_change, diff, mask), changed, pct, render)
+
+def compare_ssim(img1, img2, blur=5, thresh=30, morph=5, prep1=None, prep2=None,
+                 scale=1, box=False, rects=None, render=True, buffers=None):
+    """
+    scale: calcula el SSIM a 1/scale de resolución (con la ventana también
+        reducida, para medir la misma zona) y amplía el mapa. Modo en vivo.
+    box / rects: ver ssim_map (rects en coordenadas de la imagen completa).
+    """
+    if img1.shape != img2.shape:
+        raise ValueError("Tamaños distintos.")
+    prep1 = _prep(img1, prep1)
+    g1 = prep1.float32(blur, scale)
+    ksize, sigma = 11, 1.5
+    if scale > 1:
+        ksize, sigma = ensure_odd(max(3, ksize // scale)), sigma / scale
+        if rects is not None:
+            rects = [(x // scale, y // scale, -(-w // scale), -(-h // scale)) for x, y, w, h in rects]
+    change = ssim_map(g1, _prep(img2, prep2).float32(blur, scale),
+                      ksize=ksize, sigma=sigma, box=box, rects=rects,
+                      stats1=prep1.ssim_stats(blur, scale, ksize, sigma, box),
+                      out=_buf(buffers, "ssim", g1.shape, np.float32))
+    np.subtract(1.0, change, out=change)
+    full = img1.shape[:2]
+    if scale > 1:
+        change = cv2.resize(change, (full[1], full[0]), dst=_buf(buffers, "ssim_full", full, np.float32),
+                            interpolation=cv2.INTER_LINEAR)
+    thr = float(np.clip(thresh / 255.0, 0.0, 1.0))
+    mask = cv2.compare(change, thr, cv2.CMP_GE, dst=_buf(buffers, "mask", full))  # 0/255 sin pasar por bool
+    _open_close(mask, morph)
+
+    changed = cv2.countNonZero(mask)
+    pct = cv2.mean(change)[0] * 100.0
+    return _result(mask, partial(render_ssim, change, mask), changed, pct, render)
+
+def compare_edges(img1, img2, blur=5, thresh=30, morph=5, prep1=None, prep2=None,
+                  rects=None, render=True, buffers=None):
+    if img1.shape != img2.shape:
+        raise ValueError("Tamaños distintos.")
+    prep2 = _prep(img2, prep2)
+    if rects is not None:
+        return _edges_rects(_prep(img1, prep1), prep2, blur, morph, rects, render, buffers)
+    g2 = prep2.blurred(blur)
+    e1 = _prep(img1, prep1).edges(blur)
+    e2 = prep2.edges(blur)
+    # Canny da 0/255, así que el xor ya es la máscara
+    mask = cv2.bitwise_xor(e1, e2, dst=_buf(buffers, "mask", e1.shape))
+    if morph and morph > 1:
+        cv2.morphologyEx(mask, cv2.MORPH_CLOSE, _ellipse(morph), dst=mask, iterations=1)
+    changed = cv2.countNonZero(mask)
+    pct = (changed / max(mask.size, 1)) * 100.0
+    return _result(mask, partial(render_change, g2, mask), changed, pct, render)
+
+# ========== Contador de objetos MÁS SENSIBLE ==========
+# Valores por defecto de los filtros y del score (tune.py los puede ajustar y
+# guardar en un perfil; ver pipeline.load_profile)
+SMART_MIN_THRESH = 30    # umbral mínimo de la diferencia con signo (antes era 45)
+MAX_ASPECT = 8.0         # Antes era 5.0
+MIN_COMPACTNESS = 0.10   # Antes era 0.15
+AREA_FACTOR = 12.0       # Aumentado de x10 a x12
+BORDER = 15              # Antes era 20
+ADAPTIVE_BLOCK, ADAPTIVE_C = 15, 5   # Reducido de 21,10 a 15,5
+
+def count_tools_in_image(img, blur=5, thresh=30, morph=5, min_area=1500, prep=None,
+                         max_aspect=MAX_ASPECT, min_compactness=MIN_COMPACTNESS, scale=1, gate=None):
+    """
+    Cuenta las herramientas/objetos detectados en una imagen.
+    VERSIÓN MÁS SENSIBLE para mejor detección.
+    """
+    tools = find_tools(img, blur=blur, morph=morph, min_area=min_area, prep=prep,
+                       max_aspect=max_aspect, min_compactness=min_compactness, scale=scale, gate=gate)
+    areas = [t[1] for t in tools]
+    return len(areas), areas
+
+def find_tools(img, blur=5, morph=5, min_area=1500, prep=None,
+               max_aspect=MAX_ASPECT, min_compactness=MIN_COMPACTNESS, scale=1, gate=None):
+    """
+    Contornos de las herramientas de una imagen: lista de (contorno, área, bbox).
+    Se guarda en el FramePrep, así que contar y emparejar la misma imagen
+    no repite el trabajo. Con scale > 1 se busca en la pirámide (ver
+    pyramid_tool_stats).
+
+    gate = (prep de la referencia, rects de changed_rects): sólo se busca
+    dentro de los rects y fuera de ellos se toman las herramientas de la
+    referencia. Queda guardado con la misma llave, así que las llamadas
+    siguientes sobre este FramePrep (conteo, emparejado) lo reusan.
+    """
+    prep = _prep(img, prep)
+    key = ("tools", _kernel(blur), morph, min_area, max_aspect, min_compactness, scale)
+    if gate is not None:
+        ref_prep, rects = gate
+        ref_tools = find_tools(ref_prep.img, blur=blur, morph=morph, min_area=min_area, prep=ref_prep,
+                               max_aspect=max_aspect, min_compactness=min_compactness, scale=scale)
+        return prep._memo(key, lambda: gated_tools(prep, ref_tools, rects, blur, morph, min_area,
+                                                   max_aspect, min_compactness))
+    if scale > 1:
+        stats = lambda: pyramid_tool_stats(prep, blur, morph, min_area, scale)
+    else:
+        stats = lambda: region_stats(tool_mask(prep, blur, morph), min_area)
+    return prep._memo(key, lambda: filter_regions(stats(), min_area, max_aspect, min_compactness))
+
+def tool_mask(prep, blur, morph, block=ADAPTIVE_BLOCK, border=BORDER):
+    """Máscara binaria de objetos (antes de filtrar contornos)."""
+    # Blur + ecualización adaptativa MÁS AGRESIVA (clipLimit 3.0, antes 2.0)
+    g = prep.clahe(blur)
+    
+    # Umbralización adaptativa MÁS SENSIBLE
+    binary = cv2.adaptiveThreshold(g, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                    cv2.THRESH_BINARY_INV, block, ADAPTIVE_C)
+    
+    # Morfología MENOS agresiva para no perder objetos (1 vez, no 2)
+    _open_close(binary, morph)
+    
+    # Limpiar bordes (reducido)
+    _clear_border(binary, border)
+    return binary
+
+def _clear_border(mask, border=BORDER):
+    mask[:border, :] = 0
+    mask[-border:, :] = 0
+    mask[:, :border] = 0
+    mask[:, -border:] = 0
+
+def region_stats(binary, min_area=0):
+    """
+    Contornos de una máscara con área >= min_area y sus medidas de forma:
+    lista de (contorno, área, bbox, aspecto, compacidad). Separado del filtro
+    para que tune.py pueda probar varios filtros sobre los mismos contornos.
+    """
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    
+    stats = []
+    for c in contours:
+        area = cv2.contourArea(c)
+        if area >= min_area:
+            stats.append(_contour_stats(c, area))
+    return stats
+
+def filter_regions(stats, min_area=1500, max_aspect=MAX_ASPECT, min_compactness=MIN_COMPACTNESS):
+    """Regiones que parecen herramienta: lista de (contorno, área, bbox)."""
+    # Filtros MÁS PERMISIVOS (aspecto y compacidad)
+    return [(c, area, bbox) for c, area, bbox, aspect, compactness in stats
+            if area >= min_area and aspect <= max_aspect and compactness >= min_compactness]
+
+# ---------- Detección MEJORADA y MÁS SENSIBLE ----------
+def draw_regions(img, regions):
+    """Overlay de detect_added_removed_smart: regions = [(lista de regiones, color, etiqueta), ...]."""
+    overlay = img.copy()
+    for valid_contours, color_bgr, label in regions:
+        for c, area, (x, y, w, h) in valid_contours:
+            cv2.rectangle(overlay, (x, y), (x+w, y+h), color_bgr, 3)
+            roi = overlay[y:y+h, x:x+w]
+            tint = np.full_like(roi, color_bgr, dtype=np.uint8)
+            cv2.addWeighted(tint, 0.3, roi, 0.7, 0, dst=roi)
+            
+            label_text = f"{label}"
+            (text_w, text_h), _ = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
+            cv2.rectangle(overlay, (x, y-text_h-10), (x+text_w+4, y), color_bgr, -1)
+            cv2.putText(overlay, label_text, (x+2, y-6), 
+                       cv2.FONT_HERSHEY_SIMPLEX,
+                       0.7, (255, 255, 255), 2, cv2.LINE_AA)
+    return overlay
+
+def smart_masks(prep1, prep2, blur=5, thresh=30, morph=5, min_thresh=SMART_MIN_THRESH, buffers=None,
+                border=BORDER):
+    """Máscaras (añadido, removido) de la diferencia con signo entre referencia y actual."""
+    # Blur reducido para más detalle + ecualización más agresiva
+    g1 = prep1.clahe(blur)
+    g2 = prep2.clahe(blur)
+    
+    # Diferencias con signo
+    pos = cv2.subtract(g2, g1, dst=_buf(buffers, "pos", g1.shape))
+    neg = cv2.subtract(g1, g2, dst=_buf(buffers, "neg", g1.shape))
+
+    # Umbral MÁS BAJO para mayor sensibilidad
+    thr_loc = max(thresh, min_thresh)
+
+    _, add_mask = cv2.threshold(pos, thr_loc, 255, cv2.THRESH_BINARY, dst=pos)
+    _, rem_mask = cv2.threshold(neg, thr_loc, 255, cv2.THRESH_BINARY, dst=neg)
+
+    # Morfología MENOS agresiva (1 vez)
+    _open_close(add_mask, morph)
+    _open_close(rem_mask, morph)
+
+    # Limpiar bordes (reducido)
+    _clear_border(add_mask, border)
+    _clear_border(rem_mask, border)
+    return add_mask, rem_mask
+
+def smart_score(tools_in_reference, tools_photo2, removed, total_area, total_pixels,
+                area_factor=AREA_FACTOR):
+    """Score inteligente: 70% conteo + 30% área×area_factor (mínimo 20 si hay removidos)."""
+    if tools_in_reference is not None and tools_in_reference > 0:
+        # Método 1: Basado en conteo
+        tools_missing = max(0, tools_in_reference - tools_photo2)
+        score_by_count = (tools_missing / tools_in_reference) * 100.0
+        
+        # Método 2: Basado en área (multiplicador aumentado)
+        pct_area = (total_area / float(total_pixels)) * 100.0
+        score_by_area = pct_area * area_factor
+        
+        # Combinar (70% conteo, 30% área) y limitar
+        score_intelligent = min((score_by_count * 0.70) + (score_by_area * 0.30), 100.0)
+        
+        # Garantizar score mínimo si hay objetos removidos
+        if removed > 0:
+            score_intelligent = max(score_intelligent, 20.0)  # Aumentado de 15 a 20
+        return score_intelligent
+    # Fallback
+    pct_area = (total_area / float(total_pixels)) * 100.0
+    return min(pct_area * area_factor, 100.0)
+
+def detect_added_removed_smart(img1, img2, blur=5, thresh=30, morph=5, min_area=1500,
+                               tools_in_reference=None, prep1=None, prep2=None,
+                               render=True, buffers=None, min_thresh=SMART_MIN_THRESH,
+                               max_aspect=MAX_ASPECT, min_compactness=MIN_COMPACTNESS,
+                               area_factor=AREA_FACTOR, scale=1, rects=None):
+    """
+    Versión MÁS SENSIBLE para detectar mejor las herramientas.
+    Con render=False el overlay es una función que lo dibuja (ver compare_*).
+    Con scale = 2 las máscaras se calculan a 1/2 y sólo las
+    regiones candidatas se afinan a resolución completa.
+    Con rects (changed_rects) sólo se mira dentro de esos rectángulos, a
+    resolución completa; fuera se da por igual a la referencia.
+    """
+    prep1, prep2 = _prep(img1, prep1), _prep(img2, prep2)
+    gate = None
+    if rects is not None:
+        gate = (prep1, rects)
+        add_stats, rem_stats = smart_crop_stats(prep1, prep2, [_corners(r) for r in rects], blur,
+                                                thresh, morph, min_area, min_thresh, buffers=buffers)
+    elif scale > 1:
+        add_stats, rem_stats = pyramid_smart_stats(prep1, prep2, blur, thresh, morph,
+                                                   min_area, scale, min_thresh=min_thresh, buffers=buffers)
+    else:
+        add_mask, rem_mask = smart_masks(prep1, prep2, blur, thresh, morph,
+                                         min_thresh=min_thresh, buffers=buffers)
+        add_stats, rem_stats = region_stats(add_mask, min_area), region_stats(rem_mask, min_area)
+
+    # Mismos filtros (área, aspecto, compacidad) que el contador de herramientas
+    shape = dict(min_area=min_area, max_aspect=max_aspect, min_compactness=min_compactness)
+    added_regions = filter_regions(add_stats, **shape)
+    removed_regions = filter_regions(rem_stats, **shape)
+    added, removed = len(added_regions), len(removed_regions)
+    total_area = sum(r[1] for r in added_regions) + sum(r[1] for r in removed_regions)
+    overlay = partial(draw_regions, img2, [(added_regions, (0, 255, 0), "Añadido"),
+                                           (removed_regions, (255, 0, 0), "Removido")])
+    if render:
+        overlay = overlay()
+    
+    # ========== CÁLCULO INTELIGENTE DEL SCORE ==========
+    tools_photo2, _ = count_tools_in_image(img2, blur=blur, thresh=thresh, morph=morph,
+                                           prep=prep2, scale=scale, gate=gate, **shape)
+    score_intelligent = smart_score(tools_in_reference, tools_photo2, removed, total_area,
+                                    img1.shape[0] * img1.shape[1], area_factor)
+    
+    return overlay, added, removed, total_area, score_intelligent, tools_photo2
+
+# ---------- Detección en pirámide ----------
+# Las herramientas miden miles de píxeles: las máscaras se calculan a 1/2 de
+# resolución (kernels, borde y área mínima escalados) y sólo las cajas
+# candidatas, con un margen, se vuelven a umbralizar a resolución completa.
+# En los recortes el blur y el CLAHE dan los mismos valores que en la imagen
+# completa (el CLAHE se calcula sobre mosaicos enteros de la grilla, con los
+# vecinos que usa la interpolación), así que las máscaras sólo pueden diferir junto a los
+# bordes interiores del recorte (umbral adaptativo y morfología). Un contorno
+# que llega a esa franja hace crecer el recorte hasta cubrirlo entero; si los
+# recortes terminan cubriendo buena parte de la imagen se calcula la imagen
+# entera. Los contornos encontrados son los mismos de la resolución completa;
+# sólo se puede perder una herramienta que no aparezca en la imagen reducida.
+PYRAMID_MARGIN = 24          # px (resolución completa) alrededor de cada candidata
+PYRAMID_GUARD = 16           # px junto a un borde interior donde la máscara puede no ser exacta
+PYRAMID_AREA_SLACK = 0.5     # en la imagen reducida se acepta la mitad del área mínima (de la caja)
+PYRAMID_MAX_FRACTION = 0.5   # si los recortes cubren más, se calcula la imagen entera
+PYRAMID_MAX_ROUNDS = 8       # veces que pueden crecer los recortes
+
+def _scaled_kernel(k, scale):
+    """Kernel (blur, morfología, bloque) equivalente a 1/scale: impar, o 0 si queda en 1."""
+    k = int(round(k / float(scale))) if k else 0
+    return ensure_odd(k) if k > 1 else 0
+
+def _coarse_boxes(mask, scale, min_area):
+    """
+    Cajas (en resolución completa) de los contornos de una máscara reducida.
+    Se filtra por el área de la caja y no la del contorno: un contorno que
+    en la reducida quedó abierto puede cerrarse a resolución completa.
+    """
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = [tuple(v * scale for v in cv2.boundingRect(c)) for c in contours]
+    return [b for b in boxes if b[2] * b[3] >= min_area * PYRAMID_AREA_SLACK]
+
+def _merge_boxes(boxes, shape, margin=PYRAMID_MARGIN):
+    """Cajas con margen (x0, y0, x1, y1), recortadas a la imagen y unidas si se traslapan."""
+    H, W = shape[:2]
+    rects = [[max(x - margin, 0), max(y - margin, 0), min(x + w + margin, W), min(y + h + margin, H)]
+             for x, y, w, h in boxes]
+    merged = True
+    while merged:
+        merged, out = False, []
+        for r in rects:
+            for o in out:
+                if r[0] < o[2] and o[0] < r[2] and r[1] < o[3] and o[1] < r[3]:
+                    o[:] = [min(o[0], r[0]), min(o[1], r[1]), max(o[2], r[2]), max(o[3], r[3])]
+                    merged = True
+                    break
+            else:
+                out.append(r)
+        rects = out
+    return [tuple(r) for r in rects]
+
+def _grow_rects(rects, boxes, shape, margin=PYRAMID_MARGIN):
+    """Recortes (x0, y0, x1, y1) más las cajas (x, y, w, h) con margen, unidos si se traslapan."""
+    return _merge_boxes([(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in rects] +
+                        [(x - margin, y - margin, w + 2 * margin, h + 2 * margin) for x, y, w, h in boxes],
+                        shape, margin=0)
+
+def _area(rects):
+    return sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+
+def _blurred_crop(prep, blur, rect):
+    """
+    Gris suavizado de un recorte, igual al de la imagen completa: del
+    FramePrep si ya está calculado; si no, se suaviza el recorte con el
+    medio kernel de más alrededor y se descarta ese borde.
+    """
+    x0, y0, x1, y1 = rect
+    k = _kernel(blur)
+    full = prep._cache.get(("blur", k) if k else "gray")
+    if full is not None:
+        return full[y0:y1, x0:x1]
+    H, W = prep.img.shape[:2]
+    p = k // 2
+    X0, Y0, X1, Y1 = max(x0 - p, 0), max(y0 - p, 0), min(x1 + p, W), min(y1 + p, H)
+    g = cv2.cvtColor(prep.img[Y0:Y1, X0:X1], cv2.COLOR_BGR2GRAY)
+    if k:
+        g = cv2.GaussianBlur(g, (k, k), 0)
+    return g[y0 - Y0:y1 - Y0, x0 - X0:x1 - X0]
+
+def _clahe_crop(prep, blur, rect):
+    """
+    CLAHE de un recorte, igual al de la imagen completa. Se aplica a la zona
+    de mosaicos enteros de la grilla que cubre el recorte y los vecinos que
+    usa su interpolación: mismos histogramas, mismo resultado. Si la zona es grande o la imagen no se divide en mosaicos
+    exactos, se usa el CLAHE de la imagen completa.
+    """
+    x0, y0, x1, y1 = rect
+    H, W = prep.img.shape[:2]
+    k = _kernel(blur)
+    full = prep._cache.get(("clahe", k))
+    if full is None and W % CLAHE_GRID == 0 and H % CLAHE_GRID == 0:
+        tw, th = W // CLAHE_GRID, H // CLAHE_GRID
+        # Mosaicos que interpola algún píxel del recorte (el vecino sólo en la mitad cercana)
+        tx0, ty0 = max((2 * x0 - tw) // (2 * tw), 0), max((2 * y0 - th) // (2 * th), 0)
+        tx1 = min((2 * (x1 - 1) + tw) // (2 * tw) + 1, CLAHE_GRID)
+        ty1 = min((2 * (y1 - 1) + th) // (2 * th) + 1, CLAHE_GRID)
+        zone = (tx0 * tw, ty0 * th, tx1 * tw, ty1 * th)
+        if _area([zone]) <= PYRAMID_MAX_FRACTION * H * W:
+            g = prep._memo(("clahe_zone", k, zone), lambda: cv2.createCLAHE(
+                clipLimit=CLAHE_CLIP, tileGridSize=(tx1 - tx0, ty1 - ty0)).apply(_blurred_crop(prep, blur, zone)))
+            return g[y0 - zone[1]:y1 - zone[1], x0 - zone[0]:x1 - zone[0]]
+    return prep.clahe(blur)[y0:y1, x0:x1]
+
+def _clear_border_crop(mask, rect, shape, border=BORDER):
+    """_clear_border de la imagen completa aplicado a la máscara de un recorte."""
+    x0, y0, x1, y1 = rect
+    H, W = shape[:2]
+    mask[:max(border - y0, 0), :] = 0
+    mask[:, :max(border - x0, 0)] = 0
+    if y1 > H - border:
+        mask[H - border - y0:, :] = 0
+    if x1 > W - border:
+        mask[:, W - border - x0:] = 0
+
+def _contour_stats(c, area, offset=(0, 0)):
+    """(contorno, área, bbox, aspecto, compacidad) de region_stats, desplazado por `offset`."""
+    x, y, w, h = cv2.boundingRect(c)
+    aspect_ratio = max(w, h) / max(min(w, h), 1)
+    perimeter = cv2.arcLength(c, True)
+    compactness = 4 * np.pi * area / (perimeter ** 2) if perimeter > 0 else np.inf
+    if offset != (0, 0):
+        c = c + np.int32(offset)
+    return c, area, (x + offset[0], y + offset[1], w, h), aspect_ratio, compactness
+
+def _crop_regions(mask, rect, shape, min_area):
+    """
+    region_stats de un recorte en coordenadas de la imagen y las cajas de los
+    contornos que llegan a la franja PYRAMID_GUARD de un borde interior (no
+    se cuentan: el recorte tiene que crecer para verlos enteros).
+    """
+    x0, y0, x1, y1 = rect
+    H, W = shape[:2]
+    g = PYRAMID_GUARD
+    stats, grow = [], []
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for c in contours:
+        x, y, w, h = cv2.boundingRect(c)
+        if (x0 > 0 and x < g) or (y0 > 0 and y < g) or \
+           (x1 < W and x + w > x1 - x0 - g) or (y1 < H and y + h > y1 - y0 - g):
+            grow.append((x + x0, y + y0, w, h))
+            continue
+        area = cv2.contourArea(c)
+        if area >= min_area:
+            stats.append(_contour_stats(c, area, (x0, y0)))
+    return stats, grow
+
+def _refine(shape, rects, crop_masks, n_masks, min_area):
+    """
+    region_stats de las `n_masks` máscaras que da crop_masks(rect) en cada
+    recorte (x0, y0, x1, y1), iguales a las de la imagen completa: los
+    recortes crecen hasta que ningún contorno quede junto a un borde
+    interior. Devuelve (lista de stats por máscara, recortes finales), o
+    None si los recortes pasan de PYRAMID_MAX_FRACTION de la imagen.
+    """
+    H, W = shape[:2]
+    done = {}
+    for _ in range(PYRAMID_MAX_ROUNDS):
+        if _area(rects) > PYRAMID_MAX_FRACTION * H * W:
+            return None
+        grow = []
+        for rect in rects:
+            if rect not in done:
+                done[rect] = [_crop_regions(m, rect, shape, min_area) for m in crop_masks(rect)]
+            grow += [b for _, boxes in done[rect] for b in boxes]
+        if not grow:
+            out = [[] for _ in range(n_masks)]
+            for rect in rects:
+                for i, (stats, _) in enumerate(done[rect]):
+                    out[i] += stats
+            return out, rects
+        rects = _grow_rects(rects, grow, shape)
+    return None
+
+def _tool_crop_masks(prep, blur, morph, rect):
+    """tool_mask de un recorte (x0, y0, x1, y1)."""
+    binary = cv2.adaptiveThreshold(_clahe_crop(prep, blur, rect), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                   cv2.THRESH_BINARY_INV, ADAPTIVE_BLOCK, ADAPTIVE_C)
+    _open_close(binary, morph)
+    _clear_border_crop(binary, rect, prep.img.shape)
+    return [binary]
+
+def _smart_crop_masks(prep1, prep2, blur, thresh, morph, min_thresh, rect):
+    """Máscaras (añadido, removido) de smart_masks en un recorte (x0, y0, x1, y1)."""
+    g1, g2 = _clahe_crop(prep1, blur, rect), _clahe_crop(prep2, blur, rect)
+    masks = []
+    for a, b in ((g2, g1), (g1, g2)):
+        _, mask = cv2.threshold(cv2.subtract(a, b), max(thresh, min_thresh), 255, cv2.THRESH_BINARY)
+        _open_close(mask, morph)
+        _clear_border_crop(mask, rect, prep1.img.shape)
+        masks.append(mask)
+    return masks
+
+def pyramid_tool_stats(prep, blur, morph, min_area, scale):
+    """Como region_stats(tool_mask(...)), pero buscando en la imagen reducida a 1/scale."""
+    coarse = tool_mask(prep.scaled(scale), _scaled_kernel(blur, scale), _scaled_kernel(morph, scale),
+                       block=_scaled_kernel(ADAPTIVE_BLOCK, scale) or 3, border=BORDER // scale)
+    rects = _merge_boxes(_coarse_boxes(coarse, scale, min_area), prep.img.shape)
+    refined = _refine(prep.img.shape, rects, partial(_tool_crop_masks, prep, blur, morph), 1, min_area)
+    if refined is None:
+        return region_stats(tool_mask(prep, blur, morph), min_area)
+    return refined[0][0]
+
+def pyramid_smart_stats(prep1, prep2, blur, thresh, morph, min_area, scale,
+                        min_thresh=SMART_MIN_THRESH, buffers=None):
+    """region_stats de las máscaras (añadido, removido) de smart_masks, buscando a 1/scale."""
+    add_small, rem_small = smart_masks(prep1.scaled(scale), prep2.scaled(scale),
+                                       _scaled_kernel(blur, scale), thresh, _scaled_kernel(morph, scale),
+                                       min_thresh=min_thresh, buffers=buffers, border=BORDER // scale)
+    boxes = _coarse_boxes(add_small, scale, min_area) + _coarse_boxes(rem_small, scale, min_area)
+    return smart_crop_stats(prep1, prep2, _merge_boxes(boxes, prep1.img.shape), blur, thresh, morph,
+                            min_area, min_thresh, buffers=buffers)
+
+def smart_crop_stats(prep1, prep2, rects, blur, thresh, morph, min_area, min_thresh=SMART_MIN_THRESH,
+                     buffers=None):
+    """
+    region_stats de (añadido, removido) buscando sólo en los recortes
+    (x0, y0, x1, y1), que crecen si hace falta (ver _refine). Si terminan
+    cubriendo buena parte de la imagen, se calcula la imagen entera.
+    """
+    crop = partial(_smart_crop_masks, prep1, prep2, blur, thresh, morph, min_thresh)
+    refined = _refine(prep1.img.shape, rects, crop, 2, min_area)
+    if refined is None:
+        add_mask, rem_mask = smart_masks(prep1, prep2, blur, thresh, morph, min_thresh=min_thresh,
+                                         buffers=buffers)
+        return region_stats(add_mask, min_area), region_stats(rem_mask, min_area)
+    return refined[0]
+
+# ---------- Compuerta por mosaicos ----------
+# Casi todo el tablero es igual entre la referencia y el frame actual. Antes
+# de la comparación se mide la media y la desviación del gris por mosaico
+# (las de la referencia quedan en su FramePrep) y sólo los mosaicos que
+# cambiaron, con un margen, pasan a compare_* y a la detección inteligente.
+# Sin mosaicos cambiados la inspección termina ahí con score 0.
+TILE = 32                # px por lado de cada mosaico
+TILE_THRESH = 5.0        # diferencia de media o de desviación (niveles de gris)
+TILE_MARGIN = 32         # px alrededor de los mosaicos cambiados
+TILE_MAX_FRACTION = 0.5  # si los rectángulos cubren más, se procesa la imagen entera
+
+def changed_tiles(prep1, prep2, tile=TILE, thresh=TILE_THRESH):
+    """Mosaicos (filas × columnas, bool) cuya media o desviación cambió más de `thresh`."""
+    mean1, std1 = prep1.tile_stats(tile)
+    mean2, std2 = prep2.tile_stats(tile)
+    diff = mean2 - mean1
+    diff -= np.median(diff)  # cambio de luz de todo el tablero
+    return (np.abs(diff) > thresh) | (np.abs(std2 - std1) > thresh)
+
+def changed_rects(prep1, prep2, tile=TILE, thresh=TILE_THRESH, margin=TILE_MARGIN,
+                  max_fraction=TILE_MAX_FRACTION):
+    """
+    Rectángulos (x, y, w, h) que cubren los mosaicos cambiados más `margin`,
+    unidos si se traslapan. Lista vacía = nada cambió; None = cambió más de
+    `max_fraction` de la imagen y conviene procesarla entera (recortar ya
+    no ahorra nada).
+    """
+    changed = changed_tiles(prep1, prep2, tile, thresh)
+    if not changed.any():
+        return []
+    n, _, stats, _ = cv2.connectedComponentsWithStats(changed.view(np.uint8), connectivity=8)
+    boxes = [tuple(int(v) * tile for v in stats[i, :4]) for i in range(1, n)]
+    rects = [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in _merge_boxes(boxes, prep1.img.shape, margin)]
+    H, W = prep1.img.shape[:2]
+    if sum(w * h for _, _, w, h in rects) > max_fraction * H * W:
+        return None
+    return rects
+
+def _corners(rect):
+    x, y, w, h = rect
+    return x, y, x + w, y + h
+
+def _overlaps(box, rect):
+    """box (x, y, w, h) traslapa rect (x0, y0, x1, y1)."""
+    x, y, w, h = box
+    return x < rect[2] and rect[0] < x + w and y < rect[3] and rect[1] < y + h
+
+def _mask_in_rects(shape, rects, crop_mask, buffers=None, name="mask"):
+    """Máscara de la imagen completa: crop_mask(rect) en cada rect (x, y, w, h), 0 en el resto."""
+    mask = _buf(buffers, name, shape[:2])
+    if mask is None:
+        mask = np.zeros(shape[:2], np.uint8)
+    else:
+        mask.fill(0)
+    for rect in rects:
+        x0, y0, x1, y1 = _corners(rect)
+        mask[y0:y1, x0:x1] = crop_mask((x0, y0, x1, y1))
+    return mask
+
+def _absdiff_rects(prep1, prep2, blur, thresh, morph, rects, render, buffers):
+    """compare_absdiff sólo dentro de los rects."""
+    def crop_diff(rect):
+        return cv2.absdiff(_blurred_crop(prep1, blur, rect), _blurred_crop(prep2, blur, rect))
+
+    def crop_mask(rect):
+        _, m = cv2.threshold(crop_diff(rect), thresh, 255, cv2.THRESH_BINARY)
+        return _open_close(m, morph)
+
+    shape = prep1.img.shape
+    mask = _mask_in_rects(shape, rects, crop_mask, buffers)
+    changed = cv2.countNonZero(mask)
+    pct = (changed / max(mask.size, 1)) * 100.0
+    # La vista necesita la diferencia: se recalcula sólo si se dibuja
+    view = lambda: render_change(_mask_in_rects(shape, rects, crop_diff), mask)
+    return _result(mask, view, changed, pct, render)
+
+def _edges_crop(prep, blur, rect):
+    """Canny de un recorte (del FramePrep si ya está calculado)."""
+    x0, y0, x1, y1 = rect
+    full = prep._cache.get(("canny", _kernel(blur)))
+    if full is not None:
+        return full[y0:y1, x0:x1]
+    return cv2.Canny(_blurred_crop(prep, blur, rect), 50, 150)
+
+def _edges_rects(prep1, prep2, blur, morph, rects, render, buffers):
+    """compare_edges sólo dentro de los rects."""
+    def crop_mask(rect):
+        m = cv2.bitwise_xor(_edges_crop(prep1, blur, rect), _edges_crop(prep2, blur, rect))
+        if morph and morph > 1:
+            cv2.morphologyEx(m, cv2.MORPH_CLOSE, _ellipse(morph), dst=m, iterations=1)
+        return m
+
+    mask = _mask_in_rects(prep1.img.shape, rects, crop_mask, buffers)
+    changed = cv2.countNonZero(mask)
+    pct = (changed / max(mask.size, 1)) * 100.0
+    return _result(mask, partial(render_change, prep2.gray(), mask), changed, pct, render)
+
+def gated_tools(prep, ref_tools, rects, blur, morph, min_area,
+                max_aspect=MAX_ASPECT, min_compactness=MIN_COMPACTNESS):
+    """
+    Herramientas de la imagen de `prep` buscando sólo en los rects (x, y, w, h):
+    fuera de ellos son las de la referencia (`ref_tools`, de find_tools).
+    Una herramienta de la referencia que toca un rect se vuelve a buscar
+    entera (el rect crece hasta cubrirla).
+    """
+    shape = prep.img.shape
+    crop = partial(_tool_crop_masks, prep, blur, morph)
+    areas = [_corners(r) for r in rects]
+    touched, stats, first = set(), [], True
+    while areas:
+        # Hasta que los recortes (que crecen al refinar) no toquen otra herramienta de la referencia
+        new = {i for i, (_, _, bbox) in enumerate(ref_tools)
+               if i not in touched and any(_overlaps(bbox, a) for a in areas)}
+        if not new and not first:
+            break
+        first = False
+        touched |= new
+        areas = _grow_rects(areas, [ref_tools[i][2] for i in new], shape)
+        refined = _refine(shape, areas, crop, 1, min_area)
+        if refined is None:
+            # Cambió casi todo: se buscan en la imagen entera
+            return filter_regions(region_stats(tool_mask(prep, blur, morph), min_area),
+                                  min_area, max_aspect, min_compactness)
+        (stats,), areas = refined
+    kept = [t for i, t in enumerate(ref_tools) if i not in touched]
+    return kept + filter_regions(stats, min_area, max_aspect, min_compactness)
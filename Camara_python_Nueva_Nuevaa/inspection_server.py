@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor de inspección 5S sin interfaz gráfica, para varias estaciones.
+
+Cada estación tiene su propia fuente de imágenes (cámara, video, carpeta de
+imágenes o "synthetic" para pruebas, ver capture.py), su hilo de captura, su foto de referencia y su ROI.
+Las comparaciones (detect_added_removed_smart) de todas las estaciones se
+ejecutan en un pool de hilos compartido (OpenCV libera el GIL) y el score se
+publica en datos/score/<estacion>. Con "slots" (JSON de polígonos, ver
+slots.py) la estación sólo compara los recortes de cada herramienta, y
+con "profile" usa los parámetros ajustados por tune.py. Con "monitor"
+(monitor.py) además se vigila cada frame y se inspecciona cuando el tablero
+cambió y quedó quieto; los retiros y devoluciones se publican en
+datos/eventos/<estacion>.
+
+Cada inspección registra el tiempo de sus etapas (cola, alineado,
+comparación, conteo, detección, publicación, total desde el frame) en
+histogramas (metrics.py); el resumen p50/p95/p99 se imprime, se publica en
+datos/metricas/<estacion> y se guarda con --stats-json.
+
+Uso:
+    python inspection_server.py --config stations.example.json
+    python inspection_server.py --source 0 --source pruebas/tablero2 --no-mqtt
+    python inspection_server.py --source 0 --interval 0 --monitor
+    python inspection_server.py --source synthetic --no-mqtt --duration 30 --stats-json bench.json
+
+Disparadores MQTT (igual que cam_gui_tk.py):
+    camara/estadoTurno[/<estacion>]  true  -> nueva referencia
+                                     false -> comparar ahora
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+from capture import CaptureThread
+from detection import ensure_odd
+from metrics import LatencyStats
+from monitor import BoardMonitor, MonitorThread
+from pipeline import reference_pipeline, compare_pipeline, slot_pipeline, load_profile
+from slots import SlotInspector, load_slots
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # sin paho se puede correr con --no-mqtt
+    mqtt = None
+
+SCORE_TOPIC = "datos/score"
+EVENTS_TOPIC = "datos/eventos"
+METRICS_TOPIC = "datos/metricas"
+TRIGGER_TOPIC = "camara/estadoTurno"
+
+
+# ---------- Estación ----------
+class Station:
+    def __init__(self, name, source, roi=None, reference=None, interval=1.0,
+                 width=1280, height=720, fps=None, blur=5, thresh=35, morph=5,
+                 min_area=1500, align=True, slots=None, profile=None, monitor=False, scale=1,
+                 gate=True):
+        self.name = name
+        self.source = source
+        self.roi = tuple(roi) if roi else None
+        self.interval = interval
+        self.width, self.height = width, height
+        self.fps = fps
+        self.params = dict(blur=ensure_odd(blur) if blur > 0 else 0, thresh=thresh,
+                           morph=morph, min_area=min_area, scale=scale)
+        if profile:
+            # Perfil de tune.py: manda sobre blur/thresh/morph/min_area de la config
+            self.params.update(load_profile(profile))
+        self.align = align
+        # Compuerta por mosaicos: sólo se compara lo que cambió respecto de la referencia
+        self.gate = gate
+        # JSON de polígonos (slots.py): inspección sólo de los recortes de cada herramienta
+        self.slots = load_slots(slots) if slots else None
+        self.inspector = None
+        # Monitoreo continuo: el BoardMonitor se arma con cada referencia
+        self.monitor = monitor
+        self.board = None
+        self.monitor_thread = None
+
+        self.reference = None
+        self.model = None
+        self.tools_in_reference = None
+        self.reference_path = reference
+        self.want_reference = reference is None
+        self.want_compare = False
+
+        self.capture = None
+        self.busy = False
+        self.last_submit = 0.0
+        self.last_score = None
+        self.last_missing = []
+        self.stats = LatencyStats()
+        self.buffers = {}  # máscaras reutilizadas entre inspecciones (una a la vez por estación)
+
+    # --- Captura ---
+    def start(self):
+        if self.reference_path:
+            # Imagen ya recortada al ROI, como el *_photo1_ref.png de save_results
+            self.set_reference(cv2.imread(str(self.reference_path)), crop=False)
+        self.capture = CaptureThread(self.source, width=self.width, height=self.height,
+                                     fps=self.fps, name=f"captura-{self.name}")
+        self.capture.start()
+        if not self.capture.wait_ready(timeout=10.0):
+            print(f"✗ [{self.name}] No se pudo abrir la fuente {self.source} (sin frames)")
+            self.capture.stop()
+        else:
+            print(f"✓ [{self.name}] Fuente {self.source} abierta")
+            if self.board is not None:
+                self._watch(self.reference)
+
+    def stop(self):
+        if self.monitor_thread is not None:
+            self.monitor_thread.stop()
+        if self.capture is not None:
+            self.capture.stop()
+
+    def latest(self):
+        """Copia del frame más nuevo: la inspección lo usa mientras la captura sigue."""
+        return self.capture.ring.latest(copy=True)
+
+    def apply_roi(self, img):
+        if self.roi is None:
+            return img
+        x, y, w, h = self.roi
+        return img[y:y + h, x:x + w]
+
+    # --- Referencia y comparación (corren en el pool) ---
+    def set_reference(self, frame, crop=True):
+        ref = self.apply_roi(frame).copy() if crop else frame
+        if self.slots:
+            self.inspector = SlotInspector(ref, self.slots, blur=self.params["blur"],
+                                           thresh=self.params["thresh"])
+            self.reference, self.tools_in_reference = ref, len(self.inspector.items)
+            print(f"📷 [{self.name}] Referencia tomada | {self.tools_in_reference} slots")
+        else:
+            r = reference_pipeline(ref, self.params)
+            self.reference, self.model, self.tools_in_reference = ref, r["model"], r["tools_in_reference"]
+            tools = r["tools_in_reference"]
+            print(f"📷 [{self.name}] Referencia tomada | {tools} herramientas detectadas")
+        if self.monitor:
+            self._watch(ref)
+
+    def _watch(self, ref):
+        self.board = BoardMonitor(ref, min_area=self.params["min_area"])
+        if self.monitor_thread is not None:
+            self.monitor_thread.monitor = self.board
+            return
+        if self.capture is None:
+            return  # referencia desde archivo: el hilo arranca en start()
+
+        def on_stable(frame, t):
+            self.want_compare = True  # el servidor toma el frame más nuevo (ya quieto)
+        self.monitor_thread = MonitorThread(self.capture.ring, self.board, on_stable,
+                                            crop=self.apply_roi, name=f"monitor-{self.name}")
+        self.monitor_thread.start()
+
+    def inspect(self, frame):
+        if self.inspector is not None:
+            r = slot_pipeline(self.inspector, self.apply_roi(frame))
+            return {"score": r["score"], "added": 0, "removed": r["removed"],
+                    "tools": r["tools_photo2"], "tools_reference": self.tools_in_reference,
+                    "missing_slots": r["missing_slots"], "ms": r["ms"]}
+        r = compare_pipeline(self.reference, self.apply_roi(frame), self.params,
+                             reference=self.model, mode=None, align=self.align, gate=self.gate,
+                             render=False, buffers=self.buffers)
+        return {"score": r["score"], "added": r["added"], "removed": r["removed"],
+                "tools": r["tools_photo2"], "tools_reference": self.tools_in_reference,
+                "missing_slots": r["missing_slots"], "ms": r["ms"]}
+
+
+# ---------- Servidor ----------
+class InspectionServer:
+    def __init__(self, stations, workers=None, mqtt_client=None, report_every=10.0):
+        self.stations = {s.name: s for s in stations}
+        self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                       thread_name_prefix="inspeccion")
+        self.mqtt = mqtt_client
+        self.report_every = report_every
+        self.stop_event = threading.Event()
+
+    def trigger(self, name, value):
+        """Disparador externo: True = nueva referencia, False = comparar ahora."""
+        targets = self.stations.values() if name is None else [self.stations.get(name)]
+        for st in targets:
+            if st is None:
+                continue
+            if value:
+                st.want_reference = True
+            else:
+                st.want_compare = True
+
+    def _submit(self, st, now, due):
+        if st.capture.ring.seq == 0:
+            return
+        if st.busy:
+            # Una sola inspección en curso por estación: si se atrasa, se salta
+            # ese turno (los disparadores MQTT quedan pendientes)
+            if due:
+                st.stats.skip()
+                st.last_submit = now
+            return
+        if not st.want_reference and st.reference is None:
+            return
+        frame, t_frame, _ = st.latest()
+        if st.want_reference:
+            st.want_reference = False
+            st.busy = True
+            fut = self.pool.submit(st.set_reference, frame)
+            fut.add_done_callback(lambda f, st=st: self._reference_done(st, f))
+            return
+        st.want_compare = False
+        st.busy = True
+        st.last_submit = now
+        fut = self.pool.submit(self._run_inspection, st, frame, t_frame, now)
+        fut.add_done_callback(lambda f, st=st: self._inspection_done(st, f))
+
+    def _run_inspection(self, st, frame, t_frame, t_submit):
+        t_start = time.monotonic()
+        result = st.inspect(frame)
+        t_end = time.monotonic()
+        # Etapas del pipeline + espera en el pool y edad del frame
+        result["ms"].update(cola=(t_start - t_submit) * 1000.0,
+                            proceso=(t_end - t_start) * 1000.0)
+        result["t_frame"] = t_frame
+        return result
+
+    def _reference_done(self, st, fut):
+        st.busy = False
+        if fut.exception() is not None:
+            print(f"⚠ [{st.name}] Error al tomar referencia: {fut.exception()}")
+
+    def _inspection_done(self, st, fut):
+        st.busy = False
+        if fut.exception() is not None:
+            print(f"⚠ [{st.name}] Error en la inspección: {fut.exception()}")
+            return
+        result = fut.result()
+        st.last_score = result["score"]
+        st.last_missing = result["missing_slots"]
+        t0 = time.monotonic()
+        self.publish(st.name, result["score"])
+        t1 = time.monotonic()
+        st.stats.record_ms(**result["ms"], publicacion=(t1 - t0) * 1000.0,
+                           total=(t1 - result["t_frame"]) * 1000.0)
+        if st.board is not None:
+            events = st.board.apply(result)
+            for e in events:
+                print(f"🎥 [{st.name}] {e['ts']} {e['evento']}: {e['herramienta']}")
+            self.publish_events(st.name, events)
+
+    def publish(self, name, score):
+        if self.mqtt is None:
+            return
+        try:
+            self.mqtt.publish(f"{SCORE_TOPIC}/{name}", f"{score:.3f}", qos=0, retain=False)
+        except Exception as e:
+            print(f"[MQTT] Error: {e}")
+
+    def publish_events(self, name, events):
+        if self.mqtt is None:
+            return
+        for event in events:
+            try:
+                self.mqtt.publish(f"{EVENTS_TOPIC}/{name}", json.dumps(event, ensure_ascii=False), qos=1)
+            except Exception as e:
+                print(f"[MQTT] Error: {e}")
+
+    def report(self):
+        for st in self.stations.values():
+            st.stats.publish(self.mqtt, f"{METRICS_TOPIC}/{st.name}")
+            s = st.stats.summary()
+            total = s.get("total", {})
+            proceso = s.get("proceso", {})
+            score = "--" if st.last_score is None else f"{st.last_score:.1f}%"
+            fps = f" monitor={st.monitor_thread.fps:.0f}fps" if st.monitor_thread is not None else ""
+            faltan = ",".join(map(str, st.last_missing)) or "-"
+            print(f"[{st.name}] score={score} faltan={faltan} n={s['count']} saltadas={s['skipped']} "
+                  f"proceso p50/p95={proceso.get('p50', '--')}/{proceso.get('p95', '--')} ms "
+                  f"total p50/p95={total.get('p50', '--')}/{total.get('p95', '--')} ms{fps}")
+
+    def stats(self):
+        return {name: st.stats.summary() for name, st in self.stations.items()}
+
+    def run(self, duration=None):
+        for st in self.stations.values():
+            st.start()
+        t0 = last_report = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                for st in self.stations.values():
+                    due = st.interval > 0 and now - st.last_submit >= st.interval
+                    if st.want_reference or st.want_compare or due:
+                        self._submit(st, now, due)
+                if now - last_report >= self.report_every:
+                    self.report()
+                    last_report = now
+                if duration and now - t0 >= duration:
+                    break
+                time.sleep(0.01)
+        finally:
+            self.stop_event.set()
+            self.pool.shutdown(wait=True)
+            for st in self.stations.values():
+                st.stop()
+            self.report()
+
+    def stop(self, *_):
+        self.stop_event.set()
+
+
+# ---------- MQTT ----------
+def parse_bool(s):
+    s = s.strip().lower()
+    if s in ("true", "1", "on", "si", "yes"):
+        return True
+    if s in ("false", "0", "off", "no"):
+        return False
+    try:
+        j = json.loads(s)
+    except ValueError:
+        return None
+    if isinstance(j, dict):
+        j = next((j[k] for k in ("estado", "turno", "value", "on", "estadoTurno") if k in j), None)
+    return bool(j) if isinstance(j, (bool, int, float)) else None
+
+
+def setup_mqtt(server, host, port, user=None, password=None):
+    if mqtt is None:
+        print("⚠ paho-mqtt no está instalado; se corre sin MQTT")
+        return None
+    try:
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    except AttributeError:  # paho < 2.0
+        client = mqtt.Client()
+    if user and password:
+        client.username_pw_set(user, password)
+
+    def on_connect(c, *_):
+        c.subscribe(TRIGGER_TOPIC)
+        c.subscribe(f"{TRIGGER_TOPIC}/+")
+
+    def on_message(c, userdata, msg):
+        value = parse_bool(msg.payload.decode("utf-8", errors="replace"))
+        if value is None:
+            print(f"⚠ Payload no válido en {msg.topic}")
+            return
+        name = msg.topic[len(TRIGGER_TOPIC) + 1:] or None
+        server.trigger(name, value)
+
+    client.on_connect = on_connect
+    client.on_message = on_message
+    try:
+        client.connect(host, port, keepalive=60)
+    except Exception as e:
+        print(f"⚠ MQTT no disponible: {e}")
+        return None
+    client.loop_start()
+    print(f"✓ MQTT conectado ({host}:{port})")
+    return client
+
+
+# ---------- Run ----------
+def load_stations(args):
+    if args.config:
+        cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+        defaults = cfg.get("defaults", {})
+        return [Station(**{**defaults, **s}) for s in cfg["stations"]]
+    return [Station(name=f"estacion{i + 1}", source=src, interval=args.interval, align=not args.no_align,
+                    profile=args.profile, monitor=args.monitor, scale=args.scale,
+                    gate=not args.no_gate)
+            for i, src in enumerate(args.source or [])]
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Servidor de inspección 5S multi-cámara (sin GUI).")
+    ap.add_argument("--config", help="JSON con la lista de estaciones (ver stations.example.json).")
+    ap.add_argument("--source", action="append",
+                    help="Fuente rápida sin config: índice de cámara, video, carpeta o 'synthetic' (se puede repetir).")
+    ap.add_argument("--interval", type=float, default=1.0,
+                    help="Segundos entre inspecciones por estación (0 = sólo por disparador MQTT).")
+    ap.add_argument("--no-align", action="store_true", help="No alinear con la referencia.")
+    ap.add_argument("--profile", default=None, help="Perfil de parámetros de tune.py (sólo con --source).")
+    ap.add_argument("--monitor", action="store_true",
+                    help="Monitoreo continuo: inspeccionar cuando el tablero cambia y queda quieto (sólo con --source).")
+    ap.add_argument("--scale", type=int, choices=[1, 2], default=1,
+                    help="Buscar herramientas a 1/2 y afinarlas a resolución completa (sólo con --source).")
+    ap.add_argument("--no-gate", action="store_true",
+                    help="Comparar siempre la imagen entera (sin la compuerta por mosaicos).")
+    ap.add_argument("--workers", type=int, default=None, help="Hilos del pool (por defecto, núcleos).")
+    ap.add_argument("--broker", default="10.25.90.33")
+    ap.add_argument("--port", type=int, default=1883)
+    ap.add_argument("--user", default=None)
+    ap.add_argument("--password", default=None)
+    ap.add_argument("--no-mqtt", action="store_true", help="No conectarse al broker.")
+    ap.add_argument("--report", type=float, default=10.0, help="Segundos entre reportes de latencia.")
+    ap.add_argument("--duration", type=float, default=None, help="Terminar después de N segundos.")
+    ap.add_argument("--stats-json", default=None, help="Guardar las estadísticas finales en este JSON.")
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    stations = load_stations(args)
+    if not stations:
+        print("✗ No hay estaciones: usa --config o --source")
+        sys.exit(1)
+
+    server = InspectionServer(stations, workers=args.workers, report_every=args.report)
+    if not args.no_mqtt:
+        server.mqtt = setup_mqtt(server, args.broker, args.port, args.user, args.password)
+    signal.signal(signal.SIGINT, server.stop)
+    signal.signal(signal.SIGTERM, server.stop)
+
+    try:
+        server.run(duration=args.duration)
+    finally:
+        if server.mqtt is not None:
+            server.mqtt.loop_stop()
+            server.mqtt.disconnect()
+    if args.stats_json:
+        Path(args.stats_json).write_text(json.dumps(server.stats(), indent=2), encoding="utf-8")
+        print(f"💾 Estadísticas guardadas en: {args.stats_json}")
+
+
+if __name__ == "__main__":
+    main()
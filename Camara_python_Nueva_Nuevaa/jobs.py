@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Trabajos en segundo plano con cola acotada y cancelación.
+
+La GUI manda la referencia y las comparaciones a un pool de hilos (OpenCV
+libera el GIL; con procesos habría que copiar los frames entre procesos)
+y recibe progreso y resultados en el hilo de Tk a través de `dispatch`
+(root.after). Un disparador nuevo cancela los trabajos que quedaron viejos.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Cancelled(Exception):
+    """El trabajo fue cancelado entre etapas."""
+
+
+class Job:
+    def __init__(self, kind, progress):
+        self.kind = kind
+        self.future = None
+        self._cancel = threading.Event()
+        self._progress = progress
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Cancela el trabajo: si no empezó, no corre; si está corriendo, para en la siguiente etapa."""
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def progress(self, stage):
+        if not self._cancel.is_set():
+            self._progress(self.kind, stage)
+
+
+class JobRunner:
+    def __init__(self, workers=1, max_pending=3, dispatch=None):
+        """
+        workers: hilos del pool. Con 1 los trabajos corren en el orden en
+            que llegan (la comparación siempre ve la referencia anterior).
+        max_pending: trabajos en cola + en curso; si se llena, submit devuelve None.
+        dispatch: función que ejecuta un callable en el hilo de la GUI.
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inspeccion")
+        self.max_pending = max_pending
+        self.dispatch = dispatch or (lambda fn: fn())
+        self.jobs = []
+        self.lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, on_done=None, on_error=None, on_progress=None,
+               supersede=(), **kwargs):
+        """
+        Encola fn(*args, check=job.check, progress=job.progress, **kwargs).
+        Antes cancela los trabajos cuyo tipo esté en `supersede`.
+        """
+        with self.lock:
+            for job in self.jobs:
+                if job.kind in supersede:
+                    job.cancel()
+            self.jobs = [j for j in self.jobs if not j.future.done()]
+            if len(self.jobs) >= self.max_pending:
+                return None
+
+            progress = (lambda k, s: self.dispatch(lambda: on_progress(k, s))) if on_progress else (lambda k, s: None)
+            job = Job(kind, progress)
+            job.future = self.pool.submit(self._run, job, fn, args, kwargs)
+            self.jobs.append(job)
+
+        def done(fut, job=job):
+            if fut.cancelled() or job.cancelled:
+                return
+            exc = fut.exception()
+            if isinstance(exc, Cancelled):
+                return
+            if exc is not None:
+                if on_error:
+                    self.dispatch(lambda: on_error(exc))
+                return
+            if on_done:
+                result = fut.result()
+                self.dispatch(lambda: on_done(result))
+
+        job.future.add_done_callback(done)
+        return job
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        job.check()
+        return fn(*args, check=job.check, progress=job.progress, **kwargs)
+
+    def pending(self, kind=None):
+        """True si hay trabajos (de ese tipo) en cola o en curso."""
+        with self.lock:
+            return any(not j.future.done() and not j.cancelled and (kind is None or j.kind == kind)
+                       for j in self.jobs)
+
+    def cancel_all(self):
+        with self.lock:
+            for job in self.jobs:
+                job.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Latencia por etapa de la inspección (disparo MQTT -> score publicado).
+
+Cada inspección lleva un Trace que anota cuánto tardó cada etapa (captura,
+ROI, alineado, comparación, conteo, detección inteligente, visualización,
+publicación). LatencyStats acumula esas mediciones en histogramas estilo
+HdrHistogram: cubetas logarítmicas con precisión relativa fija (< 1%), así
+que registrar es O(1), la memoria no crece con el número de muestras y los
+percentiles p50/p95/p99 salen de toda la historia, no de una ventana.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+SUB_BITS = 7                 # 128 sub-cubetas por potencia de 2 -> error < 0.8%
+SUB = 1 << SUB_BITS
+HIGHEST_US = 600_000_000     # 10 minutos en µs; más se guarda en la última cubeta
+
+
+def _index(us):
+    if us < 2 * SUB:
+        return us
+    e = us.bit_length() - SUB_BITS - 1
+    return e * SUB + (us >> e)
+
+
+def _value(index):
+    """Valor (µs) al medio de la cubeta."""
+    if index < 2 * SUB:
+        return float(index)
+    e = index // SUB - 1
+    low = (index - e * SUB) << e
+    return low + (1 << e) / 2.0
+
+
+class HdrHistogram:
+    """Histograma de latencias en µs con precisión relativa fija."""
+
+    def __init__(self, highest_us=HIGHEST_US):
+        self.counts = [0] * (_index(highest_us) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record_ms(self, ms):
+        us = max(int(ms * 1000.0), 0)
+        self.counts[min(_index(us), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total_us += us
+        self.min_us = us if self.min_us is None else min(self.min_us, us)
+        self.max_us = max(self.max_us, us)
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentiles_ms(self, *pcts):
+        """Percentiles en ms (mismo orden que `pcts`)."""
+        if not self.count:
+            return [None] * len(pcts)
+        targets = sorted((max(1, -(-p * self.count // 100)), k) for k, p in enumerate(pcts))
+        out = [None] * len(pcts)
+        seen, t = 0, 0
+        for i, c in enumerate(self.counts):
+            if not c:
+                continue
+            seen += c
+            while t < len(targets) and seen >= targets[t][0]:
+                out[targets[t][1]] = min(_value(i), self.max_us) / 1000.0
+                t += 1
+            if t == len(targets):
+                break
+        return out
+
+    def summary(self):
+        p50, p95, p99 = self.percentiles_ms(50, 95, 99)
+        return {"n": self.count, "p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2),
+                "max": round(self.max_us / 1000.0, 2),
+                "mean": round(self.total_us / 1000.0 / self.count, 2)}
+
+
+class Trace:
+    """Tiempos (ms) de las etapas de una inspección, desde el disparo `t0` (perf_counter)."""
+
+    def __init__(self, t0=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.ms = {}
+        self._last = self.t0
+
+    @contextmanager
+    def stage(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last = time.perf_counter()
+            self.ms[name] = self.ms.get(name, 0.0) + (self._last - t) * 1000.0
+
+    def mark(self, name):
+        """Tiempo desde la última etapa (esperas: cola del pool, paso al hilo de Tk)."""
+        now = time.perf_counter()
+        self.ms[name] = self.ms.get(name, 0.0) + (now - self._last) * 1000.0
+        self._last = now
+
+    def finish(self):
+        """Cierra la traza: agrega "total" (disparo -> ahora) y devuelve los tiempos."""
+        self.ms["total"] = (time.perf_counter() - self.t0) * 1000.0
+        return self.ms
+
+
+class LatencyStats:
+    """Histograma por etapa (en ms), con percentiles. Se puede usar desde varios hilos."""
+
+    def __init__(self):
+        self.hists = {}
+        self.count = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def add(self, **stages_ms):
+        with self.lock:
+            self._add(stages_ms)
+
+    def _add(self, stages_ms):
+        for name, value in stages_ms.items():
+            hist = self.hists.get(name)
+            if hist is None:
+                hist = self.hists[name] = HdrHistogram()
+            hist.record_ms(value)
+
+    def record(self, trace):
+        """Cuenta una inspección completa y registra todas sus etapas."""
+        self.record_ms(**trace.ms)
+
+    def record_ms(self, **stages_ms):
+        """Como record, con los tiempos por etapa ya medidos (ms)."""
+        with self.lock:
+            self.count += 1
+            self._add(stages_ms)
+
+    def skip(self):
+        """Cuenta una inspección saltada (la anterior seguía en curso)."""
+        with self.lock:
+            self.skipped += 1
+
+    def summary(self):
+        with self.lock:
+            out = {"count": self.count, "skipped": self.skipped}
+            out.update({name: h.summary() for name, h in self.hists.items()})
+        return out
+
+    def status_text(self, stage="total"):
+        """Texto corto para la barra de estado: 'p50/p95/p99 120/180/250 ms'."""
+        with self.lock:
+            hist = self.hists.get(stage)
+            if hist is None or not hist.count:
+                return ""
+            p = hist.percentiles_ms(50, 95, 99)
+        return f"p50/p95/p99 {p[0]:.0f}/{p[1]:.0f}/{p[2]:.0f} ms"
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def publish(self, client, topic):
+        """Publica el resumen en MQTT (JSON). No hace nada sin cliente."""
+        if client is None:
+            return
+        try:
+            client.publish(topic, json.dumps(self.summary()), qos=0, retain=True)
+        except Exception as e:
+            print(f"[MQTT] Error: {e}")
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de inspección (referencia y comparación) sin interfaz gráfica.
+
+Es lo que antes hacían take_photo1 / take_photo2_compare dentro del callback
+de Tk; aquí se puede correr en otro hilo. `check()` se llama entre etapas
+para poder cancelar un trabajo viejo y `progress(etapa)` avisa en qué va.
+Con `trace` (metrics.Trace) cada etapa anota su tiempo; el resultado trae
+los tiempos en result["ms"]. Con `gate` sólo se procesan los mosaicos que
+cambiaron respecto de la referencia (detection.changed_rects).
+"""
+
+import json
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from alignment import Aligner
+from detection import (AREA_FACTOR, FramePrep, changed_rects, compare_absdiff, compare_ssim, compare_edges,
+                       detect_added_removed_smart, ensure_odd, find_tools)
+from metrics import Trace
+from reference_model import ReferenceModel
+
+COMPARE_MODES = {
+    "AbsDiff": compare_absdiff,
+    "SSIM (mapa)": compare_ssim,
+    "SSIM rápido (1/2)": partial(compare_ssim, scale=2),
+    "Bordes (Canny)": compare_edges,
+}
+
+VIEW_KEYS = ("base_view", "mask_or_map", "diff_view")
+
+# Modos que respetan la compuerta por mosaicos. changed_tiles sólo mira medias
+# y desviaciones, así que el SSIM y los bordes (que ven cambios de textura con
+# la misma media) se comparan siempre con la imagen entera.
+GATED_MODES = ("AbsDiff",)
+
+# Parámetros que puede traer un perfil de tune.py (los 4 primeros son los sliders de la GUI)
+PROFILE_KEYS = ("blur", "thresh", "morph", "min_area",
+                "min_thresh", "max_aspect", "min_compactness", "area_factor")
+
+
+def _noop(*_):
+    pass
+
+
+def reference_pipeline(photo1, params, check=_noop, progress=_noop):
+    """
+    Construye el ReferenceModel de la foto de referencia (preprocesado y
+    slots de herramientas), que se reutiliza en todas las comparaciones.
+    """
+    progress("Contando herramientas")
+    model = ReferenceModel(photo1, params)
+    check()
+    return {"photo1": photo1, "model": model, "tools_in_reference": model.tools_in_reference,
+            "tool_areas": model.tool_areas}
+
+
+def compare_pipeline(photo1, photo2_raw, params, tools_in_reference=None, mode="SSIM (mapa)",
+                     align=True, smart=True, reference=None, render=True, buffers=None,
+                     gate=False, check=_noop, progress=_noop, trace=None):
+    """
+    Alinea, compara con `mode` (None = sin comparación base) y, si `smart`,
+    corre la detección inteligente. Devuelve un dict con el score final y
+    las imágenes para mostrar.
+
+    El frame actual se preprocesa una sola vez y lo comparten todas las
+    etapas. Con `reference` (ReferenceModel de reference_pipeline) se reusa
+    su preprocesado y su conteo, y se reporta el estado de cada slot.
+
+    Con render=False no se dibuja nada: las vistas (base_view, mask_or_map,
+    diff_view) quedan como funciones y render_views las dibuja si hacen falta.
+    `buffers` (un dict por estación) reutiliza las máscaras entre llamadas.
+
+    Con gate=True primero se buscan los mosaicos que cambiaron (sus medias y
+    desviaciones; las de la referencia quedan guardadas en su FramePrep) y
+    la comparación y la detección sólo miran esos rectángulos. Si no cambió
+    ninguno, se devuelve score 0 sin comparar; si cambió casi todo, se
+    procesa la imagen entera. result["rects"] los trae (None = entera).
+    Los modos fuera de GATED_MODES comparan siempre la imagen entera; la
+    compuerta sigue aplicando a la detección inteligente.
+    """
+    trace = trace or Trace()
+    check()
+    if reference is not None:
+        prep1, tools_in_reference = reference.prep, reference.tools_in_reference
+        aligner = reference.aligner
+    else:
+        prep1 = FramePrep(photo1)
+        aligner = Aligner(prep1) if align else None
+    photo2 = photo2_raw
+    prep2 = FramePrep(photo2_raw)
+    align_method = None
+    if align:
+        progress("Alineando")
+        with trace.stage("alineado"):
+            photo2, ok, align_method = aligner.align(photo2_raw, prep2=prep2)
+            if ok:
+                prep2 = FramePrep(photo2)  # imagen nueva: el preprocesado de la cruda ya no sirve
+        check()
+
+    result = {"photo1": photo1, "photo2": photo2, "mode": mode, "tools_reference": tools_in_reference,
+              "align": align_method, "mask": None, "base_view": None, "mask_or_map": None, "changed": 0,
+              "ms": trace.ms, "rects": None}
+    rects = None
+    if gate:
+        with trace.stage("mosaicos"):
+            rects = changed_rects(prep1, prep2)
+        result["rects"] = rects
+        if rects == [] and (mode is None or mode in GATED_MODES):
+            return _unchanged(result, prep1, prep2, params, reference, smart, render)
+    gated = {} if rects is None else {"rects": rects}
+    if mode is not None:
+        progress(f"Comparando ({mode})")
+        with trace.stage("comparacion"):
+            mask, base_view, changed, pct = COMPARE_MODES[mode](photo1, photo2, prep1=prep1, prep2=prep2,
+                                                                render=render, buffers=buffers,
+                                                                **(gated if mode in GATED_MODES else {}),
+                                                                **_params_compare(params))
+        result.update(mask=mask, base_view=base_view, changed=changed, pct=pct,
+                      mask_or_map=base_view if mode.startswith("SSIM") else mask)
+        check()
+
+    if smart:
+        progress("Contando herramientas")
+        with trace.stage("conteo"):
+            # Queda guardado en prep2: la detección inteligente y el emparejado lo reusan
+            find_tools(photo2, prep=prep2, gate=None if rects is None else (prep1, rects),
+                       **_params_tools(params))
+        check()
+        progress("Detección inteligente")
+        with trace.stage("inteligente"):
+            overlay, added, removed, total_area, score, tools_photo2 = detect_added_removed_smart(
+                photo1, photo2, tools_in_reference=tools_in_reference, prep1=prep1, prep2=prep2,
+                render=render, buffers=buffers, **gated, **params)
+        result.update(diff_view=overlay, added=added, removed=removed, total_area=total_area,
+                      score=score, tools_photo2=tools_photo2,
+                      tools_missing=max(0, tools_in_reference - tools_photo2) if tools_in_reference else 0)
+        if reference is not None:
+            # Mismos contornos que contó la detección (guardados en prep2)
+            with trace.stage("emparejado"):
+                slots = reference.match(photo2, prep=prep2)
+            result.update(slots=slots, missing_slots=reference.missing(slots))
+    else:
+        # Modo simple: área cambiada ×12
+        pct_area = (result["changed"] / float(result["mask"].size)) * 100.0
+        area_factor = params.get("area_factor", AREA_FACTOR)
+        result.update(diff_view=result["base_view"], score=min(pct_area * area_factor, 100.0))
+    check()
+    return result
+
+
+def _unchanged(result, prep1, prep2, params, reference, smart, render):
+    """Resultado de una inspección sin mosaicos cambiados: igual a la referencia, score 0."""
+    photo2 = result["photo2"]
+    mask = np.zeros(photo2.shape[:2], np.uint8)
+    view = photo2.copy() if render else photo2.copy
+    result.update(mask=mask, base_view=view, mask_or_map=mask, diff_view=view, changed=0, pct=0.0,
+                  score=0.0)
+    if smart:
+        # Sin rects, find_tools toma las herramientas de la referencia
+        tools = find_tools(photo2, prep=prep2, gate=(prep1, []), **_params_tools(params))
+        result.update(added=0, removed=0, total_area=0, tools_photo2=len(tools), tools_missing=0)
+        if reference is not None:
+            slots = reference.match(photo2, prep=prep2)
+            result.update(slots=slots, missing_slots=reference.missing(slots))
+    return result
+
+
+def render_views(result):
+    """Dibuja las vistas que compare_pipeline dejó pendientes (render=False)."""
+    done = {}
+    for key in VIEW_KEYS:
+        view = result.get(key)
+        if callable(view):
+            if id(view) not in done:
+                done[id(view)] = view()
+            result[key] = done[id(view)]
+    return result
+
+
+def slot_pipeline(inspector, photo2, check=_noop, progress=_noop, trace=None):
+    """
+    Inspección por slots (SlotInspector): sólo los recortes de los polígonos,
+    sin ECC ni comparación de todo el frame. Mismas llaves que compare_pipeline
+    para que la GUI y el servidor lo traten igual.
+    """
+    trace = trace or Trace()
+    check()
+    progress("Inspeccionando slots")
+    with trace.stage("slots"):
+        states = inspector.inspect(photo2)
+    missing = [s["name"] for s in states if not s["present"]]
+    check()
+    return {"photo1": inspector.reference, "photo2": photo2, "mode": "Slots", "slot_states": states,
+            "missing_slots": missing, "score": inspector.score(states), "changed": len(missing),
+            "tools_reference": len(states), "tools_photo2": len(states) - len(missing),
+            "tools_missing": len(missing), "added": 0, "removed": len(missing), "ms": trace.ms}
+
+
+def render_slots(inspector, result):
+    """Agrega a `result` las imágenes (overlay y máscara) de la inspección por slots."""
+    overlay, mask = inspector.render(result["photo2"], result["slot_states"])
+    result.update(diff_view=overlay, mask=mask, mask_or_map=mask, base_view=overlay,
+                  pct=100.0 * result["changed"] / max(len(result["slot_states"]), 1))
+    return result
+
+
+def _params_compare(params):
+    """Los compare_* sólo usan blur, thresh y morph."""
+    return {k: params[k] for k in ("blur", "thresh", "morph") if k in params}
+
+
+def _params_tools(params):
+    """Los mismos filtros con los que detect_added_removed_smart cuenta herramientas."""
+    return {k: params[k] for k in ("blur", "morph", "min_area", "max_aspect", "min_compactness", "scale")
+            if k in params}
+
+
+def load_profile(path):
+    """Parámetros de un perfil guardado por tune.py (JSON con la llave "params")."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    params = {k: v for k, v in data.get("params", data).items() if k in PROFILE_KEYS}
+    if params.get("blur"):
+        params["blur"] = ensure_odd(int(params["blur"]))
+    return params
+
+
+def save_profile(path, params, **info):
+    """Guarda un perfil: {"params": {...}, ...info (métricas, fecha, pares)}."""
+    data = {"params": {k: params[k] for k in PROFILE_KEYS if k in params}, **info}
+    Path(path).write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo de la foto de referencia: se construye una vez por referencia y
+guarda su preprocesado, su alineador y cada herramienta detectada (contorno, caja, área y
+momentos de Hu). Las comparaciones sólo procesan el frame actual y
+emparejan sus herramientas con los lugares (slots) de la referencia, lo que
+permite decir qué herramienta falta y no sólo cuántas.
+"""
+
+import cv2
+import numpy as np
+
+from alignment import Aligner
+from detection import FramePrep, find_tools
+
+# Para emparejar una herramienta actual con un slot de la referencia: su caja
+# traslapa la del slot al menos MIN_IOU, o su centro cae dentro del slot
+MIN_IOU = 0.3
+MAX_SHAPE_DIST = 0.3   # distancia de forma (matchShapes I1) para decir "misma herramienta"
+HU_EPS = 1e-5          # momentos más chicos se ignoran, como en cv2.matchShapes
+
+
+def log_hu(contour):
+    """Momentos de Hu en escala log: m_i = sign(h_i) * log10|h_i| (NaN si |h_i| < HU_EPS)."""
+    hu = cv2.HuMoments(cv2.moments(contour)).ravel()
+    out = np.full(7, np.nan)
+    ok = np.abs(hu) > HU_EPS
+    out[ok] = np.sign(hu[ok]) * np.log10(np.abs(hu[ok]))
+    return out
+
+
+def shape_distance(hu_a, hu_b):
+    """Distancia I1 de cv2.matchShapes calculada con momentos ya guardados."""
+    ok = np.isfinite(hu_a) & np.isfinite(hu_b)
+    return float(np.abs(1.0 / hu_a[ok] - 1.0 / hu_b[ok]).sum())
+
+
+def bbox_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _center_inside(inner, outer):
+    x, y, w, h = inner
+    ox, oy, ow, oh = outer
+    cx, cy = x + w / 2.0, y + h / 2.0
+    return ox <= cx <= ox + ow and oy <= cy <= oy + oh
+
+
+class ToolSlot:
+    def __init__(self, index, contour, area, bbox):
+        self.index = index
+        self.contour = contour
+        self.area = area
+        self.bbox = bbox
+        self.hu = log_hu(contour)
+
+    def to_dict(self):
+        return {"slot": self.index, "bbox": list(self.bbox), "area": float(self.area)}
+
+
+class ReferenceModel:
+    """Referencia preprocesada + slots de herramientas."""
+
+    def __init__(self, image, params):
+        self.image = image
+        self.params = dict(params)
+        self.prep = FramePrep(image)
+        # Pirámide y gradientes de la referencia para alinear (se calculan al primer uso)
+        self.aligner = Aligner(self.prep)
+        tools = find_tools(image, prep=self.prep, **self._tool_params())
+        # Numerar de arriba hacia abajo y de izquierda a derecha para que sea estable
+        tools = sorted(tools, key=lambda t: (t[2][1], t[2][0]))
+        self.slots = [ToolSlot(i + 1, c, area, bbox) for i, (c, area, bbox) in enumerate(tools)]
+
+    def _tool_params(self):
+        return {k: self.params[k] for k in ("blur", "morph", "min_area", "max_aspect", "min_compactness", "scale")
+                if k in self.params}
+
+    @property
+    def tools_in_reference(self):
+        return len(self.slots)
+
+    @property
+    def tool_areas(self):
+        return [s.area for s in self.slots]
+
+    def match(self, image, prep=None):
+        """
+        Estado de cada slot en `image` (ya alineada con la referencia):
+        lista de dicts con slot, present, same_shape, iou y shape_dist. Un
+        slot está presente si alguna herramienta actual traslapa su caja;
+        same_shape=False indica que hay otra herramienta en ese lugar. Una
+        herramienta actual sólo puede ocupar un slot.
+        """
+        current = find_tools(image, prep=prep, **self._tool_params())
+        used = set()
+        states = []
+        for slot in self.slots:
+            best, best_iou = None, -1.0
+            for j, (_, _, bbox) in enumerate(current):
+                if j in used:
+                    continue
+                iou = bbox_iou(slot.bbox, bbox)
+                if (iou >= MIN_IOU or _center_inside(bbox, slot.bbox)) and iou > best_iou:
+                    best, best_iou = j, iou
+            state = {"slot": slot.index, "present": False, "same_shape": False,
+                     "iou": 0.0, "shape_dist": None}
+            if best is not None:
+                used.add(best)
+                dist = shape_distance(slot.hu, log_hu(current[best][0]))
+                state.update(present=True, same_shape=dist <= MAX_SHAPE_DIST,
+                             iou=round(best_iou, 3), shape_dist=round(dist, 3))
+            states.append(state)
+        return states
+
+    def missing(self, states):
+        return [s["slot"] for s in states if not s["present"]]
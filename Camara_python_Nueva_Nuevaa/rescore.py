@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Re-evaluación por lotes del archivo de inspecciones guardadas (sin GUI).
+
+Recorre una carpeta con los pares que guardan cam_gui_tk.py
+(<ts>_photo1_ref.png / <ts>_photo2_actual.png) y cam_diff.py
+(<ts>_photo1.png / <ts>_photo2.png), vuelve a correr las comparaciones y la
+detección inteligente con los parámetros dados y escribe una tabla CSV con
+scores, conteos y tiempos. Cada par se procesa en un proceso del pool (todos
+los núcleos); dentro del proceso el preprocesado de cada foto se comparte
+entre todas las combinaciones de parámetros.
+
+Uso:
+    python rescore.py outputs --out rescore.csv
+    python rescore.py archivo/ --thresh 25 35 45 --min-area 1000 1500 2500 --modes AbsDiff "SSIM (mapa)"
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+
+from alignment import Aligner
+from detection import AREA_FACTOR, FramePrep, count_tools_in_image, detect_added_removed_smart
+from pipeline import COMPARE_MODES, load_profile
+
+# (foto 1, foto 2) según quién guardó el par
+PAIR_SUFFIXES = [("_photo1_ref.png", "_photo2_actual.png"), ("_photo1.png", "_photo2.png")]
+
+FIELDS = ["ts", "photo1", "photo2", "blur", "thresh", "morph", "min_area", "mode",
+          "changed", "pct", "added", "removed", "total_area", "tools_reference", "tools_photo2",
+          "score", "score_guardado", "align", "ms_align", "ms_compare", "ms_smart", "error"]
+
+
+def find_pairs(root):
+    """Pares (ts, foto1, foto2, meta) de la carpeta y sus subcarpetas."""
+    pairs = []
+    for suffix1, suffix2 in PAIR_SUFFIXES:
+        for p1 in sorted(Path(root).rglob(f"*{suffix1}")):
+            stem = p1.name[:-len(suffix1)]
+            p2 = p1.with_name(stem + suffix2)
+            if p2.exists():
+                meta = p1.with_name(stem + "_meta.json")
+                pairs.append((stem, str(p1), str(p2), str(meta) if meta.exists() else None))
+    return pairs
+
+
+DEFAULTS = {"blur": 5, "thresh": 35, "morph": 5, "min_area": 1500}
+
+
+def param_grid(args):
+    """Combinaciones de los sliders; con --profile, sus valores por defecto y constantes."""
+    profile = load_profile(args.profile) if args.profile else {}
+    values = {k: getattr(args, k) or [profile.get(k, v)] for k, v in DEFAULTS.items()}
+    extra = {k: v for k, v in profile.items() if k not in DEFAULTS}
+    return [dict(blur=b, thresh=t, morph=m, min_area=a, **extra)
+            for b, t, m, a in itertools.product(*values.values())]
+
+
+def _init_worker():
+    # Un proceso por núcleo: que OpenCV no abra además sus propios hilos
+    cv2.setNumThreads(1)
+
+
+def score_pair(pair, grid, modes, smart=True, align=False):
+    """Corre todas las combinaciones de parámetros sobre un par. Devuelve las filas de la tabla."""
+    ts, path1, path2, meta_path = pair
+    img1, img2 = cv2.imread(path1), cv2.imread(path2)
+    if img1 is None or img2 is None or img1.shape != img2.shape:
+        return [], f"{ts}: no se pudo leer o tamaños distintos"
+    saved = None
+    if meta_path:
+        try:
+            saved = json.loads(Path(meta_path).read_text(encoding="utf-8")).get("score_intelligent")
+        except (OSError, ValueError):
+            pass
+
+    prep1, prep2 = FramePrep(img1), FramePrep(img2)
+    align_method, ms_align = None, 0.0
+    if align:
+        t0 = time.perf_counter()
+        img2, ok, align_method = Aligner(prep1).align(img2, prep2=prep2)
+        if ok:
+            prep2 = FramePrep(img2)
+        ms_align = (time.perf_counter() - t0) * 1000.0
+
+    rows = []
+    for params in grid:
+        base = {"ts": ts, "photo1": path1, "photo2": path2, "score_guardado": saved,
+                **{k: params[k] for k in ("blur", "thresh", "morph", "min_area")},
+                "align": align_method, "ms_align": round(ms_align, 2)}
+        smart_cols = {}
+        if smart:
+            t0 = time.perf_counter()
+            tools_ref, _ = count_tools_in_image(img1, prep=prep1, **_tool_params(params))
+            _, added, removed, total_area, score, tools2 = detect_added_removed_smart(
+                img1, img2, tools_in_reference=tools_ref, prep1=prep1, prep2=prep2,
+                render=False, **params)
+            smart_cols = {"added": added, "removed": removed, "total_area": total_area,
+                          "tools_reference": tools_ref, "tools_photo2": tools2, "score": round(score, 3),
+                          "ms_smart": round((time.perf_counter() - t0) * 1000.0, 2)}
+        for mode in modes or [None]:
+            row = dict(base, mode=mode or "-", **smart_cols)
+            if mode is not None:
+                t0 = time.perf_counter()
+                mask, _, changed, pct = COMPARE_MODES[mode](img1, img2, prep1=prep1, prep2=prep2,
+                                                            render=False, blur=params["blur"],
+                                                            thresh=params["thresh"], morph=params["morph"])
+                row.update(changed=changed, pct=round(pct, 4),
+                           ms_compare=round((time.perf_counter() - t0) * 1000.0, 2))
+                if not smart:
+                    # Modo simple de la GUI: área cambiada × area_factor
+                    area_factor = params.get("area_factor", AREA_FACTOR)
+                    row["score"] = round(min(changed / float(mask.size) * 100.0 * area_factor, 100.0), 3)
+            rows.append(row)
+    return rows, None
+
+
+def failed_row(pair, error):
+    """Fila de un par que no se pudo evaluar (queda en el CSV con el error)."""
+    ts, path1, path2, _ = pair
+    return {"ts": ts, "photo1": path1, "photo2": path2, "error": error}
+
+
+def _row_key(r):
+    return (r["ts"], r["photo1"], *(r.get(k, -1) for k in ("blur", "thresh", "morph", "min_area")),
+            r.get("mode", ""))
+
+
+def _tool_params(params):
+    return {k: v for k, v in params.items() if k not in ("min_thresh", "area_factor")}
+
+
+def summarize(rows):
+    """Score y % cambiado promedio por combinación de parámetros y modo."""
+    groups = defaultdict(list)
+    for r in rows:
+        if r.get("score") is not None:
+            groups[(r["blur"], r["thresh"], r["morph"], r["min_area"], r["mode"])].append(r)
+    print("\nblur thresh morph min_area  modo            pares  score prom.  % cambio")
+    for (b, t, m, a, mode), group in sorted(groups.items()):
+        score = sum(r["score"] for r in group) / len(group)
+        pcts = [r["pct"] for r in group if r.get("pct") is not None]
+        pct = f"{sum(pcts) / len(pcts):8.2f}" if pcts else "      --"
+        print(f"{b:>4} {t:>6} {m:>5} {a:>8}  {mode:<15} {len(group):>5}  {score:11.2f}  {pct}")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Re-evaluar el archivo de inspecciones 5S con otros parámetros.")
+    ap.add_argument("archive", help="Carpeta con los pares guardados (se busca en subcarpetas).")
+    ap.add_argument("--out", default="rescore.csv", help="CSV de resultados.")
+    ap.add_argument("--blur", type=int, nargs="+", help="Por defecto 5 (o el del perfil).")
+    ap.add_argument("--thresh", type=int, nargs="+", help="Por defecto 35 (o el del perfil).")
+    ap.add_argument("--morph", type=int, nargs="+", help="Por defecto 5 (o el del perfil).")
+    ap.add_argument("--min-area", type=int, nargs="+", help="Por defecto 1500 (o el del perfil).")
+    ap.add_argument("--profile", default=None, help="Perfil de tune.py (constantes y valores por defecto).")
+    ap.add_argument("--modes", nargs="*", default=["AbsDiff", "SSIM (mapa)", "Bordes (Canny)"],
+                    choices=list(COMPARE_MODES), help="Comparaciones base (ninguna = sólo inteligente).")
+    ap.add_argument("--no-smart", action="store_true", help="No correr la detección inteligente.")
+    ap.add_argument("--align", action="store_true", help="Alinear la foto 2 antes de comparar.")
+    ap.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, núcleos).")
+    ap.add_argument("--limit", type=int, default=None, help="Sólo los primeros N pares.")
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    pairs = find_pairs(args.archive)[:args.limit]
+    if not pairs:
+        print(f"✗ No se encontraron pares en {args.archive}")
+        sys.exit(1)
+    grid = param_grid(args)
+    workers = args.workers or os.cpu_count() or 1
+    print(f"🔍 {len(pairs)} pares × {len(grid)} combinaciones × {max(len(args.modes), 1)} modos "
+          f"en {workers} procesos")
+
+    t0 = time.perf_counter()
+    rows, failed = [], 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(score_pair, p, grid, args.modes, not args.no_smart, args.align): p
+                   for p in pairs}
+        for i, fut in enumerate(as_completed(futures), 1):
+            pair = futures[fut]
+            try:
+                pair_rows, error = fut.result()
+            except Exception as e:
+                # Un par que falla no detiene el lote: queda como fila con el error
+                pair_rows, error = [], f"{pair[0]}: {type(e).__name__}: {e}"
+            if error:
+                print(f"⚠ {error}")
+                failed += 1
+                if not pair_rows:
+                    pair_rows = [failed_row(pair, error)]
+            rows.extend(pair_rows)
+            if i % 50 == 0 or i == len(futures):
+                print(f"  {i}/{len(futures)} pares ({time.perf_counter() - t0:.1f} s)")
+    elapsed = time.perf_counter() - t0
+
+    rows.sort(key=_row_key)
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    summarize(rows)
+    failed_txt = f" | {failed} pares con error" if failed else ""
+    print(f"\n✓ {len(rows)} filas en {args.out} | {elapsed:.1f} s ({len(pairs) / elapsed:.1f} pares/s)"
+          f"{failed_txt}")
+
+
+if __name__ == "__main__":
+    main()
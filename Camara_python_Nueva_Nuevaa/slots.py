@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Inspección por slots: cada herramienta del tablero (shadow board) tiene un
+polígono fijo y sólo se comparan esos recortes pequeños contra la referencia,
+en lugar de todo el frame. Cada slot da presente / falta.
+
+Los polígonos se guardan en JSON, en coordenadas de la imagen que ve la
+comparación (si se usa ROI, relativas al recorte del ROI):
+
+    {"slots": [{"name": "Martillo", "polygon": [[x, y], [x, y], ...]}, ...]}
+"""
+
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from detection import ensure_odd
+
+# Fracción de píxeles cambiados dentro del polígono para decir que falta
+MISSING_FRACTION = 0.30
+# Desplazamiento máximo (px) que se busca por slot para compensar vibración
+SEARCH_PX = 12
+
+
+def load_slots(path):
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [{"name": s.get("name") or f"slot {i + 1}", "polygon": [list(map(int, p)) for p in s["polygon"]]}
+            for i, s in enumerate(data["slots"])]
+
+
+def save_slots(path, slots):
+    Path(path).write_text(json.dumps({"slots": slots}, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def _gray_blur(img, blur):
+    g = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    if blur and blur > 1:
+        k = ensure_odd(blur)
+        g = cv2.GaussianBlur(g, (k, k), 0)
+    return g
+
+
+class SlotInspector:
+    """
+    Recortes de referencia precalculados por slot. `inspect` sólo procesa
+    las cajas de los polígonos (más un margen para buscar el desplazamiento).
+    """
+
+    def __init__(self, reference, slots, blur=5, thresh=35, missing_fraction=MISSING_FRACTION,
+                 search=SEARCH_PX):
+        self.reference = reference
+        self.slots = slots
+        self.blur = blur
+        self.thresh = thresh
+        self.missing_fraction = missing_fraction
+        self.search = search
+        h, w = reference.shape[:2]
+        self.items = []
+        for s in slots:
+            poly = np.array(s["polygon"], dtype=np.int32)
+            bx, by, bw, bh = cv2.boundingRect(poly)
+            # Recorta las dos esquinas: un polígono fuera de la imagen (ROI más
+            # chico que cuando se dibujó) no tiene nada que inspeccionar
+            x, y = max(bx, 0), max(by, 0)
+            x1, y1 = min(bx + bw, w), min(by + bh, h)
+            if x1 <= x or y1 <= y:
+                print(f"⚠ Slot '{s['name']}' fuera de la imagen ({w}x{h}), se omite")
+                continue
+            bw, bh = x1 - x, y1 - y
+            mask = np.zeros((bh, bw), np.uint8)
+            cv2.fillPoly(mask, [poly - (x, y)], 255)
+            ref_crop = _gray_blur(reference[y:y + bh, x:x + bw], blur)
+            self.items.append({"name": s["name"], "poly": poly, "box": (x, y, bw, bh),
+                               "mask": mask, "mask_px": max(cv2.countNonZero(mask), 1),
+                               "ref": ref_crop})
+
+    def _best_shift(self, item, frame):
+        """Busca el corrimiento (dx, dy) que mejor alinea el slot (matchTemplate en la ventana)."""
+        x, y, bw, bh = item["box"]
+        H, W = frame.shape[:2]
+        d = self.search
+        x0, y0 = max(x - d, 0), max(y - d, 0)
+        x1, y1 = min(x + bw + d, W), min(y + bh + d, H)
+        window = _gray_blur(frame[y0:y1, x0:x1], self.blur)
+        if window.shape[0] < bh or window.shape[1] < bw:
+            return 0, 0, window, x0, y0
+        res = cv2.matchTemplate(window, item["ref"], cv2.TM_CCOEFF_NORMED)
+        _, _, _, (mx, my) = cv2.minMaxLoc(res)
+        return (x0 + mx) - x, (y0 + my) - y, window, x0, y0
+
+    def inspect(self, frame):
+        """Estado por slot: lista de dicts con name, present, changed y shift."""
+        states = []
+        for item in self.items:
+            x, y, bw, bh = item["box"]
+            dx, dy, window, x0, y0 = self._best_shift(item, frame)
+            cx, cy = x + dx - x0, y + dy - y0
+            cur = window[cy:cy + bh, cx:cx + bw]
+            if cur.shape != item["ref"].shape:
+                cur = _gray_blur(frame[y:y + bh, x:x + bw], self.blur)
+                dx = dy = 0
+            diff = cv2.absdiff(cur, item["ref"])
+            _, changed = cv2.threshold(diff, self.thresh, 255, cv2.THRESH_BINARY)
+            cv2.bitwise_and(changed, item["mask"], dst=changed)
+            frac = cv2.countNonZero(changed) / item["mask_px"]
+            states.append({"name": item["name"], "present": frac < self.missing_fraction,
+                           "changed": round(frac, 3), "shift": (int(dx), int(dy))})
+        return states
+
+    def score(self, states):
+        """Porcentaje de slots faltantes (misma escala que el score inteligente)."""
+        if not states:
+            return 0.0
+        return 100.0 * sum(not s["present"] for s in states) / len(states)
+
+    def render(self, frame, states):
+        """Imagen con los polígonos en verde (presente) o rojo (falta) y la máscara de faltantes."""
+        overlay = frame.copy()
+        mask = np.zeros(frame.shape[:2], np.uint8)
+        for item, st in zip(self.items, states):
+            color = (0, 200, 0) if st["present"] else (0, 0, 255)
+            poly = item["poly"] + st["shift"]
+            cv2.polylines(overlay, [poly], True, color, 3)
+            if not st["present"]:
+                cv2.fillPoly(mask, [poly], 255)
+            x, y = poly[:, 0].min(), poly[:, 1].min()
+            cv2.putText(overlay, item["name"], (int(x), int(max(y - 6, 12))),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
+        return overlay, mask
+
+
+def edit_slots(image, slots=None, window="Definir slots"):
+    """
+    Editor de polígonos con OpenCV (extensión de define_roi):
+      clic izquierdo = agregar vértice    ENTER / N = cerrar polígono
+      U = deshacer vértice / polígono     S / ESC = terminar
+    Devuelve la lista de slots.
+    """
+    slots = [dict(s) for s in (slots or [])]
+    current = []
+
+    def on_mouse(event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            current.append([x, y])
+
+    cv2.namedWindow(window)
+    cv2.setMouseCallback(window, on_mouse)
+    while True:
+        view = image.copy()
+        for s in slots:
+            poly = np.array(s["polygon"], np.int32)
+            cv2.polylines(view, [poly], True, (0, 255, 0), 2)
+            cv2.putText(view, s["name"], tuple(int(v) for v in poly[0]), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.6, (0, 255, 0), 2, cv2.LINE_AA)
+        if current:
+            cv2.polylines(view, [np.array(current, np.int32)], False, (0, 200, 255), 2)
+        cv2.putText(view, "Clic: vertice | ENTER: cerrar | U: deshacer | S: terminar",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.imshow(window, view)
+        key = cv2.waitKey(20) & 0xFF
+        if key in (13, 10, ord("n")) and len(current) >= 3:
+            slots.append({"name": f"slot {len(slots) + 1}", "polygon": list(current)})
+            current.clear()
+        elif key == ord("u"):
+            if current:
+                current.pop()
+            elif slots:
+                slots.pop()
+        elif key in (ord("s"), 27):
+            break
+    cv2.destroyWindow(window)
+    return slots
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Ajuste de los parámetros de detección con pares etiquetados.
+
+Los sliders (blur, thresh, morph, min_area) y las constantes de
+detect_added_removed_smart (umbral mínimo, aspecto, compacidad, factor de
+área) se ajustaron a mano. Aquí se prueban combinaciones sobre pares del
+archivo cuya respuesta se conoce (falta / no falta herramienta) y se guarda
+la mejor como perfil JSON, que cargan cam_gui_tk.py ("Cargar perfil") y
+inspection_server.py ("profile" en la config o --profile).
+
+Cada par guarda sus etapas intermedias por subconjunto de parámetros: las
+máscaras de objetos dependen sólo de (blur, morph), las de diferencia de
+(blur, umbral, morph), y los filtros de forma y el score se aplican sobre
+los contornos ya medidos. Así cientos de combinaciones que comparten blur y
+morph no repiten el trabajo de imagen. Los pares se reparten en un pool de
+procesos.
+
+Uso:
+    python tune.py archivo/ --labels etiquetas.csv --out perfil.json
+    python tune.py archivo/ --labels etiquetas.csv --method bayes --trials 300
+    python tune.py archivo/ --labels etiquetas.csv --thresh 20 30 40 --min-area 800 1500
+
+etiquetas.csv (ts como en los nombres <ts>_photo1_ref.png):
+    ts,missing
+    20251010-032727,1
+    20251010-032746,0
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from alignment import Aligner
+from detection import FramePrep, filter_regions, region_stats, smart_masks, smart_score, tool_mask
+from pipeline import save_profile
+from rescore import find_pairs
+
+try:
+    import optuna
+except ImportError:
+    optuna = None
+
+# Espacio de búsqueda por defecto (valores actuales incluidos)
+GRID = {
+    "blur": [3, 5, 7],
+    "thresh": [25, 35, 45],
+    "morph": [3, 5, 7],
+    "min_area": [1000, 1500, 2500],
+    "min_thresh": [20, 30],
+    "max_aspect": [5.0, 8.0],
+    "min_compactness": [0.10, 0.15],
+    "area_factor": [8.0, 12.0, 16.0],
+}
+ALERT_SCORE = 35.0   # score > 35 = "ALERTA - Falta herramienta" en la GUI
+PAIR_CACHE = 32      # pares con sus etapas guardadas por proceso
+
+
+# ---------- Evaluación de un par ----------
+class PairEval:
+    """Un par (referencia, actual) con sus etapas intermedias guardadas."""
+
+    def __init__(self, path1, path2, align=False):
+        img1, img2 = cv2.imread(path1), cv2.imread(path2)
+        if img1 is None or img2 is None or img1.shape != img2.shape:
+            raise ValueError(f"No se pudo leer el par o tamaños distintos: {path1}")
+        self.prep1, self.prep2 = FramePrep(img1), FramePrep(img2)
+        if align:
+            img2, ok, _ = Aligner(self.prep1).align(img2, prep2=self.prep2)
+            if ok:
+                self.prep2 = FramePrep(img2)
+        self.pixels = img1.shape[0] * img1.shape[1]
+        self._cache = {}
+
+    def _memo(self, key, fn):
+        out = self._cache.get(key)
+        if out is None:
+            out = self._cache[key] = fn()
+        return out
+
+    def _tools(self, prep, which, blur, morph, floor):
+        return self._memo(("tools", which, blur, morph, floor),
+                          lambda: region_stats(tool_mask(prep, blur, morph), floor))
+
+    def _changes(self, blur, thr_loc, morph, floor):
+        def build():
+            add_mask, rem_mask = smart_masks(self.prep1, self.prep2, blur, thr_loc, morph, min_thresh=0)
+            return region_stats(add_mask, floor), region_stats(rem_mask, floor)
+        return self._memo(("changes", blur, thr_loc, morph, floor), build)
+
+    def score(self, p, floor):
+        """Mismo score que detect_added_removed_smart con los parámetros `p`."""
+        shape = dict(min_area=p["min_area"], max_aspect=p["max_aspect"],
+                     min_compactness=p["min_compactness"])
+        blur, morph = p["blur"], p["morph"]
+        tools_ref = len(filter_regions(self._tools(self.prep1, 1, blur, morph, floor), **shape))
+        tools_cur = len(filter_regions(self._tools(self.prep2, 2, blur, morph, floor), **shape))
+        add_stats, rem_stats = self._changes(blur, max(p["thresh"], p["min_thresh"]), morph, floor)
+        added = filter_regions(add_stats, **shape)
+        removed = filter_regions(rem_stats, **shape)
+        total_area = sum(r[1] for r in added) + sum(r[1] for r in removed)
+        return smart_score(tools_ref, tools_cur, len(removed), total_area, self.pixels, p["area_factor"])
+
+
+_pairs = OrderedDict()
+
+
+def _init_worker():
+    cv2.setNumThreads(1)
+
+
+def evaluate_pair(pair, configs, floor, align=False):
+    """Scores del par para cada combinación (se guarda el par en el proceso para la siguiente tanda)."""
+    key = (pair[1], pair[2], align)
+    ev = _pairs.pop(key, None)
+    if ev is None:
+        ev = PairEval(pair[1], pair[2], align)
+    _pairs[key] = ev
+    while len(_pairs) > PAIR_CACHE:
+        _pairs.popitem(last=False)
+    return [ev.score(p, floor) for p in configs]
+
+
+def evaluate(pool, pairs, configs, floor, align):
+    """Matriz de scores [combinación][par]."""
+    futures = [pool.submit(evaluate_pair, pair, configs, floor, align) for pair in pairs]
+    per_pair = [f.result() for f in futures]
+    return np.array(per_pair, dtype=float).T
+
+
+# ---------- Métricas ----------
+def metrics(scores, labels, alert=ALERT_SCORE):
+    pred = scores > alert
+    tp = int(np.sum(pred & labels)); fp = int(np.sum(pred & ~labels))
+    tn = int(np.sum(~pred & ~labels)); fn = int(np.sum(~pred & labels))
+    tpr = tp / max(tp + fn, 1)
+    tnr = tn / max(tn + fp, 1)
+    f1 = 2 * tp / max(2 * tp + fp + fn, 1)
+    margin = (scores[labels].mean() if labels.any() else 0.0) - (scores[~labels].mean() if (~labels).any() else 0.0)
+    return {"balanced_accuracy": round((tpr + tnr) / 2, 4), "f1": round(f1, 4),
+            "accuracy": round((tp + tn) / max(len(labels), 1), 4), "margin": round(float(margin), 2),
+            "tp": tp, "fp": fp, "tn": tn, "fn": fn}
+
+
+def objective(m):
+    # Exactitud balanceada primero; a igualdad, la mayor separación de scores
+    return m["balanced_accuracy"] + 1e-4 * m["margin"]
+
+
+# ---------- Búsqueda ----------
+def run_grid(pool, pairs, labels, space, floor, align, alert):
+    configs = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    print(f"🔍 Grid: {len(configs)} combinaciones × {len(pairs)} pares")
+    scores = evaluate(pool, pairs, configs, floor, align)
+    return [(cfg, metrics(row, labels, alert)) for cfg, row in zip(configs, scores)]
+
+
+def run_bayes(pool, pairs, labels, space, floor, align, alert, trials, batch):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.create_study(direction="maximize", sampler=optuna.samplers.TPESampler(seed=0))
+    print(f"🔍 Bayes (TPE): {trials} pruebas en tandas de {batch} × {len(pairs)} pares")
+    results = []
+    while len(results) < trials:
+        asked = [study.ask() for _ in range(min(batch, trials - len(results)))]
+        configs = [{k: t.suggest_categorical(k, v) for k, v in space.items()} for t in asked]
+        scores = evaluate(pool, pairs, configs, floor, align)
+        for trial, cfg, row in zip(asked, configs, scores):
+            m = metrics(row, labels, alert)
+            study.tell(trial, objective(m))
+            results.append((cfg, m))
+        best = max(results, key=lambda r: objective(r[1]))[1]
+        print(f"  {len(results)}/{trials} | mejor exactitud balanceada {best['balanced_accuracy']:.3f}")
+    return results
+
+
+def load_labels(path, pairs):
+    """Pares con etiqueta y el vector de etiquetas (True = falta herramienta)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        labels = {row["ts"].strip(): row["missing"].strip().lower() in ("1", "true", "si", "sí", "yes")
+                  for row in csv.DictReader(f)}
+    labeled = [p for p in pairs if p[0] in labels]
+    return labeled, np.array([labels[p[0]] for p in labeled], dtype=bool)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Ajustar parámetros de detección 5S con pares etiquetados.")
+    ap.add_argument("archive", help="Carpeta con los pares guardados.")
+    ap.add_argument("--labels", required=True, help="CSV con columnas ts,missing.")
+    ap.add_argument("--out", default="perfil.json", help="Perfil de parámetros resultante.")
+    ap.add_argument("--method", choices=["grid", "bayes"], default="grid")
+    ap.add_argument("--trials", type=int, default=200, help="Pruebas (sólo bayes).")
+    ap.add_argument("--batch", type=int, default=None, help="Pruebas por tanda (bayes; por defecto 4×procesos).")
+    ap.add_argument("--alert", type=float, default=ALERT_SCORE, help="Score a partir del cual se predice 'falta'.")
+    ap.add_argument("--align", action="store_true", help="Alinear cada par antes de evaluar.")
+    ap.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, núcleos).")
+    for key, values in GRID.items():
+        ap.add_argument(f"--{key.replace('_', '-')}", type=type(values[0]), nargs="+", default=values)
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.method == "bayes" and optuna is None:
+        print("✗ --method bayes necesita optuna (pip install optuna)")
+        sys.exit(1)
+    pairs, labels = load_labels(args.labels, find_pairs(args.archive))
+    if not pairs:
+        print("✗ Ningún par del archivo tiene etiqueta")
+        sys.exit(1)
+    print(f"📋 {len(pairs)} pares etiquetados ({int(labels.sum())} con faltantes)")
+
+    space = {key: getattr(args, key) for key in GRID}
+    floor = min(space["min_area"])  # contornos más chicos no pasan ningún filtro
+    workers = args.workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        if args.method == "grid":
+            results = run_grid(pool, pairs, labels, space, floor, args.align, args.alert)
+        else:
+            results = run_bayes(pool, pairs, labels, space, floor, args.align, args.alert,
+                                args.trials, args.batch or 4 * workers)
+    elapsed = time.perf_counter() - t0
+
+    results.sort(key=lambda r: objective(r[1]), reverse=True)
+    print("\nbal.acc    f1  margen  " + " ".join(f"{k:>8.8}" for k in GRID))
+    for cfg, m in results[:10]:
+        print(f"{m['balanced_accuracy']:7.3f} {m['f1']:5.3f} {m['margin']:7.1f}  "
+              + " ".join(f"{cfg[k]:>8}" for k in GRID))
+
+    best, best_m = results[0]
+    save_profile(args.out, best, metrics=best_m, pares=len(pairs), metodo=args.method,
+                 alerta=args.alert, fecha=datetime.now().isoformat(timespec="seconds"))
+    print(f"\n✓ Perfil guardado en {args.out} | {len(results)} combinaciones en {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
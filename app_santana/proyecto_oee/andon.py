@@ -1,12 +1,22 @@
 def verificar_alerta(indicadores):
     """
     Define umbrales mínimos de desempeño y devuelve lista de alertas.
+    Los indicadores vienen en porcentaje (0-100), igual que calcular_indicadores.
     """
     alertas = []
-    if indicadores['OEE'] < 0.85:
+    if indicadores['OEE'] < 85:
         alertas.append("Bajo OEE (<85%)")
-    if indicadores['Disponibilidad'] < 0.90:
+    if indicadores['Disponibilidad'] < 90:
         alertas.append("Baja Disponibilidad")
-    if indicadores['Calidad'] < 0.95:
+    if indicadores['Calidad'] < 95:
         alertas.append("Problemas de Calidad")
     return alertas
+
+
+def verificar_evento(acumulador, evento):
+    """
+    Agrega un evento nuevo al OEEAccumulator y revisa las alertas con los
+    indicadores actualizados, sin recalcular el historial completo.
+    """
+    acumulador.add(evento)
+    return verificar_alerta(acumulador.snapshot())
@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from generador_datos import generar_datos_bitacora, guardar
+from utils.carga import CacheBitacoras
+from utils.fechas import parsear_columna, parsear_fechas
+from utils.indicadores import (calcular_mtbf, calcular_mttr, calcular_mtta, calcular_oee,
+                               calcular_disponibilidad, calcular_desempeno, calcular_calidad,
+                               calcular_indicadores)
+
+# --- CONFIGURACIÓN ---
+RUTA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+COLUMNAS_FECHA = ['inicio_falla', 'fin_falla', 'inicio_reparacion', 'fin_reparacion']
+
+# Casos fijos de parsear_columna: (textos, formato, fechas esperadas). Las
+# fechas ISO que no cumplen el formato no deben cambiar día por mes.
+CASOS_FECHA = [
+    (['01/10/2025 08:00', '2025-10-02 09:00:00', '2025-10-03 11:00:00'], '%d/%m/%Y %H:%M',
+     ['2025-10-01 08:00', '2025-10-02 09:00', '2025-10-03 11:00']),
+    (['4/12/2025', '2025-12-05', '5/12/2025'], '%d/%m/%Y',
+     ['2025-12-04', '2025-12-05', '2025-12-05']),
+]
+
+
+def oee_por_funciones(df):
+    """OEE armado con las funciones individuales (una pasada por indicador), como referencia."""
+    disponibilidad = calcular_disponibilidad(calcular_mtbf(df), calcular_mttr(df))
+    return (disponibilidad / 100) * (calcular_desempeno(df) / 100) * (calcular_calidad(df) / 100) * 100
+
+
+def carga_original(ruta):
+    """Ruta de carga original de dashboard.py: parser python y fechas sin formato."""
+    df = pd.read_csv(ruta, sep=',', engine='python')
+    for col in COLUMNAS_FECHA:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def carga_dashboard(ruta):
+    """Ruta de carga actual de dashboard.py (cache en frío + fechas con formato)."""
+    df = CacheBitacoras().cargar(ruta).copy(deep=False)
+    parsear_fechas(df, 'fallas')
+    return df
+
+
+def medir(funcion, *args, repeticiones=3):
+    """
+    Devuelve (mejor tiempo en s, memoria pico en MB, último resultado).
+    Los tiempos se toman sin tracemalloc (que frena las asignaciones) y la
+    memoria pico en una corrida aparte.
+    """
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion(*args)
+        tiempos.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    funcion(*args)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(tiempos), pico / 1024 ** 2, resultado
+
+
+def verificar(df):
+    """
+    Compara calcular_indicadores contra las funciones individuales.
+    Devuelve {indicador: (valor_motor, valor_referencia, idéntico)}.
+    """
+    motor = calcular_indicadores(df)
+    referencia = {
+        'MTBF': calcular_mtbf(df),
+        'MTTR': calcular_mttr(df),
+        'MTTA': calcular_mtta(df),
+        'Desempeño': calcular_desempeno(df),
+        'Calidad': calcular_calidad(df),
+        'OEE': oee_por_funciones(df),
+    }
+    salida = {}
+    for k, ref in referencia.items():
+        val = motor[k]
+        identico = bool((np.isnan(val) and np.isnan(ref)) or val == ref)
+        salida[k] = (float(val), float(ref), identico)
+    return salida
+
+
+def verificar_fechas():
+    """Corre CASOS_FECHA. Devuelve la lista de (texto, esperado, obtenido) que no coinciden."""
+    errores = []
+    for textos, formato, esperadas in CASOS_FECHA:
+        fechas, _ = parsear_columna(pd.Series(textos), formato)
+        for texto, esperada, obtenida in zip(textos, pd.to_datetime(esperadas), fechas):
+            if obtenida != esperada:
+                errores.append((texto, str(esperada), str(obtenida)))
+    return errores
+
+
+def version_codigo():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return 'desconocida'
+
+
+def correr(exponentes, max_carga, repeticiones, semilla):
+    funciones = [
+        ('calcular_mtbf', calcular_mtbf),
+        ('calcular_mttr', calcular_mttr),
+        ('calcular_mtta', calcular_mtta),
+        ('calcular_oee', calcular_oee),
+        ('oee_por_funciones', oee_por_funciones),
+        ('calcular_indicadores', calcular_indicadores),
+    ]
+    resultados = []
+    verificaciones = {}
+
+    for e in exponentes:
+        n = 10 ** e
+        df = generar_datos_bitacora(n, pd.Timestamp('2025-10-01'), num_maquinas=max(1, n // 1000),
+                                    num_operadores=20, distribucion='exponencial', semilla=semilla)
+
+        verificaciones[n] = verificar(df)
+        for nombre, funcion in funciones:
+            t, mem, _ = medir(funcion, df, repeticiones=repeticiones)
+            resultados.append({'funcion': nombre, 'filas': n, 'tiempo_s': t, 'memoria_pico_mb': mem})
+            print(f"{nombre:<22} {n:>10} filas  {t * 1000:10.2f} ms  {mem:9.1f} MB")
+
+        if n <= max_carga:
+            with tempfile.TemporaryDirectory() as tmp:
+                ruta = os.path.join(tmp, 'bitacora.csv')
+                guardar(df, ruta, 'csv')
+                cargas = [('carga_dashboard', carga_dashboard)]
+                # El parser python es demasiado lento para tamaños grandes
+                if n <= 10 ** 5:
+                    cargas.append(('carga_original', carga_original))
+                for nombre, funcion in cargas:
+                    t, mem, _ = medir(funcion, ruta, repeticiones=repeticiones)
+                    resultados.append({'funcion': nombre, 'filas': n, 'tiempo_s': t, 'memoria_pico_mb': mem})
+                    print(f"{nombre:<22} {n:>10} filas  {t * 1000:10.2f} ms  {mem:9.1f} MB")
+        del df
+
+    return resultados, verificaciones
+
+
+def comparar(actual, anterior, tolerancia=1.10):
+    """Imprime la razón de tiempos contra una corrida anterior y marca regresiones."""
+    previos = {(r['funcion'], r['filas']): r for r in anterior['resultados']}
+    regresiones = 0
+    print(f"\nComparación contra {anterior.get('version', '?')}:")
+    for r in actual['resultados']:
+        p = previos.get((r['funcion'], r['filas']))
+        if p is None or p['tiempo_s'] == 0:
+            continue
+        razon = r['tiempo_s'] / p['tiempo_s']
+        marca = "⚠ REGRESIÓN" if razon > tolerancia else ""
+        regresiones += bool(marca)
+        print(f"{r['funcion']:<22} {r['filas']:>10} filas  x{razon:5.2f} {marca}")
+    return regresiones
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Benchmark de las funciones de indicadores OEE.")
+    ap.add_argument("--min-exp", type=int, default=3, help="Tamaño mínimo 10^n filas.")
+    ap.add_argument("--max-exp", type=int, default=6, help="Tamaño máximo 10^n filas (hasta 7).")
+    ap.add_argument("--max-carga", type=int, default=10 ** 6,
+                    help="Tamaño máximo para medir la carga de CSV del dashboard.")
+    ap.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por medición (se toma el mínimo).")
+    ap.add_argument("--semilla", type=int, default=0, help="Semilla de los datos generados.")
+    ap.add_argument("--etiqueta", default=None, help="Nombre de la corrida (por defecto, la versión de git).")
+    ap.add_argument("--salida", default=RUTA_RESULTADOS, help="Carpeta donde guardar el JSON.")
+    ap.add_argument("--comparar", default=None, help="JSON de una corrida anterior para detectar regresiones.")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    version = args.etiqueta or version_codigo()
+    resultados, verificaciones = correr(range(args.min_exp, args.max_exp + 1),
+                                        args.max_carga, args.repeticiones, args.semilla)
+
+    diferencias = [(n, k) for n, v in verificaciones.items() for k, (_, _, ok) in v.items() if not ok]
+    if diferencias:
+        print("\n❌ calcular_indicadores difiere de las funciones individuales en:", diferencias)
+    else:
+        print("\n✅ calcular_indicadores da resultados idénticos a las funciones individuales.")
+
+    errores_fecha = verificar_fechas()
+    if errores_fecha:
+        print("❌ parsear_columna convierte mal (texto, esperado, obtenido):", errores_fecha)
+    else:
+        print("✅ parsear_columna convierte bien los casos de fechas mixtas.")
+
+    salida = {
+        'version': version,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entorno': {'python': platform.python_version(), 'numpy': np.__version__,
+                    'pandas': pd.__version__, 'maquina': platform.machine()},
+        'resultados': resultados,
+        'verificacion': {str(n): v for n, v in verificaciones.items()},
+    }
+    os.makedirs(args.salida, exist_ok=True)
+    ruta = os.path.join(args.salida, f"resultados_{version}.json")
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(salida, f, indent=2, ensure_ascii=False)
+    print(f"📄 Resultados guardados en: {ruta}")
+
+    regresiones = 0
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regresiones = comparar(salida, json.load(f))
+
+    raise SystemExit(1 if diferencias or errores_fecha or regresiones else 0)
@@ -1,8 +1,11 @@
-import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from utils.indicadores import calcular_mtbf, calcular_mttr, calcular_oee
+from utils.carga import CacheBitacoras
+from utils.fechas import parsear_fechas, resumen_reporte
+from utils.almacen import leer_almacen, operadores_almacen
+from ingesta import RUTA_ALMACEN
+from utils.indicadores import calcular_indicadores, calcular_indicadores_por_grupo, calcular_indicadores_moviles
 
 # --- CONFIGURACIÓN INICIAL ---
 st.set_page_config(page_title="Dashboard Industrial 4.0", layout="wide")
@@ -10,10 +13,15 @@ st.title("Dashboard de Desempeño Industrial")
 
 # --- INPUT: URL DE BITÁCORA ---
 st.sidebar.header("Configuración")
-url_input = st.sidebar.text_input(
-    "Ingresa el enlace de tu bitácora CSV:",
-    placeholder="Pega aquí el link de Google Drive o de tu CSV público"
-)
+origen = st.sidebar.radio("Origen de datos:", ["URL CSV", "Almacén Parquet"])
+url_input = None
+if origen == "URL CSV":
+    url_input = st.sidebar.text_input(
+        "Ingresa el enlace de tu bitácora CSV:",
+        placeholder="Pega aquí el link de Google Drive o de tu CSV público"
+    )
+else:
+    ruta_almacen = st.sidebar.text_input("Carpeta del almacén:", value=RUTA_ALMACEN)
 
 # --- CONVERTIR URL DE GOOGLE DRIVE A DESCARGA DIRECTA ---
 def drive_to_direct(url):
@@ -22,13 +30,34 @@ def drive_to_direct(url):
         return f"https://drive.google.com/uc?export=download&id={file_id}"
     return url
 
+# --- CACHE DE BITÁCORAS (compartido entre reruns y sesiones) ---
+@st.cache_resource
+def obtener_cache():
+    return CacheBitacoras(ttl=30.0, max_bytes=512 * 1024 ** 2)
+
 # --- CARGAR DATOS ---
-if url_input:
+if origen == "Almacén Parquet":
+    try:
+        operadores = st.sidebar.multiselect("Operador:", operadores_almacen(ruta_almacen, 'fallas'))
+        rango = st.sidebar.date_input("Rango de fechas:", value=[])
+        desde, hasta = (rango[0], rango[-1]) if rango else (None, None)
+        # Sólo se leen las columnas y particiones (fecha/operador) necesarias
+        df = leer_almacen(ruta_almacen, 'fallas',
+                          columnas=['inicio_falla', 'fin_falla', 'inicio_reparacion', 'fin_reparacion',
+                                    'piezas_ok', 'piezas_defectuosas', 'tiempo_operativo',
+                                    'tiempo_total', 'operador'],
+                          desde=desde, hasta=hasta, operador=operadores or None)
+        st.success(f"{len(df)} registros cargados del almacén.")
+    except Exception as e:
+        st.error(f"Error al leer el almacén: {e}")
+        st.stop()
+elif url_input:
     st.info("Cargando datos desde la URL proporcionada...")
     url = drive_to_direct(url_input)
 
     try:
-        df = pd.read_csv(url, sep=',', engine='python')
+        # Copia superficial: abajo se agregan columnas y no debe tocarse el cache
+        df = obtener_cache().cargar(url).copy(deep=False)
         st.success("Datos cargados correctamente.")
     except Exception as e:
         st.error(f"Error al leer el archivo: {e}")
@@ -38,13 +67,15 @@ else:
     st.stop()
 
 # --- CONVERSIÓN DE FECHAS ---
-for col in ['inicio_falla', 'fin_falla', 'inicio_reparacion', 'fin_reparacion']:
-    df[col] = pd.to_datetime(df[col], errors='coerce')
+fechas_invalidas = parsear_fechas(df, 'fallas')
+if fechas_invalidas:
+    st.warning(f"Filas con fecha no válida (se ignoran): {resumen_reporte(fechas_invalidas)}")
 
 # --- CÁLCULO DE INDICADORES ---
-mtbf = calcular_mtbf(df)
-mttr = calcular_mttr(df)
-oee = calcular_oee(df)
+indicadores = calcular_indicadores(df)
+mtbf = indicadores['MTBF']
+mttr = indicadores['MTTR']
+oee = indicadores['OEE']
 
 # --- COLOR ANDON ---
 def color_andon(valor, bueno, medio):
@@ -83,6 +114,21 @@ with tabs[0]:
     fig = px.line(df, x='inicio_falla', y='tiempo_operativo', title="Tiempo operativo por evento")
     st.plotly_chart(fig, use_container_width=True)
 
+    st.subheader("OEE en ventana móvil")
+    ventana = st.selectbox("Ventana:", ["1h", "8h", "1D", "7D"], index=3)
+    moviles = calcular_indicadores_moviles(df, ventana=ventana).reset_index()
+    fig_mov = px.line(moviles, x='inicio_falla', y='OEE', title=f"OEE móvil ({ventana})")
+    st.plotly_chart(fig_mov, use_container_width=True)
+
+    st.subheader("Indicadores por grupo")
+    opciones_grupo = ['turno'] + [c for c in ('usuario', 'operador') if c in df.columns]
+    grupo = st.selectbox("Agrupar por:", opciones_grupo + ['dia'])
+    if grupo == 'dia':
+        por_grupo = calcular_indicadores_por_grupo(df, por=None, frecuencia='D')
+    else:
+        por_grupo = calcular_indicadores_por_grupo(df, por=grupo)
+    st.dataframe(por_grupo[['n_fallas', 'OEE', 'MTBF', 'MTTR', 'Calidad']].round(2))
+
 # ============================================================
 # TAB 2: MANTENIMIENTO
 # ============================================================
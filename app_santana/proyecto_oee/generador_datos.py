@@ -1,84 +1,206 @@
-import pandas as pd
-import numpy as np
+import argparse
+import math
 import os # Importamos la biblioteca os para manejar rutas de archivos
-from datetime import datetime, timedelta
-
-# Función para generar datos de prueba
-def generar_datos_bitacora(num_filas, inicio_base):
-    data = []
-    for i in range(num_filas):
-        # Generar fecha de inicio de falla
-        inicio_falla = inicio_base + timedelta(days=i, hours=np.random.randint(7, 12), minutes=np.random.randint(0, 59))
-
-        # Duración de la falla: 30 a 90 minutos
-        duracion_falla = timedelta(minutes=np.random.randint(30, 90))
-        fin_falla = inicio_falla + duracion_falla
-
-        # Inicio de reparación: 5 a 15 minutos después de fin_falla
-        retraso_reparacion = timedelta(minutes=np.random.randint(5, 15))
-        inicio_reparacion = fin_falla + retraso_reparacion
-
-        # Duración de la reparación: 20 a 50 minutos
-        duracion_reparacion = timedelta(minutes=np.random.randint(20, 50))
-        fin_reparacion = inicio_reparacion + duracion_reparacion
-
-        # Piezas
-        piezas_ok = np.random.randint(900, 1200)
-        piezas_defectuosas = np.random.randint(20, 60)
-
-        # Tiempos operativos y totales (simulación simple)
-        tiempo_total = 8 # Asumimos jornadas de 8 horas
-        # El tiempo operativo es el total menos el tiempo de inactividad
-        tiempo_inactividad_horas = (duracion_falla + retraso_reparacion + duracion_reparacion).total_seconds() / 3600
-        tiempo_operativo = max(0, tiempo_total - tiempo_inactividad_horas)
-
-        # Formato de fecha y hora
-        formato = '%d/%m/%Y %H:%M'
-
-        data.append({
-            'inicio_falla': inicio_falla.strftime(formato),
-            'fin_falla': fin_falla.strftime(formato),
-            'inicio_reparacion': inicio_reparacion.strftime(formato),
-            'fin_reparacion': fin_reparacion.strftime(formato),
-            'piezas_ok': piezas_ok,
-            'piezas_defectuosas': piezas_defectuosas,
-            'tiempo_operativo': round(tiempo_operativo, 2),
-            'tiempo_total': tiempo_total
-        })
-
-    df = pd.DataFrame(data)
-    return df
-
-# La nueva ruta base donde se guardarán los archivos
-RUTA_BASE = r'D:\7mo_semestre\Proyecto\industria_4_0\app_santana\proyecto_oee\datos'
-
-# Crear el directorio si no existe
-os.makedirs(RUTA_BASE, exist_ok=True)
-print(f"Directorio de destino: '{RUTA_BASE}' (Creado si no existía).")
-
-# Bases de fechas para simular diferentes períodos
-bases_de_fecha = [
-    datetime(2025, 10, 1),
-    datetime(2025, 11, 1),
-    datetime(2025, 12, 1),
-    datetime(2026, 1, 1),
-    datetime(2026, 2, 1)
-]
-
-# Generar y guardar 5 archivos CSV
-nombres_archivos = [f'bitacora_prueba_{i+1}.csv' for i in range(5)]
-num_datos = 50
-
-print(f"Generando {len(nombres_archivos)} archivos CSV con {num_datos} filas cada uno...")
-
-for i, base in enumerate(bases_de_fecha):
-    df_prueba = generar_datos_bitacora(num_datos, base)
-    
-    # Combinamos la ruta base con el nombre del archivo
-    ruta_completa_archivo = os.path.join(RUTA_BASE, nombres_archivos[i])
-    
-    # Guardamos el archivo en la ruta especificada
-    df_prueba.to_csv(ruta_completa_archivo, index=False) # LÍNEA MODIFICADA
-    print(f"✅ Archivo '{nombres_archivos[i]}' generado y guardado en:\n   {ruta_completa_archivo}")
-
-print("\n¡Archivos de prueba listos y guardados en la ruta solicitada!")
\ No newline at end of file
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fechas import ESQUEMAS_FECHA
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow es opcional: sólo acelera la escritura de CSV
+    pa = None
+    pa_csv = None
+
+# La ruta base donde se guardarán los archivos (carpeta datos/ junto a este script)
+RUTA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+
+# Formato de fecha y hora de la bitácora de fallas
+FORMATO = ESQUEMAS_FECHA['fallas']['inicio_falla']
+
+SEGUNDOS_DIA = 86400
+
+
+def _llegadas(rng, distribucion, n, mtbf_horas, forma):
+    """
+    Segundos entre fallas consecutivas de una máquina.
+      - uniforme: una falla por día entre las 7:00 y las 12:00 (comportamiento original)
+      - exponencial: tasa de fallas constante con media mtbf_horas
+      - weibull: forma < 1 fallas tempranas, > 1 desgaste; escala ajustada a mtbf_horas
+    """
+    if distribucion == 'exponencial':
+        return rng.exponential(mtbf_horas * 3600, n)
+    if distribucion == 'weibull':
+        escala = mtbf_horas * 3600 / math.gamma(1 + 1 / forma)
+        return escala * rng.weibull(forma, n)
+    raise ValueError(f"Distribución desconocida: {distribucion}")
+
+
+def formatear_fechas(fechas):
+    """
+    Convierte un arreglo datetime64 a texto '%d/%m/%Y %H:%M' (bytes de ancho
+    fijo) sin strftime por fila: se formatea una vez cada día del rango y cada
+    minuto del día, y se copian los bytes por índice.
+    """
+    segundos = np.asarray(fechas, dtype='datetime64[s]').astype(np.int64)
+    dias, resto = np.divmod(segundos, SEGUNDOS_DIA)
+    primero = dias.min() if len(dias) else 0
+    formato_dia, _ = FORMATO.split(' ')
+    rango = pd.to_datetime(np.arange(primero, dias.max() + 1 if len(dias) else 1), unit='D')
+    texto_dias = np.array(rango.strftime(formato_dia).tolist(), dtype='S10').view(np.uint8).reshape(-1, 10)
+    texto_min = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(1440)],
+                         dtype='S5').view(np.uint8).reshape(-1, 5)
+
+    salida = np.empty((len(segundos), 16), dtype=np.uint8)
+    salida[:, :10] = texto_dias[dias - primero]
+    salida[:, 10] = ord(' ')
+    salida[:, 11:] = texto_min[resto // 60]
+    return salida.view('S16').ravel()
+
+
+def generar_datos_bitacora(num_filas, inicio_base, num_maquinas=1, num_operadores=1,
+                           distribucion='uniforme', mtbf_horas=24.0, forma_weibull=1.5,
+                           semilla=None, como_texto=False):
+    """
+    Genera una bitácora de fallas sintética de forma vectorizada (arreglos de
+    NumPy y una sola construcción del DataFrame).
+
+    Las filas se reparten entre máquinas; cada máquina acumula sus tiempos entre
+    fallas según `distribucion`. Las fechas salen como datetime64; con
+    `como_texto` se convierten al formato de texto de la bitácora.
+    """
+    rng = np.random.default_rng(semilla)
+    n = num_filas
+    maquina = np.arange(n) % num_maquinas
+    k = np.arange(n) // num_maquinas
+
+    # Inicio de falla: segundos desde inicio_base
+    if distribucion == 'uniforme':
+        inicio_falla = k * SEGUNDOS_DIA + rng.integers(7, 12, n) * 3600 + rng.integers(0, 59, n) * 60
+    else:
+        por_maquina = -(-n // num_maquinas)
+        gaps = _llegadas(rng, distribucion, por_maquina * num_maquinas, mtbf_horas, forma_weibull)
+        acumulado = np.cumsum(gaps.reshape(por_maquina, num_maquinas), axis=0)
+        inicio_falla = acumulado.ravel()[:n]
+    inicio_falla = (inicio_falla // 60) * 60
+
+    # Duración de la falla: 30 a 90 minutos
+    duracion_falla = rng.integers(30, 90, n) * 60
+    # Inicio de reparación: 5 a 15 minutos después de fin_falla
+    retraso_reparacion = rng.integers(5, 15, n) * 60
+    # Duración de la reparación: 20 a 50 minutos
+    duracion_reparacion = rng.integers(20, 50, n) * 60
+
+    fin_falla = inicio_falla + duracion_falla
+    inicio_reparacion = fin_falla + retraso_reparacion
+    fin_reparacion = inicio_reparacion + duracion_reparacion
+
+    # Tiempos operativos y totales (simulación simple): jornadas de 8 horas
+    tiempo_total = 8
+    tiempo_inactividad_horas = (duracion_falla + retraso_reparacion + duracion_reparacion) / 3600
+    tiempo_operativo = np.round(np.maximum(0, tiempo_total - tiempo_inactividad_horas), 2)
+
+    base = np.datetime64(pd.Timestamp(inicio_base), 's')
+    columnas = {}
+    for nombre, valores in (('inicio_falla', inicio_falla), ('fin_falla', fin_falla),
+                            ('inicio_reparacion', inicio_reparacion), ('fin_reparacion', fin_reparacion)):
+        fechas = base + valores.astype(np.int64).astype('timedelta64[s]')
+        columnas[nombre] = formatear_fechas(fechas).astype(str) if como_texto else fechas
+
+    columnas['piezas_ok'] = rng.integers(900, 1200, n)
+    columnas['piezas_defectuosas'] = rng.integers(20, 60, n)
+    columnas['tiempo_operativo'] = tiempo_operativo
+    columnas['tiempo_total'] = np.full(n, tiempo_total)
+    # Categóricas: códigos enteros en lugar de millones de cadenas
+    if num_maquinas > 1:
+        columnas['maquina'] = pd.Categorical.from_codes(
+            maquina, [f"M{i + 1}" for i in range(num_maquinas)])
+    if num_operadores > 1:
+        columnas['operador'] = pd.Categorical.from_codes(
+            rng.integers(0, num_operadores, n), [f"Operador {i + 1}" for i in range(num_operadores)])
+
+    return pd.DataFrame(columnas)
+
+
+def guardar(df, ruta, formato, bloque=1_000_000):
+    """
+    Guarda la bitácora. En CSV las fechas se formatean y escriben por bloques
+    para no tener decenas de millones de cadenas en memoria a la vez; con
+    pyarrow disponible se usa su escritor CSV, mucho más rápido que to_csv.
+    """
+    if formato == 'parquet':
+        df.to_parquet(ruta, index=False)
+        return
+    columnas_fecha = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+    with open(ruta, 'wb') as f:
+        for inicio in range(0, max(len(df), 1), bloque):
+            parte = df.iloc[inicio:inicio + bloque]
+            encabezado = inicio == 0
+            if pa is not None:
+                tabla = pa.Table.from_pandas(parte, preserve_index=False)
+                for col in columnas_fecha:
+                    texto = pa.array(formatear_fechas(parte[col].to_numpy())).cast(pa.string())
+                    tabla = tabla.set_column(tabla.schema.get_field_index(col), col, texto)
+                pa_csv.write_csv(tabla, f, write_options=_opciones_csv(encabezado))
+            else:
+                parte = parte.copy()
+                for col in columnas_fecha:
+                    parte[col] = formatear_fechas(parte[col].to_numpy()).astype(str)
+                parte.to_csv(f, index=False, header=encabezado)
+
+
+def _opciones_csv(encabezado):
+    try:
+        return pa_csv.WriteOptions(include_header=encabezado, quoting_style='none',
+                                   quoting_header='none')
+    except TypeError:  # pyarrow sin quoting_header: el encabezado sale entre comillas
+        return pa_csv.WriteOptions(include_header=encabezado, quoting_style='none')
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Generador de bitácoras sintéticas para pruebas de carga.")
+    ap.add_argument("--filas", type=int, default=50, help="Filas por archivo.")
+    ap.add_argument("--archivos", type=int, default=5,
+                    help="Número de archivos; cada uno empieza un mes después del anterior.")
+    ap.add_argument("--maquinas", type=int, default=1, help="Número de máquinas.")
+    ap.add_argument("--operadores", type=int, default=1, help="Número de operadores.")
+    ap.add_argument("--semilla", type=int, default=None, help="Semilla del generador aleatorio.")
+    ap.add_argument("--inicio", default="2025-10-01", help="Fecha base del primer archivo (AAAA-MM-DD).")
+    ap.add_argument("--distribucion", choices=["uniforme", "exponencial", "weibull"], default="uniforme",
+                    help="Distribución del tiempo entre fallas.")
+    ap.add_argument("--mtbf-horas", type=float, default=24.0,
+                    help="Tiempo medio entre fallas (exponencial/weibull).")
+    ap.add_argument("--forma-weibull", type=float, default=1.5, help="Parámetro de forma de Weibull.")
+    ap.add_argument("--formato", choices=["csv", "parquet"], default="csv", help="Formato de salida.")
+    ap.add_argument("--prefijo", default="bitacora_prueba", help="Prefijo del nombre de archivo.")
+    ap.add_argument("--salida", default=RUTA_BASE, help="Carpeta de salida.")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Crear el directorio si no existe
+    os.makedirs(args.salida, exist_ok=True)
+    print(f"Directorio de destino: '{args.salida}' (Creado si no existía).")
+    print(f"Generando {args.archivos} archivo(s) {args.formato.upper()} con {args.filas} filas cada uno...")
+
+    inicio = pd.Timestamp(args.inicio)
+    for i in range(args.archivos):
+        t0 = time.perf_counter()
+        base = inicio + pd.DateOffset(months=i)
+        semilla = None if args.semilla is None else args.semilla + i
+        df_prueba = generar_datos_bitacora(
+            args.filas, base, num_maquinas=args.maquinas, num_operadores=args.operadores,
+            distribucion=args.distribucion, mtbf_horas=args.mtbf_horas,
+            forma_weibull=args.forma_weibull, semilla=semilla)
+
+        # Combinamos la ruta base con el nombre del archivo
+        ruta_completa_archivo = os.path.join(args.salida, f"{args.prefijo}_{i + 1}.{args.formato}")
+        guardar(df_prueba, ruta_completa_archivo, args.formato)
+        print(f"✅ Archivo generado en {time.perf_counter() - t0:.2f} s:\n   {ruta_completa_archivo}")
+
+    print("\n¡Archivos de prueba listos y guardados en la ruta solicitada!")
@@ -0,0 +1,64 @@
+import argparse
+import os
+
+import pandas as pd
+
+from utils.almacen import leer_csv_normalizado, escribir_almacen
+
+# --- CONFIGURACIÓN ---
+RUTA_BITACORAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Bitacoras')
+RUTA_ALMACEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos', 'almacen')
+
+
+def buscar_csv(origenes):
+    """Recorre las carpetas de origen y devuelve todos los CSV encontrados."""
+    for origen in origenes:
+        if os.path.isfile(origen):
+            yield origen
+            continue
+        for carpeta, _, archivos in os.walk(origen):
+            for nombre in sorted(archivos):
+                if nombre.lower().endswith('.csv'):
+                    yield os.path.join(carpeta, nombre)
+
+
+def ingesta(origenes, destino, fecha_defecto=None):
+    """
+    Normaliza todas las bitácoras CSV de `origenes` y las escribe en el
+    almacén Parquet. Cada tipo se escribe en una sola pasada para que las
+    particiones compartidas por varios archivos no se pisen entre sí.
+    """
+    por_tipo = {}
+    for ruta in buscar_csv(origenes):
+        try:
+            tipo, df = leer_csv_normalizado(ruta, fecha_defecto=fecha_defecto)
+        except Exception as e:
+            print(f"⚠ No se pudo leer {ruta}: {e}")
+            continue
+        if tipo is None:
+            print(f"⚠ Formato no reconocido, se omite: {ruta}")
+            continue
+        por_tipo.setdefault(tipo, []).append(df)
+        print(f"✅ {ruta} -> {tipo} ({len(df)} filas)")
+
+    for tipo, partes in por_tipo.items():
+        df = pd.concat(partes, ignore_index=True)
+        escribir_almacen(df, destino, tipo)
+        print(f"📦 {tipo}: {len(df)} filas escritas en {os.path.join(destino, tipo)}")
+    return {tipo: sum(len(p) for p in partes) for tipo, partes in por_tipo.items()}
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Ingesta de bitácoras CSV al almacén Parquet particionado.")
+    ap.add_argument("--origen", action="append",
+                    help="Carpeta o archivo CSV a ingerir (se puede repetir). Por defecto Bitacoras/.")
+    ap.add_argument("--destino", default=RUTA_ALMACEN, help="Carpeta raíz del almacén Parquet.")
+    ap.add_argument("--fecha", default=None,
+                    help="Fecha (AAAA-MM-DD) para bitácoras sin columna de fecha. "
+                         "Por defecto, la fecha de modificación del archivo.")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ingesta(args.origen or [RUTA_BITACORAS], args.destino, fecha_defecto=args.fecha)
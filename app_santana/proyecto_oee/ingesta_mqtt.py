@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import random
+import signal
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+from ingesta import RUTA_ALMACEN
+from utils.almacen import ESQUEMAS, SIN_OPERADOR, agregar_almacen
+from utils.mensajes import TOPICOS, parsear_mensaje
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # paho sólo hace falta para conectarse al broker real
+    mqtt = None
+
+# --- CONFIGURACIÓN ---
+BROKER = "10.25.90.33"
+PUERTO = 1883
+TIPO = 'sensores'
+
+# Mensaje recibido y la función que lo confirma al broker (None si no aplica)
+Mensaje = namedtuple('Mensaje', ['topico', 'payload', 'recibido', 'ack'])
+
+
+def lote_a_dataframe(filas):
+    """Convierte las filas interpretadas al esquema 'sensores' + particiones."""
+    columnas = list(ESQUEMAS[TIPO])
+    df = pd.DataFrame.from_records(filas, columns=columnas + ['operador'])
+    df = df.astype({col: ESQUEMAS[TIPO][col] for col in columnas})
+    df['fecha'] = df['timestamp'].dt.date
+    df['operador'] = df['operador'].astype('string')
+    return df
+
+
+class IngestaMQTT:
+    """
+    Junta los mensajes en memoria y los vuelca por lotes al almacén Parquet.
+
+    - Un lote se escribe al llegar a `max_lote` mensajes o cuando el mensaje
+      más viejo lleva `max_segundos` esperando.
+    - La cola tiene como máximo `max_pendientes` mensajes: si la escritura se
+      atrasa, `recibir` se bloquea y eso frena la lectura del broker
+      (back-pressure) en lugar de llenar la memoria.
+    - Cada mensaje se confirma (ack) sólo después de que su lote quedó
+      escrito; si el proceso muere antes, el broker lo vuelve a entregar
+      (al menos una vez: puede haber duplicados, nunca pérdidas).
+    """
+
+    def __init__(self, destino=RUTA_ALMACEN, max_lote=5000, max_segundos=5.0, max_pendientes=50000):
+        self.destino = destino
+        self.max_lote = max_lote
+        self.max_segundos = max_segundos
+        self.cola = asyncio.Queue(maxsize=max_pendientes)
+        self.lote = []
+        self.acks = []
+        self.inicio_lote = None
+        self.operador = SIN_OPERADOR
+        self.escritos = 0
+        self._detener = asyncio.Event()
+
+    async def recibir(self, topico, payload, ack=None, recibido=None):
+        """Encola un mensaje; espera si la cola está llena."""
+        await self.cola.put(Mensaje(topico, payload, recibido or datetime.now(), ack))
+
+    def detener(self):
+        """Pide terminar: se vacía la cola, se escribe el último lote y `correr` regresa."""
+        self._detener.set()
+
+    def _agregar(self, mensaje):
+        fila = parsear_mensaje(mensaje.topico, mensaje.payload)
+        if fila is None:
+            # Mensaje mal formado: se descarta, pero se confirma con el lote
+            # para que el broker no lo reenvíe
+            if mensaje.ack is not None:
+                self.acks.append(mensaje.ack)
+            return
+        # El operador del turno es el de la última tarjeta leída (como operadorActual en Node-RED)
+        if 'operador' in fila:
+            self.operador = fila['operador']
+        fila['operador'] = self.operador
+        fila['timestamp'] = mensaje.recibido
+        if not self.lote:
+            self.inicio_lote = time.monotonic()
+        self.lote.append(fila)
+        if mensaje.ack is not None:
+            self.acks.append(mensaje.ack)
+
+    async def volcar(self):
+        """Escribe el lote actual. Devuelve False (y conserva el lote) si falla."""
+        if not self.lote:
+            return True
+        df = lote_a_dataframe(self.lote)
+        try:
+            await asyncio.to_thread(agregar_almacen, df, self.destino, TIPO, uuid.uuid4().hex)
+        except Exception as e:
+            print(f"⚠ No se pudo escribir el lote de {len(self.lote)} mensajes: {e}")
+            return False
+        for ack in self.acks:
+            ack()
+        self.escritos += len(self.lote)
+        print(f"📦 {len(self.lote)} mensajes escritos ({self.escritos} en total)")
+        self.lote, self.acks, self.inicio_lote = [], [], None
+        return True
+
+    def _vencido(self):
+        return bool(self.lote) and time.monotonic() - self.inicio_lote >= self.max_segundos
+
+    async def correr(self):
+        espera_error = 1.0
+        while not (self._detener.is_set() and self.cola.empty()):
+            if len(self.lote) >= self.max_lote or self._vencido():
+                if not await self.volcar():
+                    # No se consume más hasta poder escribir: la cola se llena y frena al broker
+                    await asyncio.sleep(espera_error)
+                    espera_error = min(espera_error * 2, 60.0)
+                    continue
+                espera_error = 1.0
+
+            espera = self.max_segundos if not self.lote else \
+                max(0.0, self.max_segundos - (time.monotonic() - self.inicio_lote))
+            try:
+                mensaje = await asyncio.wait_for(self.cola.get(), timeout=min(espera, 0.5))
+            except asyncio.TimeoutError:
+                continue
+            self._agregar(mensaje)
+            # Vaciar lo que ya está en cola sin volver a esperar
+            while len(self.lote) < self.max_lote and not self.cola.empty():
+                self._agregar(self.cola.get_nowait())
+
+        while self.lote and not await self.volcar():
+            await asyncio.sleep(espera_error)
+
+
+def _crear_cliente(client_id):
+    """Cliente paho con sesión persistente y ack manual si la versión lo permite."""
+    try:
+        cliente = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id,
+                              clean_session=False, manual_ack=True)
+        return cliente, True
+    except (AttributeError, TypeError):
+        # paho < 2.0: el ack sale al recibir, un corte puede perder el último lote
+        print("⚠ paho-mqtt < 2.0: sin ack manual, la entrega no es 'al menos una vez'")
+        return mqtt.Client(client_id=client_id, clean_session=False), False
+
+
+def conectar_mqtt(ingesta, loop, host=BROKER, puerto=PUERTO, topicos=TOPICOS, qos=1,
+                  client_id="ingesta_oee", usuario=None, password=None):
+    """
+    Conecta paho al broker y pasa cada mensaje a `ingesta`. El hilo de red de
+    paho espera a que el mensaje entre en la cola, así que si la cola está
+    llena deja de leer del socket y el broker retiene los mensajes.
+    """
+    if mqtt is None:
+        raise ImportError("La ingesta MQTT requiere paho-mqtt: pip install paho-mqtt")
+    cliente, manual = _crear_cliente(client_id)
+    if usuario:
+        cliente.username_pw_set(usuario, password)
+
+    def on_connect(client, *_):
+        for topico in topicos:
+            client.subscribe(topico, qos=qos)
+        print(f"✅ Conectado a {host}:{puerto}, suscrito a {', '.join(topicos)}")
+
+    def on_message(client, userdata, msg):
+        ack = (lambda mid=msg.mid, q=msg.qos: client.ack(mid, q)) if manual and msg.qos > 0 else None
+        futuro = asyncio.run_coroutine_threadsafe(ingesta.recibir(msg.topic, msg.payload, ack), loop)
+        futuro.result()
+
+    cliente.on_connect = on_connect
+    cliente.on_message = on_message
+    cliente.connect(host, puerto, keepalive=60)
+    cliente.loop_start()
+    return cliente
+
+
+async def simular(ingesta, n, semilla=None):
+    """Alimenta `n` mensajes sintéticos, sin broker (pruebas de carga)."""
+    rng = random.Random(semilla)
+    uids = ['3024565763', '3597117261']
+    for i in range(n):
+        r = rng.random()
+        if i % 10000 == 0:
+            await ingesta.recibir('datos/operador', rng.choice(uids))
+        elif r < 0.5:
+            x, y, z = (round(rng.uniform(-2, 2), 2) for _ in range(3))
+            await ingesta.recibir('datos/vibracion', f"ID:VIBRATION;X:{x},Y:{y},Z:{z}")
+        elif r < 0.95:
+            await ingesta.recibir('datos/corriente', f"ID:CURRENT;VALUE:{rng.randint(1800, 2300)}")
+        elif r < 0.99:
+            estado = rng.choice(['verdadero', 'falso'])
+            await ingesta.recibir('datos/microparo', f"ID:BUTTON;ESTADO:{estado};MID:{rng.randint(1, 3)}")
+        else:
+            await ingesta.recibir('datos/score', str(rng.randint(0, 100)))
+    ingesta.detener()
+
+
+async def main(args):
+    ingesta = IngestaMQTT(args.destino, max_lote=args.max_lote, max_segundos=args.max_segundos,
+                          max_pendientes=args.max_pendientes)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, ingesta.detener)
+        except NotImplementedError:  # Windows
+            pass
+
+    if args.simular:
+        t0 = time.perf_counter()
+        await asyncio.gather(simular(ingesta, args.simular, args.semilla), ingesta.correr())
+        dt = time.perf_counter() - t0
+        print(f"✅ {ingesta.escritos} mensajes en {dt:.2f} s ({ingesta.escritos / dt:,.0f} msg/s)")
+        return
+
+    cliente = conectar_mqtt(ingesta, loop, args.broker, args.puerto, client_id=args.client_id,
+                            usuario=args.usuario, password=args.password)
+    try:
+        await ingesta.correr()
+    finally:
+        # Lo que llegue después del último lote queda sin ack y el broker lo reenvía
+        cliente.disconnect()
+        cliente.loop_stop()
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Ingesta MQTT de sensores al almacén Parquet (reemplaza los nodos file de Node-RED).")
+    ap.add_argument("--broker", default=BROKER, help="Host del broker MQTT.")
+    ap.add_argument("--puerto", type=int, default=PUERTO, help="Puerto del broker MQTT.")
+    ap.add_argument("--usuario", default=None)
+    ap.add_argument("--password", default=None)
+    ap.add_argument("--client-id", default="ingesta_oee",
+                    help="ID fijo: la sesión persistente guarda los mensajes QoS 1 mientras no hay conexión.")
+    ap.add_argument("--destino", default=RUTA_ALMACEN, help="Carpeta raíz del almacén Parquet.")
+    ap.add_argument("--max-lote", type=int, default=5000, help="Mensajes por lote escrito.")
+    ap.add_argument("--max-segundos", type=float, default=5.0, help="Espera máxima antes de escribir un lote.")
+    ap.add_argument("--max-pendientes", type=int, default=50000,
+                    help="Mensajes en cola antes de dejar de leer del broker.")
+    ap.add_argument("--simular", type=int, default=0,
+                    help="Generar N mensajes sintéticos en lugar de conectarse al broker.")
+    ap.add_argument("--semilla", type=int, default=None)
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,6 +1,9 @@
 import pandas as pd
 from utils.indicadores import calcular_indicadores
+from utils.almacen import leer_almacen
+from utils.fechas import parsear_fechas, resumen_reporte
 from andon import verificar_alerta
+from ingesta import RUTA_ALMACEN
 import os
 
 # --- CONFIGURACIÓN ---
@@ -22,6 +25,19 @@ def descarga_datos(url, destino):
         return None
 
 
+def carga_almacen(raiz=RUTA_ALMACEN):
+    """Lee la bitácora de fallas desde el almacén Parquet local, si existe."""
+    if not os.path.isdir(os.path.join(raiz, 'fallas')):
+        return None
+    try:
+        df = leer_almacen(raiz, 'fallas')
+        print(f"✅ Bitácora leída del almacén Parquet: {raiz}")
+        return df
+    except Exception as e:
+        print("Error al leer el almacén:", e)
+        return None
+
+
 def muestra_resultados(indicadores):
     """Imprime los resultados de forma ordenada en consola."""
     print("\nIndicadores calculados:")
@@ -34,7 +50,29 @@ def main():
 
     # 1️⃣ Descargar bitácora
     df = descarga_datos(BITACORA_URL, ARCHIVO_LOCAL)
+    if df is None:
+        # Sin conexión: usar el almacén Parquet local
+        df = carga_almacen()
     if df is None:
         return
 
-    # 2️⃣ Calcul
+    # 2️⃣ Calcular indicadores
+    fechas_invalidas = parsear_fechas(df, 'fallas')
+    if fechas_invalidas:
+        print(f"⚠ Filas con fecha no válida: {resumen_reporte(fechas_invalidas)}")
+    indicadores = calcular_indicadores(df)
+    muestra_resultados(indicadores)
+
+    # 3️⃣ Verificar alertas ANDON
+    alertas = verificar_alerta(indicadores)
+    if alertas:
+        print("\n🚨 ALERTAS ANDON:")
+        for alerta in alertas:
+            print(f" - {alerta}")
+    else:
+        print("\n✅ Sin alertas, indicadores dentro de rango.")
+
+
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,232 @@
+"""
+Almacén columnar (Parquet) de las bitácoras, particionado por fecha y operador.
+
+Los CSV de `Bitacoras/` tienen encabezados distintos según la versión del
+firmware / flujo de Node-RED; aquí se normalizan a un esquema único por tipo
+de bitácora y se escriben como dataset Parquet con particiones
+`fecha=AAAA-MM-DD/operador=...`. La lectura poda columnas y empuja los filtros
+de fecha/operador al dataset, así que sólo se abren los archivos necesarios.
+"""
+import os
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from .fechas import ESQUEMAS_FECHA, parsear_columna
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow es opcional: sólo lo necesita el almacén
+    pa = None
+    ds = None
+
+# Nombres alternativos de columnas -> nombre normalizado
+ALIAS_COLUMNAS = {
+    'magnitudVibracion': 'magnitud_vibracion',
+    'tiempo': 'tiempo_s',
+    'estadoMaquina': 'estado',
+    'usuario': 'operador',
+    'duracionTurnoSegundos': 'duracion_turno_s',
+    'duracion_turno': 'duracion_turno_s',
+    'duracion_trabajo': 'duracion_trabajo_s',
+    'cantidadMotivosPersonales': 'cantidad_m1',
+    'cantidadMotivosMateriales': 'cantidad_m2',
+    'cantidadMotivosHerramienta': 'cantidad_m3',
+    'tiempoTotalMotivosPersonales': 'total_m1',
+    'tiempoTotalMotivosMateriales': 'total_m2',
+    'tiempoTotalMotivosHerramienta': 'total_m3',
+}
+
+# Esquema normalizado de cada tipo de bitácora (sin las columnas de partición)
+ESQUEMAS = {
+    'turno': {
+        'magnitud_vibracion': 'float64',
+        'corriente': 'float64',
+        'tiempo_s': 'float64',
+        'estado': 'string',
+    },
+    'microparos': {
+        'duracion_turno_s': 'float64',
+        'duracion_trabajo_s': 'float64',
+        'cantidad_m1': 'float64',
+        'cantidad_m2': 'float64',
+        'cantidad_m3': 'float64',
+        'total_m1': 'float64',
+        'total_m2': 'float64',
+        'total_m3': 'float64',
+        'pieza_buena': 'float64',
+        'pieza_mala': 'float64',
+        'total_pieza': 'float64',
+        'score_5s': 'float64',
+    },
+    'fallas': {
+        'inicio_falla': 'datetime64[ns]',
+        'fin_falla': 'datetime64[ns]',
+        'inicio_reparacion': 'datetime64[ns]',
+        'fin_reparacion': 'datetime64[ns]',
+        'piezas_ok': 'float64',
+        'piezas_defectuosas': 'float64',
+        'tiempo_operativo': 'float64',
+        'tiempo_total': 'float64',
+    },
+    # Mensajes MQTT crudos de los sensores (ingesta_mqtt.py)
+    'sensores': {
+        'timestamp': 'datetime64[ns]',
+        'topico': 'string',
+        'x': 'float64',
+        'y': 'float64',
+        'z': 'float64',
+        'magnitud_vibracion': 'float64',
+        'adc': 'float64',
+        'uid': 'string',
+        'estado': 'boolean',
+        'mid': 'float64',
+        'valor': 'float64',
+        'crudo': 'string',
+    },
+}
+
+SIN_OPERADOR = 'sin_operador'
+
+
+def _requiere_pyarrow():
+    if pa is None:
+        raise ImportError("El almacén Parquet requiere pyarrow: pip install pyarrow")
+
+
+def _particionado():
+    return ds.partitioning(pa.schema([('fecha', pa.date32()), ('operador', pa.string())]),
+                           flavor='hive')
+
+
+def tipo_bitacora(columnas):
+    """Identifica el tipo de bitácora por sus encabezados (None si no se reconoce)."""
+    columnas = {ALIAS_COLUMNAS.get(c, c) for c in columnas}
+    if 'inicio_falla' in columnas:
+        return 'fallas'
+    if 'magnitud_vibracion' in columnas:
+        return 'turno'
+    if 'duracion_turno_s' in columnas:
+        return 'microparos'
+    return None
+
+
+def normalizar(df, tipo, fecha_defecto=None, fuente=None):
+    """
+    Devuelve la bitácora con el esquema normalizado de `tipo`, más las
+    columnas `fecha` (date), `operador` y `fuente`. Las filas vacías se descartan.
+    """
+    df = df.rename(columns=ALIAS_COLUMNAS).dropna(how='all')
+    out = pd.DataFrame(index=df.index)
+
+    for col, dtype in ESQUEMAS[tipo].items():
+        if col not in df:
+            out[col] = pd.Series(np.nan if dtype != 'string' else pd.NA, index=df.index, dtype=dtype)
+        elif dtype.startswith('datetime'):
+            out[col], _ = parsear_columna(df[col], ESQUEMAS_FECHA[tipo][col])
+        elif dtype == 'string':
+            out[col] = df[col].astype('string')
+        else:
+            out[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+
+    if tipo == 'fallas':
+        fecha = out['inicio_falla']
+    elif 'fecha' in df:
+        fecha, _ = parsear_columna(df['fecha'], ESQUEMAS_FECHA[tipo]['fecha'])
+    else:
+        fecha = pd.Series(pd.Timestamp(fecha_defecto), index=df.index)
+    out['fecha'] = fecha.dt.date
+
+    operador = df['operador'] if 'operador' in df else pd.Series(pd.NA, index=df.index)
+    out['operador'] = operador.astype('string').str.strip().fillna(SIN_OPERADOR)
+    out['fuente'] = fuente or ''
+    return out[out['fecha'].notna()]
+
+
+def leer_csv_normalizado(ruta, fecha_defecto=None):
+    """Lee un CSV de bitácora y lo normaliza. Devuelve (tipo, df) o (None, None)."""
+    df = pd.read_csv(ruta, engine='c')
+    tipo = tipo_bitacora(df.columns)
+    if tipo is None:
+        return None, None
+    if fecha_defecto is None:
+        fecha_defecto = datetime.fromtimestamp(os.path.getmtime(ruta)).date()
+    fuente = os.path.splitext(os.path.basename(ruta))[0]
+    return tipo, normalizar(df, tipo, fecha_defecto=fecha_defecto, fuente=fuente)
+
+
+def escribir_almacen(df, raiz, tipo):
+    """
+    Escribe una bitácora normalizada en `raiz/tipo/` particionada por fecha y
+    operador. Las particiones que ya existían se reemplazan completas.
+    """
+    _requiere_pyarrow()
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(tabla, os.path.join(raiz, tipo), format='parquet',
+                     partitioning=_particionado(),
+                     existing_data_behavior='delete_matching',
+                     basename_template='parte-{i}.parquet')
+
+
+def agregar_almacen(df, raiz, tipo, lote):
+    """
+    Agrega filas al almacén sin tocar los archivos existentes: cada llamada
+    escribe archivos nuevos `lote-<lote>-*.parquet` en sus particiones. Se usa
+    para la ingesta continua, donde reemplazar particiones perdería datos.
+    """
+    _requiere_pyarrow()
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(tabla, os.path.join(raiz, tipo), format='parquet',
+                     partitioning=_particionado(),
+                     existing_data_behavior='overwrite_or_ignore',
+                     basename_template=f'lote-{lote}-{{i}}.parquet')
+
+
+def _como_fecha(valor):
+    if valor is None or isinstance(valor, date) and not isinstance(valor, datetime):
+        return valor
+    return pd.Timestamp(valor).date()
+
+
+def leer_almacen(raiz, tipo, columnas=None, desde=None, hasta=None, operador=None):
+    """
+    Lee del almacén sólo las columnas y particiones pedidas.
+
+    `desde`/`hasta` (inclusive) y `operador` (str o lista) se empujan al
+    dataset como filtros de partición, así que los archivos fuera de rango
+    ni se abren.
+    """
+    _requiere_pyarrow()
+    dataset = ds.dataset(os.path.join(raiz, tipo), format='parquet', partitioning=_particionado())
+
+    filtro = None
+    condiciones = []
+    if desde is not None:
+        condiciones.append(ds.field('fecha') >= pa.scalar(_como_fecha(desde), pa.date32()))
+    if hasta is not None:
+        condiciones.append(ds.field('fecha') <= pa.scalar(_como_fecha(hasta), pa.date32()))
+    if operador is not None:
+        operadores = [operador] if isinstance(operador, str) else list(operador)
+        condiciones.append(ds.field('operador').isin(operadores))
+    for c in condiciones:
+        filtro = c if filtro is None else filtro & c
+
+    tabla = dataset.to_table(columns=columnas, filter=filtro)
+    df = tabla.to_pandas()
+    if 'fecha' in df:
+        df['fecha'] = pd.to_datetime(df['fecha'])
+    return df
+
+
+def operadores_almacen(raiz, tipo):
+    """Lista de operadores con datos, leída sólo de los nombres de partición."""
+    _requiere_pyarrow()
+    dataset = ds.dataset(os.path.join(raiz, tipo), format='parquet', partitioning=_particionado())
+    valores = set()
+    for fragmento in dataset.get_fragments():
+        llaves = ds.get_partition_keys(fragmento.partition_expression)
+        if 'operador' in llaves:
+            valores.add(llaves['operador'])
+    return sorted(valores)
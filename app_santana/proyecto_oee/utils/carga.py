@@ -0,0 +1,211 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+
+import pandas as pd
+
+# Tipos explícitos de la bitácora para usar el parser C sin inferencia.
+# Las fechas se leen como texto y se convierten después.
+DTYPES_BITACORA = {
+    'inicio_falla': 'string',
+    'fin_falla': 'string',
+    'inicio_reparacion': 'string',
+    'fin_reparacion': 'string',
+    'piezas_ok': 'float64',
+    'piezas_defectuosas': 'float64',
+    'tiempo_operativo': 'float64',
+    'tiempo_total': 'float64',
+    'usuario': 'string',
+    'operador': 'string',
+}
+
+
+def _hash(datos):
+    return hashlib.sha1(datos).hexdigest()
+
+
+def _fin_ultima_linea(datos):
+    """Posición justo después del último salto de línea (0 si no hay)."""
+    return datos.rfind(b'\n') + 1
+
+
+def _offset_completo(datos):
+    """
+    Offset a partir del cual se puede seguir leyendo en modo incremental.
+    Si el archivo no termina en salto de línea la última fila podría seguir
+    creciendo, así que se desactiva el modo incremental (offset 0).
+    """
+    return len(datos) if datos.endswith(b'\n') else 0
+
+
+def _inicio_rango(headers):
+    """Primer byte de la respuesta 206 según Content-Range ('bytes 100-199/200'), o None."""
+    rango = headers.get('Content-Range') or ''
+    try:
+        return int(rango.split()[1].split('-')[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def leer_csv_bytes(datos, columnas=None, dtype=None):
+    """
+    Parsea bytes de CSV con el parser C. Si se dan `columnas`, los bytes no
+    traen encabezado (porción agregada al final del archivo). Los tipos se
+    aplican al parsear (las columnas declaradas que no vengan se ignoran).
+    """
+    dtype = DTYPES_BITACORA if dtype is None else dtype
+    if columnas is None:
+        return pd.read_csv(io.BytesIO(datos), sep=',', engine='c', dtype=dtype)
+    tipos = {c: t for c, t in dtype.items() if c in columnas}
+    return pd.read_csv(io.BytesIO(datos), sep=',', engine='c', header=None,
+                       names=columnas, dtype=tipos)
+
+
+class CacheBitacoras:
+    """
+    Cache de bitácoras CSV por URL (o ruta local) con:
+      - TTL: dentro del TTL no se consulta la fuente.
+      - Validación con ETag / Last-Modified (petición condicional) y hash del contenido.
+      - Modo incremental: si el archivo sólo creció, se parsean únicamente los
+        bytes después del último offset conocido (Range con If-Range en HTTP;
+        en local y en descargas completas se comprueba antes el hash del
+        prefijo ya parseado).
+      - Desalojo LRU cuando la memoria de los DataFrames supera `max_bytes`.
+    Las bitácoras se asumen de sólo-agregar; si el prefijo cambia se recarga todo.
+    """
+
+    def __init__(self, ttl=30.0, max_bytes=512 * 1024 ** 2, timeout=30):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- API pública ---
+    def cargar(self, url, incremental=True):
+        """Devuelve el DataFrame de la bitácora, reutilizando lo ya parseado."""
+        with self._lock:
+            return self._cargar(url, incremental)
+
+    def _cargar(self, url, incremental):
+        entrada = self._entradas.get(url)
+        if entrada is not None and time.monotonic() - entrada['t'] < self.ttl:
+            self._entradas.move_to_end(url)
+            return entrada['df']
+
+        if os.path.exists(url):
+            entrada = self._actualizar_local(url, entrada, incremental)
+        else:
+            entrada = self._actualizar_http(url, entrada, incremental)
+
+        entrada['t'] = time.monotonic()
+        entrada['bytes'] = int(entrada['df'].memory_usage(deep=True).sum())
+        self._entradas[url] = entrada
+        self._entradas.move_to_end(url)
+        self._desalojar()
+        return entrada['df']
+
+    def invalidar(self, url=None):
+        with self._lock:
+            if url is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(url, None)
+
+    def tamano(self):
+        """Memoria aproximada ocupada por los DataFrames en cache (bytes)."""
+        return sum(e['bytes'] for e in self._entradas.values())
+
+    # --- Internos ---
+    def _desalojar(self):
+        while len(self._entradas) > 1 and self.tamano() > self.max_bytes:
+            self._entradas.popitem(last=False)
+
+    def _entrada_completa(self, datos, validadores):
+        offset = _offset_completo(datos)
+        return {'df': leer_csv_bytes(datos), 'offset': offset,
+                'hash_prefijo': _hash(datos[:offset]), 'hash': _hash(datos), **validadores}
+
+    def _agregar_cola(self, entrada, cola, validadores):
+        """Parsea sólo las líneas completas nuevas y las concatena al DataFrame."""
+        fin = _fin_ultima_linea(cola)
+        nuevas = cola[:fin]
+        if nuevas.strip():
+            df_nuevo = leer_csv_bytes(nuevas, columnas=list(entrada['df'].columns))
+            entrada['df'] = pd.concat([entrada['df'], df_nuevo], ignore_index=True)
+        entrada['offset'] += fin
+        entrada['hash'] = entrada['hash_prefijo'] = None
+        entrada.update(validadores)
+        return entrada
+
+    def _actualizar_desde_bytes(self, entrada, datos, validadores, incremental):
+        """Contenido completo descargado: reutiliza lo parseado si el prefijo no cambió."""
+        if entrada is not None and _hash(datos) == entrada['hash']:
+            entrada.update(validadores)
+            return entrada
+        if (incremental and entrada is not None and entrada['offset']
+                and len(datos) >= entrada['offset']
+                and _hash(datos[:entrada['offset']]) == entrada['hash_prefijo']):
+            entrada = self._agregar_cola(entrada, datos[entrada['offset']:], validadores)
+            entrada['hash_prefijo'] = _hash(datos[:entrada['offset']])
+            entrada['hash'] = _hash(datos)
+            return entrada
+        return self._entrada_completa(datos, validadores)
+
+    def _actualizar_local(self, ruta, entrada, incremental):
+        st = os.stat(ruta)
+        validadores = {'mtime': st.st_mtime_ns, 'size': st.st_size}
+        if entrada is not None and entrada.get('mtime') == st.st_mtime_ns and entrada.get('size') == st.st_size:
+            return entrada
+        # Se lee todo para comprobar el hash del prefijo ya parseado: si el
+        # archivo se reescribió (aunque haya quedado más grande) se recarga
+        # completo; si sólo creció, se parsea únicamente la cola.
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        return self._actualizar_desde_bytes(entrada, datos, validadores, incremental)
+
+    def _pedir(self, url, cabeceras):
+        req = urllib.request.Request(url, headers=cabeceras)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read(), resp.headers
+        except urllib.error.HTTPError as e:
+            if e.code in (304, 416):
+                return e.code, b'', e.headers
+            raise
+
+    def _actualizar_http(self, url, entrada, incremental):
+        cabeceras = {}
+        if entrada is not None:
+            etag, modificado = entrada.get('etag'), entrada.get('last_modified')
+            if etag:
+                cabeceras['If-None-Match'] = etag
+            if modificado:
+                cabeceras['If-Modified-Since'] = modificado
+            # If-Range: si el archivo cambió desde la última lectura el servidor
+            # responde 200 con el archivo completo, no una cola que no
+            # corresponde al prefijo en cache (un ETag débil no sirve para rangos)
+            validador = etag if etag and not etag.startswith('W/') else modificado
+            if incremental and entrada['offset'] and validador:
+                cabeceras['Range'] = f"bytes={entrada['offset']}-"
+                cabeceras['If-Range'] = validador
+
+        status, datos, headers = self._pedir(url, cabeceras)
+        if entrada is not None and (status == 416 or
+                                    (status == 206 and _inicio_rango(headers) != entrada['offset'])):
+            # El archivo quedó más corto que el offset (truncado o rotado) o el
+            # rango no es el pedido: se descarta lo parseado y se pide completo
+            self._entradas.pop(url, None)
+            return self._actualizar_http(url, None, incremental)
+        validadores = {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+
+        if entrada is not None and status == 304:
+            return entrada
+        if entrada is not None and status == 206:
+            return self._agregar_cola(entrada, datos, validadores)
+        return self._actualizar_desde_bytes(entrada, datos, validadores, incremental)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+# Registro de formatos de fecha por fuente: {fuente: {columna: formato}}
+# Declarar el formato exacto evita la inferencia elemento por elemento de
+# pd.to_datetime, que es lo más lento al cargar bitácoras grandes.
+ESQUEMAS_FECHA = {
+    # Bitácora de fallas (generador_datos.py, datos/bitacora*.csv)
+    'fallas': {
+        'inicio_falla': '%d/%m/%Y %H:%M',
+        'fin_falla': '%d/%m/%Y %H:%M',
+        'inicio_reparacion': '%d/%m/%Y %H:%M',
+        'fin_reparacion': '%d/%m/%Y %H:%M',
+    },
+    # datos_turno*.csv y herramienta_*.csv (ej. 4/12/2025)
+    'turno': {'fecha': '%d/%m/%Y'},
+    # bitacora_microparos*.csv (sólo las versiones que traen fecha)
+    'microparos': {'fecha': '%d/%m/%Y'},
+    # datos_acelerometro.csv / datos_operadores.csv de Node-RED, sin encabezado:
+    # la primera columna se lee como 'timestamp' (ISO-8601 con Z)
+    'acelerometro': {'timestamp': 'ISO8601'},
+}
+
+
+def registrar_esquema(fuente, formatos):
+    """Agrega o reemplaza los formatos de fecha de una fuente."""
+    ESQUEMAS_FECHA[fuente] = dict(formatos)
+
+
+def _convertir_unicos(unicos, formato):
+    """
+    Convierte textos únicos con un formato fijo. Si el formato es
+    'fecha hora' se separa en dos partes y cada una se factoriza aparte: hay
+    pocos días y como mucho 1440 minutos distintos, así que aunque casi todos
+    los textos completos sean únicos sólo se convierten unos cuantos.
+    """
+    if formato.count(' ') != 1 or len(unicos) < 1000:
+        return pd.to_datetime(unicos, format=formato, errors='coerce')
+
+    formato_fecha, formato_hora = formato.split(' ')
+    partes = np.char.partition(np.asarray(unicos, dtype=str), ' ')
+
+    codigos_f, fechas = pd.factorize(partes[:, 0])
+    codigos_h, horas = pd.factorize(partes[:, 2])
+    fechas = pd.to_datetime(fechas, format=formato_fecha, errors='coerce')
+    horas = pd.to_datetime(horas, format=formato_hora, errors='coerce')
+    horas = horas - horas.normalize()
+    return pd.DatetimeIndex(fechas.take(codigos_f, allow_fill=True, fill_value=pd.NaT)
+                            + horas.take(codigos_h, allow_fill=True, fill_value=pd.NaT))
+
+
+def parsear_columna(serie, formato, respaldo=True):
+    """
+    Convierte una columna de texto a fechas con un formato fijo.
+
+    Cada texto distinto se convierte una sola vez (factorize + take), así que
+    el costo depende de los valores únicos y no del número de filas. Si
+    `respaldo` es True, los textos que no cumplen el formato se intentan
+    primero como ISO-8601 (ej. CSV escritos por pandas, año-mes-día) y sólo
+    los que siguen fallando con inferencia (día primero).
+
+    Con zona horaria (ej. ISO-8601 con Z) la columna queda en la zona de los
+    textos, o en UTC si traen zonas distintas; el respaldo se lleva a esa
+    misma zona (los textos sin zona se toman como UTC) para que la columna
+    siga siendo datetime64 y no object.
+    Devuelve (fechas, mascara_invalidas).
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie, np.zeros(len(serie), dtype=bool)
+
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    unicos = pd.Index(unicos).astype(str)
+    try:
+        convertidos = _convertir_unicos(unicos, formato)
+    except ValueError:
+        # Zonas horarias distintas: se unifican en UTC
+        convertidos = pd.to_datetime(unicos, format=formato, errors='coerce', utc=True)
+
+    fallidos = convertidos.isna()
+    if respaldo:
+        # ISO-8601 antes que día primero: con dayfirst, '2025-10-02' sería 10 de febrero
+        for opciones in ({'format': 'ISO8601'}, {'format': 'mixed', 'dayfirst': True}):
+            if not fallidos.any():
+                break
+            # Mismo largo que `convertidos` (where alinea por posición); los ya
+            # convertidos quedan vacíos y no se vuelven a interpretar
+            reintento = pd.to_datetime(unicos.where(fallidos), errors='coerce', utc=True,
+                                       **opciones).tz_convert(convertidos.tz)
+            convertidos = convertidos.where(~fallidos, reintento)
+            fallidos = convertidos.isna()
+
+    fechas = convertidos.take(codigos, allow_fill=True, fill_value=pd.NaT)
+    invalidas = (codigos >= 0) & np.asarray(fallidos)[np.maximum(codigos, 0)]
+    return pd.Series(fechas, index=serie.index, name=serie.name), invalidas
+
+
+def parsear_fechas(df, fuente, respaldo=True):
+    """
+    Convierte en el lugar las columnas de fecha declaradas para `fuente`.
+
+    Devuelve un reporte {columna: indices de filas no convertibles}; las filas
+    vacías no cuentan como error.
+    """
+    reporte = {}
+    for col, formato in ESQUEMAS_FECHA[fuente].items():
+        if col not in df:
+            continue
+        df[col], invalidas = parsear_columna(df[col], formato, respaldo=respaldo)
+        if invalidas.any():
+            reporte[col] = df.index[invalidas]
+    return reporte
+
+
+def resumen_reporte(reporte):
+    """Texto corto con el número de filas no convertibles por columna."""
+    return ", ".join(f"{col}: {len(idx)}" for col, idx in reporte.items())
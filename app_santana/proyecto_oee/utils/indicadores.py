@@ -1,3 +1,4 @@
+import json
 import pandas as pd
 import numpy as np
 
@@ -20,9 +21,9 @@ def calcular_mttr(df):
     MTTR (Mean Time To Repair) = Tiempo total de reparación / Número de reparaciones
     """
     try:
-        df['tiempo_reparacion'] = (df['fin_reparacion'] - df['inicio_reparacion']).dt.total_seconds() / 3600
-        total_reparacion = df['tiempo_reparacion'].sum()
-        n_reparaciones = df['tiempo_reparacion'].count()
+        tiempo_reparacion = (df['fin_reparacion'] - df['inicio_reparacion']).dt.total_seconds() / 3600
+        total_reparacion = tiempo_reparacion.sum()
+        n_reparaciones = tiempo_reparacion.count()
         if n_reparaciones == 0:
             return np.nan
         return total_reparacion / n_reparaciones
@@ -35,9 +36,9 @@ def calcular_mtta(df):
     MTTA (Mean Time To Acknowledge) = Tiempo promedio en detectar una falla desde su inicio
     """
     try:
-        df['tiempo_espera'] = (df['inicio_reparacion'] - df['inicio_falla']).dt.total_seconds() / 3600
-        total_espera = df['tiempo_espera'].sum()
-        n_fallas = df['tiempo_espera'].count()
+        tiempo_espera = (df['inicio_reparacion'] - df['inicio_falla']).dt.total_seconds() / 3600
+        total_espera = tiempo_espera.sum()
+        n_fallas = tiempo_espera.count()
         if n_fallas == 0:
             return np.nan
         return total_espera / n_fallas
@@ -102,14 +103,315 @@ def calcular_oee(df):
     """
     OEE = Disponibilidad × Desempeño × Calidad
     """
-    mtbf = calcular_mtbf(df)
-    mttr = calcular_mttr(df)
-    disponibilidad = calcular_disponibilidad(mtbf, mttr)
-    desempeno = calcular_desempeno(df)
-    calidad = calcular_calidad(df)
+    return calcular_indicadores(df)['OEE']
 
-    try:
-        oee = (disponibilidad / 100) * (desempeno / 100) * (calidad / 100) * 100
-        return oee
-    except Exception:
+
+# --- MOTOR VECTORIZADO ---
+def _suma(df, col):
+    """Suma de una columna ignorando NaN, leyendo el arreglo sin copiar el DataFrame."""
+    return np.nansum(df[col].to_numpy())
+
+
+def _fechas_numpy(serie):
+    """datetime64 de NumPy; las columnas con zona horaria (ej. acelerómetro con Z) se pasan a UTC sin zona."""
+    if getattr(serie.dtype, 'tz', None) is not None:
+        serie = serie.dt.tz_convert(None)
+    return serie.to_numpy()
+
+
+def _horas_promedio(df, col_inicio, col_fin):
+    """
+    Promedio en horas de (col_fin - col_inicio), ignorando NaT.
+    Devuelve (suma_horas, n_validos).
+    """
+    inicio = _fechas_numpy(df[col_inicio])
+    fin = _fechas_numpy(df[col_fin])
+    horas = (fin - inicio) / np.timedelta64(1, 'h')
+    n = len(horas) - int(np.count_nonzero(np.isnan(horas)))
+    return np.nansum(horas), n
+
+
+def _dividir(num, den):
+    """num / den, o NaN si el denominador es 0 o NaN."""
+    if den == 0 or np.isnan(den):
         return np.nan
+    return num / den
+
+
+def _indicadores_desde_totales(totales):
+    """
+    Calcula los indicadores a partir de los totales de la bitácora
+    (mismas llaves que las sumas por evento). Un total ausente vale NaN.
+    """
+    t = {k: totales.get(k, np.nan) for k in (
+        'n_fallas', 'tiempo_operativo', 'tiempo_total', 'piezas_ok', 'piezas_defectuosas',
+        'horas_reparacion', 'n_reparacion', 'horas_espera', 'n_espera')}
+
+    mtbf = _dividir(t['tiempo_operativo'], t['n_fallas'])
+    mttr = _dividir(t['horas_reparacion'], t['n_reparacion'])
+    mtta = _dividir(t['horas_espera'], t['n_espera'])
+    disponibilidad = calcular_disponibilidad(mtbf, mttr)
+    desempeno = _dividir(t['tiempo_operativo'], t['tiempo_total']) * 100
+    calidad = _dividir(t['piezas_ok'], t['piezas_ok'] + t['piezas_defectuosas']) * 100
+    oee = (disponibilidad / 100) * (desempeno / 100) * (calidad / 100) * 100
+
+    return {
+        'MTBF': mtbf,
+        'MTTR': mttr,
+        'MTTA': mtta,
+        'Disponibilidad': disponibilidad,
+        'Desempeño': desempeno,
+        'Calidad': calidad,
+        'OEE': oee,
+    }
+
+
+def calcular_indicadores(df):
+    """
+    Calcula todos los indicadores en una sola pasada columnar sobre la bitácora.
+
+    Cada columna se lee una sola vez como arreglo de NumPy; el DataFrame no se
+    copia ni se modifica. Devuelve un diccionario con MTBF, MTTR y MTTA (hrs)
+    y Disponibilidad, Desempeño, Calidad y OEE (%), con los mismos valores que
+    las funciones calcular_* individuales.
+    """
+    totales = {'n_fallas': len(df)}
+    for col in ('tiempo_operativo', 'tiempo_total', 'piezas_ok', 'piezas_defectuosas'):
+        if col in df:
+            totales[col] = _suma(df, col)
+    for nombre, inicio, fin in (('reparacion', 'inicio_reparacion', 'fin_reparacion'),
+                                ('espera', 'inicio_falla', 'inicio_reparacion')):
+        if inicio in df and fin in df:
+            totales[f'horas_{nombre}'], totales[f'n_{nombre}'] = _horas_promedio(df, inicio, fin)
+    return _indicadores_desde_totales(totales)
+
+
+# --- ACUMULADOR INCREMENTAL ---
+class OEEAccumulator:
+    """
+    Mantiene los totales de la bitácora para actualizar los indicadores en O(1)
+    por evento, sin recalcular todo el historial.
+
+    Un evento es una fila de la bitácora (dict o Series) con las columnas
+    tiempo_operativo, tiempo_total, piezas_ok, piezas_defectuosas,
+    inicio_falla, inicio_reparacion y fin_reparacion. Como en
+    calcular_indicadores, un total queda en NaN hasta que llega un evento que
+    trae su columna; un valor vacío en una columna presente cuenta 0.
+    """
+
+    CAMPOS = ('n_fallas', 'tiempo_operativo', 'tiempo_total', 'piezas_ok', 'piezas_defectuosas',
+              'horas_reparacion', 'n_reparacion', 'horas_espera', 'n_espera')
+
+    def __init__(self, totales=None):
+        self.totales = dict.fromkeys(self.CAMPOS, np.nan)
+        self.totales['n_fallas'] = 0
+        if totales:
+            self.totales.update({k: totales[k] for k in self.CAMPOS if k in totales})
+
+    @staticmethod
+    def _horas(evento, col_inicio, col_fin):
+        inicio, fin = evento.get(col_inicio), evento.get(col_fin)
+        if inicio is None or fin is None or pd.isna(inicio) or pd.isna(fin):
+            return None
+        return (pd.Timestamp(fin) - pd.Timestamp(inicio)).total_seconds() / 3600
+
+    def _sumar(self, campo, valor):
+        """Suma al total; el primero que llega convierte el NaN (columna ausente) en 0."""
+        t = self.totales
+        if pd.isna(t[campo]):
+            t[campo] = 0
+        t[campo] += valor
+
+    def _aplicar(self, evento, signo):
+        self.totales['n_fallas'] += signo
+        for col in ('tiempo_operativo', 'tiempo_total', 'piezas_ok', 'piezas_defectuosas'):
+            if col in evento:
+                valor = evento[col]
+                self._sumar(col, 0 if valor is None or pd.isna(valor) else signo * valor)
+        for nombre, inicio, fin in (('reparacion', 'inicio_reparacion', 'fin_reparacion'),
+                                    ('espera', 'inicio_falla', 'inicio_reparacion')):
+            if inicio in evento and fin in evento:
+                horas = self._horas(evento, inicio, fin)
+                self._sumar(f'horas_{nombre}', 0 if horas is None else signo * horas)
+                self._sumar(f'n_{nombre}', 0 if horas is None else signo)
+
+    def add(self, evento):
+        """Agrega un evento (nueva falla o fila de la bitácora)."""
+        self._aplicar(evento, 1)
+
+    def remove(self, evento):
+        """Quita un evento agregado antes (p. ej. al salir de una ventana)."""
+        self._aplicar(evento, -1)
+
+    def snapshot(self):
+        """Indicadores actuales, con las mismas llaves que calcular_indicadores."""
+        return _indicadores_desde_totales(self.totales)
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        """Inicializa el acumulador con el historial completo en una sola agregación."""
+        sumas = _sumas_por_evento(df).sum()
+        return cls({k: sumas[k].item() for k in cls.CAMPOS if k in sumas})
+
+    def to_dict(self):
+        return {k: float(v) for k, v in self.totales.items()}
+
+    @classmethod
+    def from_dict(cls, datos):
+        return cls(datos)
+
+    def guardar(self, ruta):
+        """Guarda los totales en JSON para sobrevivir reinicios."""
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+# --- INDICADORES POR GRUPO Y VENTANA ---
+# Turnos de la planta: (nombre, hora de inicio, hora de fin)
+TURNOS = [
+    ('Matutino', 6, 14),
+    ('Vespertino', 14, 22),
+    ('Nocturno', 22, 6),
+]
+
+# Columnas de bitacora_microparos.csv equivalentes a la bitácora de fallas
+COLUMNAS_MICROPAROS = {
+    'duracion_turno_s': 'tiempo_total',
+    'duracion_trabajo_s': 'tiempo_operativo',
+    'pieza_buena': 'piezas_ok',
+    'pieza_mala': 'piezas_defectuosas',
+}
+
+
+def normalizar_microparos(df):
+    """
+    Convierte una bitácora de microparos al esquema de la bitácora de fallas
+    (tiempos en horas) para poder agruparla por `usuario`.
+    """
+    out = df.rename(columns=COLUMNAS_MICROPAROS)
+    for col in ('tiempo_total', 'tiempo_operativo'):
+        if col in out:
+            out[col] = out[col] / 3600
+    return out
+
+
+def asignar_turno(fechas):
+    """Devuelve el nombre del turno de cada fecha según TURNOS."""
+    horas = fechas.dt.hour.to_numpy()
+    condiciones = []
+    for _, inicio, fin in TURNOS:
+        if inicio < fin:
+            condiciones.append((horas >= inicio) & (horas < fin))
+        else:
+            condiciones.append((horas >= inicio) | (horas < fin))
+    nombres = [nombre for nombre, _, _ in TURNOS]
+    return pd.Series(np.select(condiciones, nombres, default=None), index=fechas.index, name='turno')
+
+
+def _sumas_por_evento(df):
+    """
+    Arma las cantidades sumables de cada evento (una fila por falla) para que
+    los indicadores de cualquier grupo o ventana salgan de una sola agregación.
+    """
+    base = pd.DataFrame({'n_fallas': np.ones(len(df), dtype=np.int64)}, index=df.index)
+    for col in ('tiempo_operativo', 'tiempo_total', 'piezas_ok', 'piezas_defectuosas'):
+        if col in df:
+            base[col] = df[col].fillna(0)
+    for nombre, inicio, fin in (('reparacion', 'inicio_reparacion', 'fin_reparacion'),
+                                ('espera', 'inicio_falla', 'inicio_reparacion')):
+        if inicio in df and fin in df:
+            horas = (df[fin] - df[inicio]).dt.total_seconds() / 3600
+            base[f'horas_{nombre}'] = horas.fillna(0)
+            base[f'n_{nombre}'] = horas.notna().astype(np.int64)
+    return base
+
+
+def _indicadores_desde_sumas(sumas):
+    """Calcula los indicadores de forma vectorizada a partir de sumas agregadas."""
+    def col(nombre):
+        if nombre in sumas:
+            return sumas[nombre].astype(float)
+        return pd.Series(np.nan, index=sumas.index)
+
+    def dividir(num, den):
+        return num / den.where(den != 0)
+
+    mtbf = dividir(col('tiempo_operativo'), col('n_fallas'))
+    mttr = dividir(col('horas_reparacion'), col('n_reparacion'))
+    mtta = dividir(col('horas_espera'), col('n_espera'))
+    disponibilidad = dividir(mtbf, mtbf + mttr) * 100
+    desempeno = dividir(col('tiempo_operativo'), col('tiempo_total')) * 100
+    calidad = dividir(col('piezas_ok'), col('piezas_ok') + col('piezas_defectuosas')) * 100
+    oee = (disponibilidad / 100) * (desempeno / 100) * (calidad / 100) * 100
+
+    return pd.DataFrame({
+        'n_fallas': col('n_fallas'),
+        'MTBF': mtbf,
+        'MTTR': mttr,
+        'MTTA': mtta,
+        'Disponibilidad': disponibilidad,
+        'Desempeño': desempeno,
+        'Calidad': calidad,
+        'OEE': oee,
+    }, index=sumas.index)
+
+
+def _llaves(df, por, col_fecha):
+    """Traduce `por` a llaves de groupby; 'turno' y 'dia' se derivan de col_fecha."""
+    if por is None:
+        return []
+    if isinstance(por, str):
+        por = [por]
+    llaves = []
+    for p in por:
+        if p == 'turno':
+            llaves.append(asignar_turno(df[col_fecha]))
+        elif p == 'dia':
+            llaves.append(df[col_fecha].dt.floor('D').rename('dia'))
+        else:
+            llaves.append(df[p])
+    return llaves
+
+
+def calcular_indicadores_por_grupo(df, por='usuario', frecuencia=None, col_fecha='inicio_falla'):
+    """
+    Indicadores por grupo en una sola agregación groupby.
+
+    `por` acepta columnas de la bitácora (`usuario`, `operador`, ...) y las
+    llaves especiales 'turno' y 'dia'. `frecuencia` ('D', 'W', '8h', ...)
+    agrega además por periodos de `col_fecha`, como un resample.
+    """
+    base = _sumas_por_evento(df)
+    llaves = _llaves(df, por, col_fecha)
+    if frecuencia is not None:
+        llaves.append(pd.Grouper(key='_fecha', freq=frecuencia))
+        base['_fecha'] = df[col_fecha]
+    if not llaves:
+        raise ValueError("Indica al menos una columna en `por` o una `frecuencia`.")
+    sumas = base.groupby(llaves, sort=True, dropna=True).sum()
+    sumas = sumas.rename_axis(index={'_fecha': col_fecha})
+    return _indicadores_desde_sumas(sumas)
+
+
+def calcular_indicadores_moviles(df, ventana='8h', por=None, col_fecha='inicio_falla'):
+    """
+    Indicadores en ventana móvil de tiempo (p. ej. '1h', '8h', '7D') que termina
+    en cada evento, calculados con sumas rolling sobre la bitácora ordenada.
+    Con `por` la ventana se evalúa dentro de cada grupo (groupby + rolling).
+    """
+    base = _sumas_por_evento(df)
+    base['_fecha'] = df[col_fecha]
+    base = base[base['_fecha'].notna()].sort_values('_fecha', kind='stable')
+    llaves = [llave.loc[base.index] for llave in _llaves(df, por, col_fecha)]
+    if llaves:
+        sumas = base.groupby(llaves, sort=True).rolling(ventana, on='_fecha').sum()
+        sumas = sumas.set_index('_fecha', append=True).droplevel(-2)
+    else:
+        sumas = base.rolling(ventana, on='_fecha').sum().set_index('_fecha')
+    sumas = sumas.rename_axis(index={'_fecha': col_fecha})
+    return _indicadores_desde_sumas(sumas)
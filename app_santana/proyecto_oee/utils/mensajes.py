@@ -0,0 +1,116 @@
+"""
+Interpretación de los mensajes MQTT de los módulos ESP32.
+
+Replica lo que hacían los nodos function de Node-RED (Dashboards/*.json):
+cada tópico tiene su propio formato de texto y aquí se convierte a una fila
+con las columnas del esquema 'sensores' del almacén. Lo que no se puede
+interpretar se guarda igual en la columna `crudo` para no perder mensajes.
+"""
+import json
+import math
+import re
+
+# UID de tarjeta RFID -> nombre del operador (nodo IdentificadorOperador)
+OPERADORES = {
+    '3024565763': 'Ing Ricardo',
+    '3597117261': 'Porfirio Diaz',
+}
+OPERADOR_DESCONOCIDO = 'UID desconocido'
+
+# Factor de escala de la magnitud de vibración (nodo discretizarVibracion)
+FACTOR_VIBRACION = 1.15
+
+_RE_VIBRACION = re.compile(r'X:([-\d.]+),Y:([-\d.]+),Z:([-\d.]+)')
+_RE_CORRIENTE = re.compile(r'VALUE:([0-9.]+)')
+
+
+def _texto(payload):
+    if isinstance(payload, (bytes, bytearray)):
+        return payload.decode('utf-8', errors='replace').strip()
+    return str(payload).strip()
+
+
+def _numero(texto):
+    try:
+        return float(texto)
+    except (TypeError, ValueError):
+        return None
+
+
+def parsear_vibracion(texto):
+    """'ID:VIBRATION;X:1.84,Y:1.78,Z:2.17' -> ejes y magnitud."""
+    m = _RE_VIBRACION.search(texto)
+    if not m:
+        return {}
+    x, y, z = (float(v) for v in m.groups())
+    magnitud = math.sqrt(x * x + y * y + z * z) * FACTOR_VIBRACION
+    return {'x': x, 'y': y, 'z': z, 'magnitud_vibracion': round(magnitud, 3)}
+
+
+def parsear_corriente(texto):
+    """'VALUE:2048' o '{"adc": 2048}' -> lectura cruda del ADC."""
+    m = _RE_CORRIENTE.search(texto)
+    if m:
+        return {'adc': float(m.group(1))}
+    try:
+        adc = json.loads(texto).get('adc')
+    except (ValueError, AttributeError):
+        return {}
+    return {'adc': float(adc)} if isinstance(adc, (int, float)) else {}
+
+
+def parsear_operador(texto):
+    """UID decimal de la tarjeta RFID -> uid y nombre del operador."""
+    if not texto.isdigit():
+        return {}
+    return {'uid': texto, 'operador': OPERADORES.get(texto, OPERADOR_DESCONOCIDO)}
+
+
+def parsear_microparo(texto):
+    """'ID:BUTTON;ESTADO:verdadero;MID:3' -> estado del botón y motivo."""
+    datos = {}
+    for parte in texto.split(';'):
+        llave, sep, valor = parte.partition(':')
+        if sep:
+            datos[llave.strip()] = valor.strip()
+    if 'ESTADO' not in datos:
+        return {}
+    return {'estado': datos['ESTADO'] == 'verdadero', 'mid': _numero(datos.get('MID'))}
+
+
+def parsear_score(texto):
+    """Score 5S numérico."""
+    valor = _numero(texto)
+    return {} if valor is None else {'valor': valor}
+
+
+PARSERS = {
+    'datos/vibracion': parsear_vibracion,
+    'datos/corriente': parsear_corriente,
+    'datos/operador': parsear_operador,
+    'datos/microparo': parsear_microparo,
+    'datos/score': parsear_score,
+}
+# datos/score/# también recibe los scores por estación del servidor de
+# inspección (datos/score/<estacion>); '#' incluye a datos/score mismo.
+TOPICOS = [t + '/#' if t == 'datos/score' else t for t in PARSERS]
+
+
+def parsear_mensaje(topico, payload):
+    """
+    Convierte un mensaje en un dict de columnas. Si el tópico no se conoce o
+    el texto no tiene el formato esperado, sólo se llena `crudo`. Si el
+    texto parece tener el formato pero sus números no se pueden leer
+    (p. ej. 'X:1.2.3'), se avisa y se devuelve None: el mensaje se descarta.
+    """
+    texto = _texto(payload)
+    parser = PARSERS.get(topico) or PARSERS.get('/'.join(topico.split('/')[:2]))
+    try:
+        campos = parser(texto) if parser else {}
+    except (ValueError, KeyError) as e:
+        print(f"⚠ Mensaje descartado en {topico}: {texto!r} ({e})")
+        return None
+    if not campos:
+        campos = {'crudo': texto}
+    campos['topico'] = topico
+    return campos